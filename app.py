@@ -1,11 +1,10 @@
 import streamlit as st
-import tensorflow as tf
 import numpy as np
-from PIL import Image
 import os
 import json
-from io import BytesIO
-import base64
+
+from utils.backends import load_backend
+from utils.preprocess import preprocess_image
 
 st.set_page_config(
     page_title="DermAI - Skin Disease Detection",
@@ -32,7 +31,7 @@ if "last_image_key" not in st.session_state:
 @st.cache_resource
 def load_model():
     try:
-        model = tf.keras.models.load_model("final_skin_disease_model.keras")
+        model = load_backend()
         st.success("✓ Model loaded successfully")
         return model
     except Exception as e:
@@ -51,22 +50,6 @@ CLASS_NAMES = [
     "Vascular Tumors", "Vasculitis", "Vitiligo", "Warts"
 ]
 
-def preprocess_image(img):
-    """Preprocess image for model prediction"""
-    try:
-        if isinstance(img, str):
-            # Base64 encoded image
-            img_bytes = base64.b64decode(img)
-            img = Image.open(BytesIO(img_bytes))
-        
-        img = img.convert("RGB")
-        img = img.resize((224, 224))
-        img_array = np.array(img) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
-        return img_array
-    except Exception as e:
-        raise Exception(f"Image preprocessing error: {str(e)}")
-
 def make_prediction(image_data):
     """Make prediction on image"""
     try:
@@ -74,7 +57,7 @@ def make_prediction(image_data):
             return {"error": "Model not loaded", "label": "Error", "confidence": 0.0, "success": False}
         
         processed_image = preprocess_image(image_data)
-        preds = model.predict(processed_image, verbose=0)[0]
+        preds = model.predict_batch(processed_image)[0]
         idx = int(np.argmax(preds))
         confidence = float(preds[idx])
         
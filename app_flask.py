@@ -1,16 +1,27 @@
 """
 DermAI - Skin Disease Detection App
-Flask Backend with TensorFlow Model Integration
+Flask Backend with Pluggable Model Runtime (Keras / TFLite / ONNX)
 Production-Ready for Render Deployment
 """
 
-from flask import Flask, send_file, request, jsonify
-import tensorflow as tf
+from flask import Flask, Response, g, send_file, request, jsonify
 import numpy as np
-from PIL import Image
 import os
-from io import BytesIO
 import logging
+import threading
+import time
+import zipfile
+
+from utils.admission import RateLimiter
+from utils.batching import MicroBatcher, Overloaded
+from utils.cache import PredictionCache, digest_key, model_fingerprint
+from utils.ingest import UploadGuard, UploadRejected
+from utils.metrics import Metrics, process_memory
+from utils.phash import NearDuplicateCache, phash
+from utils.profiling import RequestProfiler
+from utils.preprocess import BatchBuffers, decode_image, normalize_batch
+from utils.cpu_tuning import plan_from_env
+from utils.startup import ModelLoader
 
 # ============================================
 # INITIALIZE FLASK APP
@@ -22,20 +33,175 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# ============================================
+# METRICS
+# ============================================
+# Recorded per thread without locks (utils/metrics.py) and exposed in
+# Prometheus text format at /api/metrics
+METRICS = Metrics(prefix="dermai")
+METRICS.describe("stage_latency_seconds", "Time spent in each stage of serving a prediction")
+METRICS.describe("request_latency_seconds", "End-to-end request latency by endpoint")
+METRICS.describe("requests_total", "Requests by endpoint and HTTP status")
+METRICS.describe("errors_total", "Errors by type")
+METRICS.describe("requests_in_flight", "Requests currently being handled")
+METRICS.describe("requests_shed_total", "Requests refused by admission control or rate limiting")
+METRICS.describe("model_loaded", "1 once the model is loaded and warmed up")
+METRICS.describe("model_file_bytes", "Size of the loaded model file")
+METRICS.describe("process_resident_memory_bytes", "Resident set size of this process")
+METRICS.describe("process_peak_resident_memory_bytes", "Peak resident set size of this process")
+METRICS.describe("batcher_queue_depth", "Images waiting in the micro-batcher")
+METRICS.describe("prediction_cache_entries", "Entries in the prediction cache")
+
 # ============================================
 # LOAD MODEL (ONCE AT STARTUP)
 # ============================================
-try:
-    model_path = os.environ.get('MODEL_PATH', 'final_skin_disease_model.keras')
-    if os.path.exists(model_path):
-        MODEL = tf.keras.models.load_model(model_path)
-        logger.info("✓ Model loaded successfully")
-    else:
-        logger.warning(f"Model not found at {model_path}")
-        MODEL = None
-except Exception as e:
-    logger.error(f"✗ Failed to load model: {str(e)}")
-    MODEL = None
+# MODEL_BACKEND selects the serving runtime (keras | tflite | onnx), see
+# utils/backends.py. MODEL_PATH overrides the backend's default model file.
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'keras').lower()
+
+# Under gunicorn's preload mode (gunicorn.conf.py) the master imports this
+# module with DEFER_MODEL_LOAD=1 and each worker calls init_model() after
+# fork, so no TensorFlow runtime or batcher thread crosses a fork.
+DEFER_MODEL_LOAD = os.environ.get('DEFER_MODEL_LOAD', '0') == '1'
+
+# Concurrent requests are coalesced into a single forward pass.
+# BATCH_MAX_SIZE=1 effectively disables coalescing.
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '16'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', '5'))
+
+# Admission control: at most ADMISSION_MAX_QUEUE images wait for the
+# batcher, and a request that can't finish within REQUEST_DEADLINE_MS
+# (0 = no deadline) is refused with 503 + Retry-After instead of queueing
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', str(BATCH_MAX_SIZE * 4)))
+REQUEST_DEADLINE_MS = float(os.environ.get('REQUEST_DEADLINE_MS', '10000'))
+
+# /api/predict/batch limits
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', '32'))
+BATCH_MAX_IMAGES = int(os.environ.get('BATCH_MAX_IMAGES', '64'))
+# Whole-request body limit for /api/predict/batch; the app-wide 16MB limit
+# would refuse a batch of phone photos long before BATCH_MAX_IMAGES
+BATCH_MAX_CONTENT_LENGTH = int(os.environ.get('BATCH_MAX_CONTENT_LENGTH', str(256 * 1024 * 1024)))
+
+# The runtime import and model load run on a background thread so the
+# server answers /api/health right away; /api/ready goes green only after
+# warm-up. MODEL_LOAD_MODE=sync blocks until the model is ready instead.
+MODEL_LOAD_BACKGROUND = os.environ.get('MODEL_LOAD_MODE', 'background').lower() != 'sync'
+
+# Dummy batch sizes run through the model before reporting ready, so graph
+# tracing happens at startup. Defaults to the batcher's buckets up to
+# BATCH_MAX_SIZE and the /api/predict/batch chunk size.
+WARMUP_BATCH_SIZES = [
+    int(b) for b in os.environ.get(
+        'WARMUP_BATCH_SIZES',
+        ",".join(str(b) for b in sorted(
+            {b for b in (1, 2, 4, 8, 16, 32) if b <= BATCH_MAX_SIZE} | {BATCH_CHUNK_SIZE}
+        ))
+    ).split(",") if b.strip()
+]
+
+BACKEND = None
+BATCHER = None
+MODEL_FINGERPRINT = ""
+
+def on_model_loaded(backend):
+    """Publish a warmed-up backend; BACKEND is set last so it gates serving"""
+    global BACKEND, BATCHER, MODEL_FINGERPRINT
+    MODEL_FINGERPRINT = model_fingerprint(backend.model_path)
+    BATCHER = MicroBatcher(
+        backend.predict_batch,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        max_queue=ADMISSION_MAX_QUEUE
+    )
+    BACKEND = backend
+
+# Thread pools are sized from the worker count and usable CPUs so several
+# workers don't oversubscribe the host (utils/cpu_tuning.py). Overrides:
+# TF_INTRA_OP_THREADS, TF_INTER_OP_THREADS, CPU_AFFINITY=1 to pin workers,
+# CPU_TUNING=0 to leave the runtime defaults alone.
+CPU_TUNING = os.environ.get('CPU_TUNING', '1') == '1'
+SELF_BENCHMARK_ITERS = int(os.environ.get('SELF_BENCHMARK_ITERS', '5'))
+
+MODEL_LOADER = ModelLoader(
+    MODEL_BACKEND, WARMUP_BATCH_SIZES,
+    on_loaded=on_model_loaded,
+    benchmark_batch_sizes=sorted({1, BATCH_MAX_SIZE}),
+    benchmark_iters=SELF_BENCHMARK_ITERS
+)
+
+def init_model():
+    """Load and warm up the backend for this process (see utils/startup.py)"""
+    # Planned here rather than at import: under preload the worker index is
+    # only known after fork
+    if CPU_TUNING:
+        MODEL_LOADER.thread_plan = plan_from_env()
+    MODEL_LOADER.start(background=MODEL_LOAD_BACKGROUND)
+
+if not DEFER_MODEL_LOAD:
+    init_model()
+
+# ============================================
+# PREDICTION CACHE
+# ============================================
+# Keyed on the upload bytes + model fingerprint. CACHE_MAX_ENTRIES=0 disables.
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '1024'))
+CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', '3600'))
+
+PREDICTION_CACHE = PredictionCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+
+# Optional second tier: perceptual hash of the preprocessed 224x224 image,
+# so near-identical camera captures reuse a result. Off unless PHASH_CACHE=1.
+PHASH_CACHE_ENABLED = os.environ.get('PHASH_CACHE', '0') == '1'
+PHASH_MAX_DISTANCE = int(os.environ.get('PHASH_MAX_DISTANCE', '4'))
+PHASH_MAX_ENTRIES = int(os.environ.get('PHASH_MAX_ENTRIES', '100000'))
+
+NEAR_DUP_CACHE = NearDuplicateCache(
+    PHASH_MAX_ENTRIES if PHASH_CACHE_ENABLED else 0,
+    CACHE_TTL_SECONDS,
+    PHASH_MAX_DISTANCE
+)
+
+def is_cacheable(result):
+    """Only successful predictions are cached"""
+    return result.get("success", False)
+
+# ============================================
+# UPLOAD LIMITS
+# ============================================
+# Uploads are streamed into a bounded spool and their image header is
+# checked before any pixels are decoded (utils/ingest.py)
+UPLOAD_GUARD = UploadGuard(
+    max_bytes=int(os.environ.get('UPLOAD_MAX_BYTES', str(16 * 1024 * 1024))),
+    max_pixels=int(os.environ.get('UPLOAD_MAX_PIXELS', '60000000')),
+    memory_budget_bytes=int(os.environ.get('UPLOAD_MEMORY_BUDGET_MB', '256')) * 1024 * 1024,
+    spool_memory_bytes=int(os.environ.get('UPLOAD_SPOOL_MEMORY_BYTES', str(1024 * 1024)))
+)
+
+# ============================================
+# RATE LIMITING
+# ============================================
+# Per-client token bucket (one token per image), off unless RATE_LIMIT_PER_S
+# is set. Behind a reverse proxy (Render, HF Spaces) set
+# RATE_LIMIT_TRUST_PROXY=1 so clients are told apart by X-Forwarded-For.
+RATE_LIMITER = RateLimiter(
+    rate=float(os.environ.get('RATE_LIMIT_PER_S', '0')),
+    burst=float(os.environ.get('RATE_LIMIT_BURST', '20')),
+    max_clients=int(os.environ.get('RATE_LIMIT_MAX_CLIENTS', '10000'))
+)
+RATE_LIMIT_TRUST_PROXY = os.environ.get('RATE_LIMIT_TRUST_PROXY', '0') == '1'
+
+def client_key(remote_addr, forwarded_for=None):
+    """Client identity for rate limiting"""
+    if RATE_LIMIT_TRUST_PROXY and forwarded_for:
+        # The proxy appends the address it saw; earlier entries are client-supplied
+        return forwarded_for.split(",")[-1].strip()
+    return remote_addr or "unknown"
+
+def request_deadline():
+    """time.monotonic() by which a request must be served, or None"""
+    if REQUEST_DEADLINE_MS <= 0:
+        return None
+    return time.monotonic() + REQUEST_DEADLINE_MS / 1000.0
 
 # ============================================
 # CLASS NAMES (MUST MATCH TRAINING ORDER)
@@ -50,62 +216,363 @@ CLASS_NAMES = [
 ]
 
 # ============================================
-# PREPROCESSING FUNCTION
+# PREPROCESSING
 # ============================================
-def preprocess_image(img):
-    """Resize and normalize image for model"""
-    try:
-        img = img.convert("RGB")
-        img = img.resize((224, 224))
-        img_array = np.array(img) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
-        return img_array
-    except Exception as e:
-        raise Exception(f"Preprocessing error: {str(e)}")
+# Shared with the other front-ends (utils/preprocess.py): decode to uint8,
+# normalize in float32 into per-thread reusable batch buffers
+BATCH_BUFFERS = BatchBuffers()
+
+# Decode is reported separately from inference: large camera uploads are
+# reduced while decoding (JPEG draft + reduce), see utils/preprocess.py
+DECODE_STATS = {
+    "count": 0,
+    "decode_ms_total": 0.0,
+    "decode_ms_max": 0.0,
+    "resize_ms_total": 0.0,
+    "source_megapixels_total": 0.0,
+}
+DECODE_STATS_LOCK = threading.Lock()
+
+def load_pixels(image):
+    """Decode to uint8 224x224 RGB and record decode timings"""
+    pixels, info = decode_image(image)
+    METRICS.observe_stage("decode", info["decode_ms"] / 1000.0)
+    METRICS.observe_stage("resize", info["resize_ms"] / 1000.0)
+    width, height = info["source_size"]
+    with DECODE_STATS_LOCK:
+        DECODE_STATS["count"] += 1
+        DECODE_STATS["decode_ms_total"] += info["decode_ms"]
+        DECODE_STATS["decode_ms_max"] = max(DECODE_STATS["decode_ms_max"], info["decode_ms"])
+        DECODE_STATS["resize_ms_total"] += info["resize_ms"]
+        DECODE_STATS["source_megapixels_total"] += width * height / 1e6
+    return pixels
+
+def decode_stats():
+    with DECODE_STATS_LOCK:
+        n = DECODE_STATS["count"] or 1
+        return {
+            "count": DECODE_STATS["count"],
+            "mean_decode_ms": round(DECODE_STATS["decode_ms_total"] / n, 3),
+            "max_decode_ms": round(DECODE_STATS["decode_ms_max"], 3),
+            "mean_resize_ms": round(DECODE_STATS["resize_ms_total"] / n, 3),
+            "mean_source_megapixels": round(DECODE_STATS["source_megapixels_total"] / n, 3),
+        }
 
 # ============================================
-# PREDICTION FUNCTION
+# PREDICTION FUNCTIONS
 # ============================================
-def predict_disease(image):
-    """Run model inference on image"""
+def format_prediction(preds):
+    """Turn one row of softmax output into the API response dict"""
+    idx = int(np.argmax(preds))
+    confidence = float(preds[idx])
+    
+    # Get top 5 predictions
+    top_5_indices = np.argsort(preds)[-5:][::-1]
+    top_5 = {
+        CLASS_NAMES[i]: float(preds[i]) 
+        for i in top_5_indices
+    }
+    
+    return {
+        "success": True,
+        "label": CLASS_NAMES[idx],
+        "confidence": confidence,
+        "top_5": top_5
+    }
+
+MODEL_NOT_LOADED = {
+    "success": False,
+    "error": "Model not loaded",
+    "label": "Error",
+    "confidence": 0.0
+}
+
+# Returned with 503 + Retry-After while the background loader is running
+MODEL_LOADING = {
+    "success": False,
+    "error": "Model is loading, try again shortly"
+}
+MODEL_LOADING_RETRY_AFTER = "5"
+
+def model_loading():
+    return MODEL_LOADER.in_progress and BACKEND is None
+
+def prediction_error(e):
+    logger.error(f"Prediction error: {str(e)}")
+    METRICS.inc("errors_total", {"type": type(e).__name__})
+    return {
+        "success": False,
+        "error": str(e),
+        "label": "Error",
+        "confidence": 0.0
+    }
+
+def predict_pixels(pixels, deadline=None):
+    """Run model inference on a decoded uint8 224x224 RGB array.
+
+    Raises Overloaded if admission control sheds the request.
+    """
     try:
-        if MODEL is None:
-            return {
-                "success": False,
-                "error": "Model not loaded",
-                "label": "Error",
-                "confidence": 0.0
-            }
+        if BACKEND is None:
+            return dict(MODEL_NOT_LOADED)
         
-        # Preprocess
-        processed = preprocess_image(image)
+        # Near-duplicate of something already seen?
+        image_hash = phash(pixels) if NEAR_DUP_CACHE.enabled else None
+        if image_hash is not None:
+            cached = NEAR_DUP_CACHE.get(image_hash)
+            if cached is not None:
+                return cached
         
-        # Predict
-        preds = MODEL.predict(processed, verbose=0)[0]
-        idx = int(np.argmax(preds))
-        confidence = float(preds[idx])
+        # Predict (batched together with any concurrent requests). The
+        # array waits in the batcher queue, so it gets its own allocation.
+        with METRICS.time("normalize"):
+            batch = normalize_batch([pixels])
+        with METRICS.time("inference"), PROFILER.tf_trace():
+            preds = BATCHER.submit(batch, deadline=deadline)[0]
         
-        # Get top 5 predictions
-        top_5_indices = np.argsort(preds)[-5:][::-1]
-        top_5 = {
-            CLASS_NAMES[i]: float(preds[i]) 
-            for i in top_5_indices
-        }
+        with METRICS.time("postprocess"):
+            result = format_prediction(preds)
+        if image_hash is not None:
+            NEAR_DUP_CACHE.put(image_hash, result)
+        return result
+    except Overloaded:
+        raise
+    except Exception as e:
+        return prediction_error(e)
+
+def predict_disease(image, deadline=None):
+    """Run model inference on image"""
+    try:
+        if BACKEND is None:
+            return dict(MODEL_NOT_LOADED)
         
-        return {
-            "success": True,
-            "label": CLASS_NAMES[idx],
-            "confidence": confidence,
-            "top_5": top_5
-        }
+        # Preprocess
+        pixels = load_pixels(image)
     except Exception as e:
-        logger.error(f"Prediction error: {str(e)}")
-        return {
-            "success": False,
-            "error": str(e),
-            "label": "Error",
-            "confidence": 0.0
-        }
+        return prediction_error(e)
+    
+    return predict_pixels(pixels, deadline)
+
+def predict_many(images, deadline=None):
+    """Run inference on a list of PIL images in vectorized chunks.
+
+    Returns one result dict per input, in input order. An image that fails
+    to preprocess gets an error entry without affecting the rest. Chunks go
+    through the micro-batcher like single predictions, so the queue bound
+    and deadline apply; raises Overloaded if a chunk is shed.
+    """
+    results = [None] * len(images)
+    ready = []  # (position, uint8 pixels)
+    
+    hashes = {}
+    
+    for pos, image in enumerate(images):
+        try:
+            pixels = load_pixels(image)
+        except Exception as e:
+            results[pos] = {"success": False, "error": str(e)}
+            continue
+        if NEAR_DUP_CACHE.enabled:
+            hashes[pos] = phash(pixels)
+            cached = NEAR_DUP_CACHE.get(hashes[pos])
+            if cached is not None:
+                results[pos] = cached
+                continue
+        ready.append((pos, pixels))
+    
+    for start in range(0, len(ready), BATCH_CHUNK_SIZE):
+        chunk = ready[start:start + BATCH_CHUNK_SIZE]
+        try:
+            # The per-thread buffer is safe to queue: submit() blocks this
+            # thread until the batcher is done with it
+            with METRICS.time("normalize"):
+                stacked = normalize_batch(
+                    [px for _, px in chunk],
+                    out=BATCH_BUFFERS.get(len(chunk))
+                )
+            with METRICS.time("inference"), PROFILER.tf_trace():
+                preds = BATCHER.submit(stacked, deadline=deadline)
+            with METRICS.time("postprocess"):
+                for (pos, _), row in zip(chunk, preds):
+                    results[pos] = format_prediction(row)
+                    if pos in hashes:
+                        NEAR_DUP_CACHE.put(hashes[pos], results[pos])
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.error(f"Batch prediction error: {str(e)}")
+            METRICS.inc("errors_total", {"type": type(e).__name__})
+            for pos, _ in chunk:
+                results[pos] = {"success": False, "error": str(e)}
+    
+    return results
+
+def read_batch_uploads():
+    """Spool the multipart "images" list and zip "archive" entries.
+
+    Returns (filename, upload, error) triples; an entry rejected by the
+    upload limits carries the error instead of an upload. Reading stops
+    after BATCH_MAX_IMAGES entries: one more (filename, None, None) entry
+    marks that the request had too many.
+    """
+    uploads = []
+    
+    def add(name, stream):
+        try:
+            with METRICS.time("upload_read"):
+                uploads.append((name, UPLOAD_GUARD.spool(stream), None))
+        except UploadRejected as e:
+            METRICS.inc("errors_total", {"type": e.reason})
+            uploads.append((name, None, str(e)))
+    
+    def full(name):
+        # Stop before spooling or decompressing anything we would reject
+        if len(uploads) < BATCH_MAX_IMAGES:
+            return False
+        uploads.append((name, None, None))
+        return True
+    
+    try:
+        for file in request.files.getlist("images"):
+            if file.filename == "":
+                continue
+            if full(file.filename):
+                return uploads
+            add(file.filename, file.stream)
+        
+        for file in request.files.getlist("archive"):
+            with zipfile.ZipFile(file.stream) as archive:
+                for info in archive.infolist():
+                    name = info.filename
+                    if info.is_dir() or name.startswith("__MACOSX/"):
+                        continue
+                    if os.path.basename(name).startswith("."):
+                        continue
+                    if full(name):
+                        return uploads
+                    # Entries are decompressed through the same bounded spool,
+                    # so a zip bomb stops at UPLOAD_MAX_BYTES
+                    with archive.open(info) as member:
+                        add(name, member)
+    except BaseException:
+        close_uploads(uploads)
+        raise
+    
+    return uploads
+
+def close_uploads(uploads):
+    """Release the spool of every upload read by read_batch_uploads"""
+    for _, upload, _ in uploads:
+        if upload is not None:
+            upload.close()
+
+# ============================================
+# PROFILING (OPT-IN)
+# ============================================
+# PROFILE_SAMPLE_RATE profiles that fraction of prediction requests; with
+# PROFILE_ADMIN_TOKEN set, a request sending it in X-Profile-Token is always
+# profiled and may ask for X-Debug-Timing. Captures go to PROFILE_DIR
+# (newest PROFILE_MAX_CAPTURES kept), see utils/profiling.py.
+PROFILER = RequestProfiler(
+    out_dir=os.environ.get('PROFILE_DIR', 'profiles'),
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+    admin_token=os.environ.get('PROFILE_ADMIN_TOKEN', ''),
+    max_captures=int(os.environ.get('PROFILE_MAX_CAPTURES', '20')),
+    tf_trace=os.environ.get('PROFILE_TF_TRACE', '1') == '1'
+)
+# PROFILE_DEBUG_TIMING=1 allows X-Debug-Timing without the admin token
+PROFILE_DEBUG_TIMING = os.environ.get('PROFILE_DEBUG_TIMING', '0') == '1'
+PROFILED_ENDPOINTS = ("api_predict", "api_predict_batch")
+
+# ============================================
+# ADMISSION RESPONSES
+# ============================================
+
+def shed_response(reason, retry_after, status, message):
+    METRICS.inc("requests_shed_total", {"reason": reason})
+    return jsonify({
+        "success": False,
+        "error": message
+    }), status, {"Retry-After": str(retry_after)}
+
+def rate_limit(cost=1):
+    """None if the client may proceed, else a 429 response"""
+    allowed, retry_after = RATE_LIMITER.acquire(
+        client_key(request.remote_addr, request.headers.get("X-Forwarded-For")), cost
+    )
+    if allowed:
+        return None
+    return shed_response("rate_limited", retry_after, 429, "Too many requests, slow down")
+
+# ============================================
+# REQUEST METRICS
+# ============================================
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    METRICS.inc("requests_in_flight")
+
+@app.after_request
+def count_request(response):
+    METRICS.inc("requests_total", {
+        "endpoint": request.url_rule.rule if request.url_rule else "unmatched",
+        "status": response.status_code
+    })
+    return response
+
+@app.before_request
+def start_profiling():
+    if request.endpoint not in PROFILED_ENDPOINTS:
+        return
+    token = request.headers.get("X-Profile-Token")
+    if request.headers.get("X-Debug-Timing") and (
+        PROFILE_DEBUG_TIMING or PROFILER.authorized(token)
+    ):
+        g.debug_timing = time.perf_counter()
+        METRICS.start_trace()
+    if PROFILER.enabled and PROFILER.should_profile(token):
+        g.profile = PROFILER.start(request.endpoint)
+
+@app.after_request
+def add_debug_timing(response):
+    """Per-stage breakdown in the JSON body and a Server-Timing header"""
+    capture = g.get("profile")
+    if capture is not None:
+        response.headers["X-Profile-Capture"] = os.path.basename(capture["dir"])
+    start = g.pop("debug_timing", None)
+    if start is None:
+        return response
+    timing = {stage: round(s * 1000.0, 3) for stage, s in METRICS.end_trace().items()}
+    timing["total"] = round((time.perf_counter() - start) * 1000.0, 3)
+    response.headers["Server-Timing"] = ", ".join(
+        f"{stage};dur={ms}" for stage, ms in timing.items()
+    )
+    body = response.get_json(silent=True)
+    if isinstance(body, dict):
+        body["timing_ms"] = timing
+        response.set_data(app.json.dumps(body))
+    return response
+
+@app.teardown_request
+def finish_profiling(exc):
+    capture = g.pop("profile", None)
+    if capture is not None:
+        PROFILER.finish(capture)
+    if "debug_timing" in g:
+        METRICS.end_trace()
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    start = g.pop("request_start", None)
+    if start is None:
+        return
+    METRICS.inc("requests_in_flight", value=-1)
+    METRICS.observe(
+        "request_latency_seconds",
+        time.perf_counter() - start,
+        {"endpoint": request.url_rule.rule if request.url_rule else "unmatched"}
+    )
 
 # ============================================
 # ROUTES
@@ -120,6 +587,14 @@ def index():
 def api_predict():
     """API endpoint for predictions"""
     try:
+        if model_loading():
+            return jsonify(MODEL_LOADING), 503, {"Retry-After": MODEL_LOADING_RETRY_AFTER}
+        
+        limited = rate_limit()
+        if limited is not None:
+            return limited
+        deadline = request_deadline()
+        
         # Check if image file is present
         if "image" not in request.files:
             return jsonify({
@@ -135,40 +610,225 @@ def api_predict():
                 "error": "No file selected"
             }), 400
         
-        # Load image
-        img = Image.open(BytesIO(file.read()))
-        
-        # Predict
-        result = predict_disease(img)
+        # Stream into a bounded buffer (hashing as we go); nothing is
+        # decoded until the header passes the pixel/memory limits
+        with METRICS.time("upload_read"):
+            upload = UPLOAD_GUARD.spool(file.stream)
+        try:
+            def compute():
+                return predict_disease(UPLOAD_GUARD.open_image(upload.stream), deadline)
+            
+            # Repeat uploads are served from cache; concurrent identical
+            # uploads share a single inference
+            result = PREDICTION_CACHE.get_or_compute(
+                digest_key(upload.digest, MODEL_FINGERPRINT),
+                compute,
+                should_cache=is_cacheable
+            )
+        finally:
+            upload.close()
         
-        return jsonify(result)
+        with METRICS.time("serialize"):
+            return jsonify(result)
+    
+    except Overloaded as e:
+        return shed_response(e.reason, e.retry_after, 503, str(e))
+    
+    except UploadRejected as e:
+        METRICS.inc("errors_total", {"type": e.reason})
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), e.status
     
     except Exception as e:
         logger.error(f"API error: {str(e)}")
+        METRICS.inc("errors_total", {"type": type(e).__name__})
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+@app.route("/api/predict/batch", methods=["POST"])
+def api_predict_batch():
+    """Predict many images at once (multipart "images" list and/or "archive" zip)"""
+    # Must be set before the body is parsed
+    request.max_content_length = BATCH_MAX_CONTENT_LENGTH
+    try:
+        if model_loading():
+            return jsonify(MODEL_LOADING), 503, {"Retry-After": MODEL_LOADING_RETRY_AFTER}
+        if BACKEND is None:
+            return jsonify({
+                "success": False,
+                "error": "Model not loaded"
+            }), 503
+        
+        try:
+            uploads = read_batch_uploads()
+        except zipfile.BadZipFile:
+            return jsonify({
+                "success": False,
+                "error": "Archive is not a valid zip file"
+            }), 400
+        
+        try:
+            if not uploads:
+                return jsonify({
+                    "success": False,
+                    "error": "No image files provided"
+                }), 400
+            
+            limited = rate_limit(cost=len(uploads))
+            if limited is not None:
+                return limited
+            
+            if len(uploads) > BATCH_MAX_IMAGES:
+                return jsonify({
+                    "success": False,
+                    "error": f"Too many images. Max per batch: {BATCH_MAX_IMAGES}"
+                }), 413
+            
+            deadline = request_deadline()
+            results = [None] * len(uploads)
+            keys = {}
+            
+            # Serve cached items; open the rest (files that fail the upload
+            # limits or can't be read become per-item errors)
+            pending = []
+            images = []
+            for pos, (_, upload, error) in enumerate(uploads):
+                if upload is None:
+                    results[pos] = {"success": False, "error": error}
+                    continue
+                keys[pos] = digest_key(upload.digest, MODEL_FINGERPRINT)
+                cached = PREDICTION_CACHE.get(keys[pos])
+                if cached is not None:
+                    results[pos] = cached
+                    continue
+                try:
+                    images.append(UPLOAD_GUARD.open_image(upload.stream))
+                    pending.append(pos)
+                except UploadRejected as e:
+                    METRICS.inc("errors_total", {"type": e.reason})
+                    results[pos] = {"success": False, "error": str(e)}
+            
+            for pos, result in zip(pending, predict_many(images, deadline)):
+                results[pos] = result
+                if is_cacheable(result):
+                    PREDICTION_CACHE.put(keys[pos], result)
+        finally:
+            close_uploads(uploads)
+        
+        for pos, (filename, _, _) in enumerate(uploads):
+            results[pos] = {"index": pos, "filename": filename, **results[pos]}
+        
+        return jsonify({
+            "success": True,
+            "count": len(results),
+            "failed": sum(1 for r in results if not r["success"]),
+            "results": results
+        })
+    
+    except Overloaded as e:
+        return shed_response(e.reason, e.retry_after, 503, str(e))
+    
+    except Exception as e:
+        logger.error(f"Batch API error: {str(e)}")
+        METRICS.inc("errors_total", {"type": type(e).__name__})
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+def admission_stats():
+    """Queue bound, deadline and shed/queued counters"""
+    batcher = BATCHER.stats() if BATCHER is not None else {}
+    return {
+        "max_queue": ADMISSION_MAX_QUEUE,
+        "deadline_ms": REQUEST_DEADLINE_MS,
+        "queue_depth": batcher.get("queue_depth", 0),
+        "queued": batcher.get("admitted", 0),
+        "shed": {
+            **batcher.get("shed", {}),
+            "rate_limited": RATE_LIMITER.limited,
+        },
+        "rate_limit": RATE_LIMITER.stats(),
+    }
+
+def health_status():
+    """Health payload, shared with the ASGI server (asgi_app.py)"""
+    if BACKEND is not None:
+        model_status = "loaded"
+    elif model_loading():
+        model_status = "loading"
+    else:
+        model_status = "not_loaded"
+    return {
+        "status": "ok",
+        "model": model_status,
+        "classes": len(CLASS_NAMES),
+        "backend": BACKEND.describe() if BACKEND is not None else MODEL_BACKEND,
+        "batching": BATCHER.stats() if BATCHER is not None else None,
+        "cache": PREDICTION_CACHE.stats(),
+        "near_duplicate_cache": NEAR_DUP_CACHE.stats(),
+        "decode": decode_stats(),
+        "uploads": UPLOAD_GUARD.stats(),
+        "startup": MODEL_LOADER.status(),
+        "profiling": PROFILER.stats(),
+        "admission": admission_stats()
+    }
+
 @app.route("/api/health", methods=["GET"])
 def health():
     """Health check endpoint"""
-    model_status = "loaded" if MODEL is not None else "not_loaded"
-    return jsonify({
-        "status": "ok",
-        "model": model_status,
-        "classes": len(CLASS_NAMES)
+    return jsonify(health_status())
+
+@app.route("/api/ready", methods=["GET"])
+def ready():
+    """Readiness probe: 200 only once the model is loaded and warmed up"""
+    status = MODEL_LOADER.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+def metrics_text():
+    """Prometheus exposition, shared with the ASGI server (asgi_app.py)"""
+    memory = process_memory()
+    model_bytes = None
+    if BACKEND is not None and os.path.isfile(BACKEND.model_path):
+        model_bytes = os.path.getsize(BACKEND.model_path)
+    return METRICS.render(gauges={
+        "model_loaded": 1 if BACKEND is not None else 0,
+        "model_file_bytes": model_bytes,
+        "process_resident_memory_bytes": memory["rss"],
+        "process_peak_resident_memory_bytes": memory["peak_rss"],
+        "batcher_queue_depth": BATCHER.stats()["queue_depth"] if BATCHER is not None else None,
+        "prediction_cache_entries": PREDICTION_CACHE.stats()["entries"],
     })
 
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    """Prometheus metrics: per-stage latency, requests, errors, memory"""
+    return Response(metrics_text(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/batching", methods=["GET"])
+def batching_stats():
+    """Micro-batcher queue depth and realized batch sizes"""
+    if BATCHER is None:
+        return jsonify({
+            "success": False,
+            "error": "Model not loaded"
+        }), 503
+    return jsonify(BATCHER.stats())
+
 # ============================================
 # ERROR HANDLERS
 # ============================================
 
 @app.errorhandler(413)
 def too_large(e):
+    limit = request.max_content_length or app.config['MAX_CONTENT_LENGTH']
     return jsonify({
         "success": False,
-        "error": "File too large. Max size: 16MB"
+        "error": f"File too large. Max size: {limit // (1024 * 1024)}MB"
     }), 413
 
 @app.errorhandler(404)
@@ -192,7 +852,7 @@ if __name__ == "__main__":
     print("\n" + "="*60)
     print("🏥 DermAI - Skin Disease Detection")
     print("="*60)
-    print(f"Model Status: {'✓ Loaded' if MODEL else '✗ Not Loaded'}")
+    print(f"Model Status: {MODEL_LOADER.state} ({MODEL_BACKEND}, readiness at /api/ready)")
     print(f"Classes: {len(CLASS_NAMES)}")
     print("\n📱 Server running at: http://localhost:5000")
     print("="*60 + "\n")
@@ -0,0 +1,261 @@
+"""
+DermAI - Skin Disease Detection App
+Async (ASGI) server with the same /api/predict and /api/health contract
+
+Network I/O runs on the event loop, so slow uploads don't hold a worker.
+Spooling and decoding run on a thread pool, and inference is dispatched to a
+bounded executor feeding the shared micro-batcher. One process serves many
+slow clients with a single copy of the model.
+
+Run:
+    pip install starlette uvicorn python-multipart
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import contextlib
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, Response
+from starlette.routing import Route
+
+# Model, caches, limits and prediction logic are shared with the Flask app;
+# importing it starts loading the model once for this process
+import app_flask
+from utils.batching import Overloaded
+from utils.cache import digest_key
+from utils.ingest import UploadRejected
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONCURRENCY LIMITS
+# ============================================
+# Threads blocked in inference (waiting on the micro-batcher). More than
+# BATCH_MAX_SIZE buys nothing: the batcher can't run them together.
+INFERENCE_WORKERS = int(os.environ.get(
+    'ASYNC_INFERENCE_WORKERS', str(max(app_flask.BATCH_MAX_SIZE, 1))
+))
+# Requests allowed to wait for an inference slot before getting a 503
+INFERENCE_QUEUE = int(os.environ.get('ASYNC_INFERENCE_QUEUE', '64'))
+
+INFERENCE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=INFERENCE_WORKERS, thread_name_prefix="inference"
+)
+_inference_slots = None
+
+def inference_slots():
+    """Semaphore bounding queued + running inferences (created on the loop)"""
+    global _inference_slots
+    if _inference_slots is None:
+        _inference_slots = asyncio.Semaphore(INFERENCE_WORKERS + INFERENCE_QUEUE)
+    return _inference_slots
+
+def error(message, status, retry_after=None):
+    headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+    return JSONResponse({"success": False, "error": message}, status_code=status, headers=headers)
+
+def shed(reason, message, status, retry_after):
+    app_flask.METRICS.inc("requests_shed_total", {"reason": reason})
+    return error(message, status, retry_after)
+
+class BodyTooLarge(Exception):
+    """Request body passed the size limit while it was being received"""
+
+def limited_request(request, limit):
+    """The same request with its body cut off at ``limit`` bytes, so a body
+    without Content-Length (chunked) can't be spooled past the limit"""
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > limit:
+                raise BodyTooLarge()
+        return message
+
+    return Request(request.scope, receive)
+
+# ============================================
+# ROUTES
+# ============================================
+async def index(request):
+    """Serve main HTML page"""
+    return FileResponse("index.html", media_type="text/html")
+
+async def api_predict(request):
+    """API endpoint for predictions"""
+    upload = None
+    form = None
+    try:
+        if app_flask.model_loading():
+            return JSONResponse(
+                app_flask.MODEL_LOADING, status_code=503,
+                headers={"Retry-After": app_flask.MODEL_LOADING_RETRY_AFTER}
+            )
+
+        allowed, retry_after = app_flask.RATE_LIMITER.acquire(app_flask.client_key(
+            request.client.host if request.client else None,
+            request.headers.get("x-forwarded-for")
+        ))
+        if not allowed:
+            return shed("rate_limited", "Too many requests, slow down", 429, retry_after)
+        deadline = app_flask.request_deadline()
+
+        max_length = app_flask.app.config['MAX_CONTENT_LENGTH']
+        length = request.headers.get("content-length")
+        if length:
+            try:
+                length = int(length)
+            except ValueError:
+                return error("Invalid Content-Length header", 400)
+            if length > max_length:
+                return error("File too large. Max size: 16MB", 413)
+
+        # Body is received asynchronously; file parts are spooled by the
+        # parser, which stops at the size limit even without Content-Length
+        try:
+            form = await limited_request(request, max_length).form(max_files=1, max_fields=16)
+        except BodyTooLarge:
+            return error("File too large. Max size: 16MB", 413)
+        except HTTPException as e:
+            # Malformed multipart or too many parts
+            return error(e.detail, e.status_code)
+        file = form.get("image")
+        if not isinstance(file, UploadFile):
+            return error("No image file provided", 400)
+        if not file.filename:
+            return error("No file selected", 400)
+
+        start = time.perf_counter()
+        upload = await run_in_threadpool(app_flask.UPLOAD_GUARD.spool, file.file)
+        app_flask.METRICS.observe_stage("upload_read", time.perf_counter() - start)
+        key = digest_key(upload.digest, app_flask.MODEL_FINGERPRINT)
+
+        cached = app_flask.PREDICTION_CACHE.get(key)
+        if cached is not None:
+            return JSONResponse(cached)
+
+        if app_flask.BACKEND is None:
+            return JSONResponse(dict(app_flask.MODEL_NOT_LOADED))
+
+        # Header checks and decode on the thread pool
+        image = await run_in_threadpool(app_flask.UPLOAD_GUARD.open_image, upload.stream)
+        try:
+            pixels = await run_in_threadpool(app_flask.load_pixels, image)
+        except Exception as e:
+            return JSONResponse(app_flask.prediction_error(e))
+
+        slots = inference_slots()
+        if slots.locked():
+            return shed("queue_full", "Server busy, try again shortly", 503, 1)
+        async with slots:
+            # Concurrent identical uploads share a single inference, as in
+            # the Flask app (the miss was already counted above)
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                INFERENCE_EXECUTOR, functools.partial(
+                    app_flask.PREDICTION_CACHE.get_or_compute,
+                    key,
+                    lambda: app_flask.predict_pixels(pixels, deadline),
+                    should_cache=app_flask.is_cacheable,
+                    counted=True
+                )
+            )
+        return JSONResponse(result)
+
+    except Overloaded as e:
+        return shed(e.reason, str(e), 503, e.retry_after)
+    except UploadRejected as e:
+        app_flask.METRICS.inc("errors_total", {"type": e.reason})
+        return error(str(e), e.status)
+    except Exception as e:
+        logger.error(f"API error: {str(e)}")
+        app_flask.METRICS.inc("errors_total", {"type": type(e).__name__})
+        return error(str(e), 500)
+    finally:
+        if upload is not None:
+            upload.close()
+        if form is not None:
+            await form.close()
+
+async def health(request):
+    """Health check endpoint"""
+    status = app_flask.health_status()
+    status["server"] = {
+        "mode": "asgi",
+        "inference_workers": INFERENCE_WORKERS,
+        "inference_queue": INFERENCE_QUEUE,
+    }
+    return JSONResponse(status)
+
+async def metrics(request):
+    """Prometheus metrics: per-stage latency, requests, errors, memory"""
+    text = await run_in_threadpool(app_flask.metrics_text)
+    return Response(text, media_type="text/plain; version=0.0.4")
+
+async def ready(request):
+    """Readiness probe: 200 only once the model is loaded and warmed up"""
+    status = app_flask.MODEL_LOADER.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+ENDPOINTS = ("/", "/api/predict", "/api/health", "/api/ready", "/api/metrics")
+
+async def record_request(request, call_next):
+    """Request count, latency and in-flight gauge (same series as the Flask app)"""
+    endpoint = request.url.path if request.url.path in ENDPOINTS else "unmatched"
+    start = time.perf_counter()
+    app_flask.METRICS.inc("requests_in_flight")
+    try:
+        response = await call_next(request)
+    finally:
+        app_flask.METRICS.inc("requests_in_flight", value=-1)
+        app_flask.METRICS.observe(
+            "request_latency_seconds", time.perf_counter() - start, {"endpoint": endpoint}
+        )
+    app_flask.METRICS.inc("requests_total", {"endpoint": endpoint, "status": response.status_code})
+    return response
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    INFERENCE_EXECUTOR.shutdown(wait=False)
+
+async def not_found(request, exc):
+    return error("Endpoint not found", 404)
+
+async def server_error(request, exc):
+    return error("Server error", 500)
+
+app = Starlette(
+    routes=[
+        Route("/", index),
+        Route("/api/predict", api_predict, methods=["POST"]),
+        Route("/api/health", health, methods=["GET"]),
+        Route("/api/ready", ready, methods=["GET"]),
+        Route("/api/metrics", metrics, methods=["GET"]),
+    ],
+    middleware=[Middleware(BaseHTTPMiddleware, dispatch=record_request)],
+    exception_handlers={404: not_found, 500: server_error},
+    lifespan=lifespan,
+)
+
+# ============================================
+# RUN SERVER
+# ============================================
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="localhost", port=5000)
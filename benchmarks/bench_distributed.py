@@ -0,0 +1,154 @@
+"""
+Multi-worker training throughput: scaling efficiency from 1 to N workers.
+
+For each worker count, that many local worker processes (utils/distributed.py)
+train the fine-tuning stage of train_mobilenet_finetune.py (MobileNetV2 with
+the last 30 layers unfrozen) on synthetic images for a fixed number of steps.
+The per-worker batch is fixed, so the global batch grows with the workers
+(weak scaling, as in the training script):
+
+    speedup     = images/s with N workers / images/s with 1 worker
+    efficiency  = speedup / N
+
+Usage:
+    python benchmarks/bench_distributed.py
+    python benchmarks/bench_distributed.py --num-workers 1 2 4 --steps 30 --output dist_bench.json
+
+Local workers share the machine's CPUs (each is pinned to its own slice), so
+on one box this measures the cost of synchronisation and the split cores;
+run the training script with --workers across hosts for real scale-out.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.distributed import launch_local  # noqa: E402
+
+
+# ============================================
+# WORKER (one process per worker)
+# ============================================
+def worker(args):
+    from utils.distributed import distribute, setup_strategy
+
+    strategy, num_workers, index = setup_strategy(args.workers, args.worker_index)
+
+    import tensorflow as tf
+    from utils.data_pipeline import make_array_dataset
+
+    global_batch = args.per_worker_batch * num_workers
+    with strategy.scope():
+        base = tf.keras.applications.MobileNetV2(weights=None, include_top=False, input_shape=(224, 224, 3))
+        for layer in base.layers[:-30]:
+            layer.trainable = False
+        x = tf.keras.layers.GlobalAveragePooling2D()(base.output)
+        x = tf.keras.layers.Dense(256, activation="relu")(x)
+        x = tf.keras.layers.Dropout(0.5)(x)
+        out = tf.keras.layers.Dense(args.classes, activation="softmax")(x)
+        model = tf.keras.Model(base.input, out)
+        model.compile(optimizer=tf.keras.optimizers.Adam(1e-5 * num_workers),
+                      loss="categorical_crossentropy")
+
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 256, (args.images, 224, 224, 3), dtype=np.uint8)
+    labels = rng.integers(0, args.classes, args.images).astype(np.int64)
+    dataset = distribute(
+        strategy,
+        lambda batch_size, shard: make_array_dataset(
+            images, labels, args.classes, batch_size=batch_size, shuffle=True, seed=0,
+            repeat=True, shard=shard, augment=dict(rotation_range=30, zoom_range=0.2, horizontal_flip=True)
+        ),
+        global_batch
+    )
+
+    class Timer(tf.keras.callbacks.Callback):
+        def on_train_batch_begin(self, batch, logs=None):
+            if batch == args.warmup:
+                self.start = time.perf_counter()
+
+        def on_train_end(self, logs=None):
+            self.seconds = time.perf_counter() - self.start
+
+    timer = Timer()
+    model.fit(dataset, steps_per_epoch=args.warmup + args.steps, epochs=1, verbose=0, callbacks=[timer])
+    if index == 0:
+        print(json.dumps({
+            "workers": num_workers,
+            "global_batch": global_batch,
+            "steps": args.steps,
+            "seconds": timer.seconds,
+            "images_per_s": global_batch * args.steps / timer.seconds,
+        }))
+
+
+# ============================================
+# DRIVER
+# ============================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--num-workers", dest="counts", type=int, nargs="+", default=None,
+                        help="Worker counts to measure (default: 1, 2, 4 ... up to the CPU count)")
+    parser.add_argument("--per-worker-batch", type=int, default=16)
+    parser.add_argument("--steps", type=int, default=20, help="Timed steps per run")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--images", type=int, default=512, help="Synthetic images per run")
+    parser.add_argument("--classes", type=int, default=10)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    # Set for worker processes by launch_local
+    parser.add_argument("--workers", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-index", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.workers is not None:
+        worker(args)
+        return
+
+    counts = args.counts
+    if not counts:
+        cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+        counts = [n for n in (1, 2, 4, 8, 16) if n <= max(cpus, 1)]
+
+    argv = [os.path.abspath(__file__), "--per-worker-batch", str(args.per_worker_batch),
+            "--steps", str(args.steps), "--warmup", str(args.warmup),
+            "--images", str(args.images), "--classes", str(args.classes)]
+    results = []
+    for n in counts:
+        print(f"Workers: {n}")
+        code, out = launch_local(argv, n, capture_chief=True, env={"TF_CPP_MIN_LOG_LEVEL": "2"})
+        if code:
+            print(f"  run with {n} workers failed (exit {code})")
+            continue
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    if not results:
+        sys.exit(1)
+    base = next((r["images_per_s"] for r in results if r["workers"] == 1), results[0]["images_per_s"])
+    print(f"\n{'workers':>7} | {'global batch':>12} | {'img/s':>8} | {'speedup':>7} | {'efficiency':>10}")
+    print("-" * 57)
+    for r in results:
+        r["speedup"] = r["images_per_s"] / base
+        r["efficiency"] = r["speedup"] / r["workers"]
+        print(f"{r['workers']:>7} | {r['global_batch']:>12} | {r['images_per_s']:>8.1f} | "
+              f"{r['speedup']:>6.2f}x | {r['efficiency'] * 100:>9.1f}%")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "cpu_count": os.cpu_count(),
+                "settings": {"per_worker_batch": args.per_worker_batch, "steps": args.steps,
+                             "warmup": args.warmup, "images": args.images},
+                "results": results,
+            }, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
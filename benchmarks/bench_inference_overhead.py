@@ -0,0 +1,107 @@
+"""
+Per-call overhead of Keras model.predict() vs the traced InferenceEngine.
+
+Usage:
+    python benchmarks/bench_inference_overhead.py
+    python benchmarks/bench_inference_overhead.py --model final_skin_disease_model.keras --batch-sizes 1 4 16
+
+Without a model file, a randomly initialised MobileNetV2 with the same head is
+used, which has the same compute profile as the production model.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tensorflow as tf
+
+from utils.inference import InferenceEngine
+
+
+def build_synthetic_model(num_classes=22):
+    """MobileNetV2 + the training head, random weights"""
+    base = tf.keras.applications.MobileNetV2(
+        weights=None, include_top=False, input_shape=(224, 224, 3)
+    )
+    x = tf.keras.layers.GlobalAveragePooling2D()(base.output)
+    x = tf.keras.layers.Dense(256, activation="relu")(x)
+    x = tf.keras.layers.Dropout(0.5)(x)
+    out = tf.keras.layers.Dense(num_classes, activation="softmax")(x)
+    return tf.keras.Model(base.input, out)
+
+
+def time_calls(fn, batch, iters, warmup):
+    for _ in range(warmup):
+        fn(batch)
+    times = []
+    for _ in range(iters):
+        start = time.perf_counter()
+        fn(batch)
+        times.append((time.perf_counter() - start) * 1000.0)
+    times = np.array(times)
+    return {
+        "mean_ms": float(times.mean()),
+        "p50_ms": float(np.percentile(times, 50)),
+        "p95_ms": float(np.percentile(times, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="final_skin_disease_model.keras")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--iters", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    if os.path.exists(args.model):
+        model = tf.keras.models.load_model(args.model)
+        model_name = args.model
+    else:
+        print(f"Model not found at {args.model}; using synthetic MobileNetV2")
+        model = build_synthetic_model()
+        model_name = "synthetic-mobilenetv2"
+
+    engine = InferenceEngine(model)
+    rng = np.random.default_rng(0)
+    results = []
+
+    for bs in args.batch_sizes:
+        batch = rng.random((bs, 224, 224, 3), dtype=np.float32)
+        keras_stats = time_calls(
+            lambda x: model.predict(x, verbose=0), batch, args.iters, args.warmup
+        )
+        engine_stats = time_calls(engine.predict, batch, args.iters, args.warmup)
+        results.append({
+            "batch_size": bs,
+            "keras_predict": keras_stats,
+            "engine": engine_stats,
+            "overhead_saved_ms": keras_stats["mean_ms"] - engine_stats["mean_ms"],
+        })
+
+    print(f"\nModel: {model_name}  TF {tf.__version__}")
+    print(f"{'batch':>5} | {'predict() mean':>14} | {'engine mean':>11} | {'saved/call':>10} | {'speedup':>7}")
+    print("-" * 62)
+    for r in results:
+        k, e = r["keras_predict"]["mean_ms"], r["engine"]["mean_ms"]
+        print(f"{r['batch_size']:>5} | {k:>11.2f} ms | {e:>8.2f} ms | {k - e:>7.2f} ms | {k / e:>6.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "model": model_name,
+                "tensorflow": tf.__version__,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
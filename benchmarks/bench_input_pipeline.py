@@ -0,0 +1,144 @@
+"""
+Training input throughput: ImageDataGenerator vs the tf.data pipeline.
+
+Both read the same directory with the augmentation used by
+train_mobilenet_finetune.py and are iterated without a model, so the
+numbers are the ceiling each input path can feed the training loop:
+
+    generator   ImageDataGenerator.flow_from_directory (what the scripts used)
+    tf.data     utils/data_pipeline.flow_from_directory
+    tf.data+cache  same, decoded images cached in memory after the first epoch
+
+Usage:
+    python benchmarks/bench_input_pipeline.py
+    python benchmarks/bench_input_pipeline.py --data-dir <SkinDisease dir>/train --batches 100
+    python benchmarks/bench_input_pipeline.py --no-augment --output input_bench.json
+
+Without --data-dir a synthetic dataset of phone-sized JPEGs is generated in
+a temporary directory.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+AUGMENTATION = dict(
+    rotation_range=30,
+    zoom_range=0.2,
+    width_shift_range=0.2,
+    height_shift_range=0.2,
+    horizontal_flip=True,
+)
+
+
+def make_synthetic_dataset(out_dir, classes, per_class, size=(1024, 768), seed=0):
+    rng = np.random.default_rng(seed)
+    for c in range(classes):
+        class_dir = os.path.join(out_dir, f"class_{c}")
+        os.makedirs(class_dir, exist_ok=True)
+        for i in range(per_class):
+            # Smooth gradients + noise compress like photos, unlike pure noise
+            base = np.linspace(0, 255, size[0], dtype=np.float32)[None, :, None]
+            img = base + rng.normal(0, 20, (size[1], size[0], 3))
+            Image.fromarray(np.clip(img, 0, 255).astype(np.uint8)).save(
+                os.path.join(class_dir, f"{i:05d}.jpg"), quality=90
+            )
+
+
+def time_batches(batches, n_batches, warmup):
+    """Images/s over n_batches after warmup batches"""
+    it = iter(batches)
+    for _ in range(warmup):
+        next(it)
+    images = 0
+    start = time.perf_counter()
+    for _ in range(n_batches):
+        x, _ = next(it)
+        images += len(x)
+    seconds = time.perf_counter() - start
+    return {"images": images, "seconds": seconds, "images_per_s": images / seconds}
+
+
+def bench_generator(args, augment):
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+    datagen = ImageDataGenerator(rescale=1. / 255, fill_mode="nearest", **augment)
+    flow = datagen.flow_from_directory(
+        args.data_dir, target_size=(224, 224), batch_size=args.batch_size,
+        class_mode="categorical", shuffle=True, seed=0,
+    )
+    return time_batches(flow, args.batches, args.warmup)
+
+
+def bench_tfdata(args, augment, cache=False):
+    from utils.data_pipeline import flow_from_directory
+    data = flow_from_directory(
+        args.data_dir, batch_size=args.batch_size, augment=augment, shuffle=True,
+        seed=0, cache=cache,
+    )
+    warmup = args.warmup
+    if cache:
+        # Fill the cache first so the timed batches come from memory
+        warmup += len(data)
+    return time_batches(data.dataset.repeat().as_numpy_iterator(), args.batches, warmup)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data-dir", help="Class-per-directory image tree (default: synthetic)")
+    parser.add_argument("--synthetic-classes", type=int, default=4)
+    parser.add_argument("--synthetic-per-class", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batches", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--no-augment", action="store_true")
+    parser.add_argument("--skip-cache", action="store_true", help="Don't measure tf.data+cache")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if not args.data_dir:
+        tmp_dir = tempfile.mkdtemp(prefix="bench_input_")
+        print(f"Generating synthetic dataset in {tmp_dir}")
+        make_synthetic_dataset(tmp_dir, args.synthetic_classes, args.synthetic_per_class)
+        args.data_dir = tmp_dir
+
+    augment = {} if args.no_augment else AUGMENTATION
+    try:
+        results = {"generator": bench_generator(args, augment)}
+        results["tf.data"] = bench_tfdata(args, augment)
+        if not args.skip_cache:
+            results["tf.data+cache"] = bench_tfdata(args, augment, cache=True)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    baseline = results["generator"]["images_per_s"]
+    print(f"\n{'pipeline':<14} | {'img/s':>8} | {'speedup':>7}")
+    print("-" * 36)
+    for name, r in results.items():
+        print(f"{name:<14} | {r['images_per_s']:>8.1f} | {r['images_per_s'] / baseline:>6.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "data_dir": None if tmp_dir else args.data_dir,
+                "cpu_count": os.cpu_count(),
+                "settings": {"batch_size": args.batch_size, "batches": args.batches,
+                             "warmup": args.warmup, "augment": augment},
+                "results": results,
+            }, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
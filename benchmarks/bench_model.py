@@ -0,0 +1,215 @@
+"""
+Forward-pass microbenchmark across batch sizes, thread settings and backends.
+
+For each (intra-op, inter-op) thread setting a fresh process is started
+(TensorFlow's thread pools can only be configured before first use), and in
+it every backend is timed at every batch size with warm-up and repeated
+trials:
+
+    keras_predict   model.predict(x)
+    keras_call      model(x, training=False)
+    engine          traced InferenceEngine (what the keras backend serves)
+    tflite:<name>   each models/tflite/*.tflite export
+    onnx            models/onnx/skin_disease.onnx via ONNX Runtime
+
+Usage:
+    python benchmarks/bench_model.py
+    python benchmarks/bench_model.py --batch-sizes 1 8 32 --threads 1:1 4:1 0:0 --output model_bench.json
+    python benchmarks/bench_model.py --backends engine tflite onnx --trials 5
+
+Thread settings are intra:inter, 0 meaning the runtime default. Without a
+model file, a randomly initialised MobileNetV2 with the same head is used
+for the Keras backends.
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BACKEND_CHOICES = ("keras_predict", "keras_call", "engine", "tflite", "onnx")
+
+
+# ============================================
+# MEASUREMENT (runs in the child process)
+# ============================================
+def time_trials(fn, batch, warmup, trials, iters):
+    """Median over trials of per-call latency; each trial runs ``iters`` calls"""
+    for _ in range(warmup):
+        fn(batch)
+    per_call = []
+    trial_means = []
+    for _ in range(trials):
+        times = []
+        for _ in range(iters):
+            start = time.perf_counter()
+            fn(batch)
+            times.append((time.perf_counter() - start) * 1000.0)
+        per_call.extend(times)
+        trial_means.append(float(np.mean(times)))
+    per_call = np.array(per_call)
+    mean_ms = float(np.median(trial_means))
+    return {
+        "mean_ms": mean_ms,
+        "p50_ms": float(np.percentile(per_call, 50)),
+        "p95_ms": float(np.percentile(per_call, 95)),
+        "trial_spread_pct": float((max(trial_means) - min(trial_means)) / mean_ms * 100.0),
+        "images_per_s": len(batch) / (mean_ms / 1000.0),
+    }
+
+
+def build_runners(args, intra, inter):
+    """name -> callable(batch) for every requested backend that is available"""
+    runners = {}
+    keras_wanted = {"keras_predict", "keras_call", "engine"} & set(args.backends)
+
+    if keras_wanted:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(intra)
+        tf.config.threading.set_inter_op_parallelism_threads(inter)
+
+        if os.path.exists(args.model):
+            model = tf.keras.models.load_model(args.model)
+        else:
+            from bench_inference_overhead import build_synthetic_model
+            model = build_synthetic_model()
+
+        if "keras_predict" in keras_wanted:
+            runners["keras_predict"] = lambda x: model.predict(x, verbose=0)
+        if "keras_call" in keras_wanted:
+            runners["keras_call"] = lambda x: model(x, training=False).numpy()
+        if "engine" in keras_wanted:
+            from utils.inference import InferenceEngine
+            runners["engine"] = InferenceEngine(model).predict
+
+    if "tflite" in args.backends:
+        from utils.tflite_backend import TFLitePool
+        for path in sorted(glob.glob(os.path.join(args.tflite_dir, "*.tflite"))):
+            pool = TFLitePool(path, pool_size=1, num_threads=intra or -1)
+            name = os.path.splitext(os.path.basename(path))[0]
+            runners[f"tflite:{name}"] = pool.predict
+
+    if "onnx" in args.backends and os.path.exists(args.onnx_model):
+        from utils.backends import load_backend
+        backend = load_backend("onnx", args.onnx_model, num_threads=intra)
+        runners["onnx"] = backend.predict_batch
+
+    return runners
+
+
+def child(args):
+    intra, inter = args.child_threads
+    runners = build_runners(args, intra, inter)
+    rng = np.random.default_rng(0)
+    results = []
+    for name, fn in runners.items():
+        for bs in args.batch_sizes:
+            batch = rng.random((bs, 224, 224, 3), dtype=np.float32)
+            stats = time_trials(fn, batch, args.warmup, args.trials, args.iters)
+            results.append({"backend": name, "batch_size": bs, "intra_op": intra,
+                            "inter_op": inter, **stats})
+            sys.stderr.write(f"  {name:<24} bs={bs:<3} {stats['mean_ms']:8.2f} ms\n")
+    print(json.dumps(results))
+
+
+# ============================================
+# DRIVER
+# ============================================
+def parse_threads(spec):
+    intra, _, inter = spec.partition(":")
+    return int(intra), int(inter or 0)
+
+
+def run_setting(args, intra, inter):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", f"{intra}:{inter}",
+           "--model", os.path.abspath(args.model), "--tflite-dir", os.path.abspath(args.tflite_dir),
+           "--onnx-model", os.path.abspath(args.onnx_model),
+           "--warmup", str(args.warmup), "--trials", str(args.trials), "--iters", str(args.iters),
+           "--batch-sizes", *map(str, args.batch_sizes), "--backends", *args.backends]
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="2")
+    if intra:
+        # Also caps OpenMP/MKL pools used by some builds and by ONNX Runtime
+        env["OMP_NUM_THREADS"] = str(intra)
+    out = subprocess.run(cmd, env=env, cwd=ROOT, stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def machine_info():
+    info = {"cpu_count": os.cpu_count(), "python": sys.version.split()[0]}
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    info["cpu"] = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        info["usable_cpus"] = len(os.sched_getaffinity(0))
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="final_skin_disease_model.keras")
+    parser.add_argument("--tflite-dir", default=os.path.join("models", "tflite"))
+    parser.add_argument("--onnx-model", default=os.path.join("models", "onnx", "skin_disease.onnx"))
+    parser.add_argument("--backends", nargs="+", default=list(BACKEND_CHOICES), choices=BACKEND_CHOICES)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--threads", nargs="+", default=["0:0", "1:1", "2:1", "4:1"],
+                        help="intra:inter thread settings (0 = runtime default)")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--trials", type=int, default=3)
+    parser.add_argument("--iters", type=int, default=10)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--child", dest="child_threads", type=parse_threads, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_threads is not None:
+        child(args)
+        return
+
+    results = []
+    for spec in args.threads:
+        intra, inter = parse_threads(spec)
+        print(f"Threads intra={intra or 'default'} inter={inter or 'default'}")
+        results.extend(run_setting(args, intra, inter))
+
+    print(f"\n{'backend':<24} | {'threads':>7} | {'batch':>5} | {'mean ms':>8} | {'p95 ms':>8} | "
+          f"{'img/s':>8} | {'ms/img':>7}")
+    print("-" * 84)
+    for r in sorted(results, key=lambda r: (r["backend"], r["intra_op"], r["inter_op"], r["batch_size"])):
+        threads = f"{r['intra_op'] or 'd'}:{r['inter_op'] or 'd'}"
+        print(f"{r['backend']:<24} | {threads:>7} | {r['batch_size']:>5} | {r['mean_ms']:>8.2f} | "
+              f"{r['p95_ms']:>8.2f} | {r['images_per_s']:>8.1f} | {r['mean_ms'] / r['batch_size']:>7.2f}")
+
+    best = {}
+    for r in results:
+        if r["backend"] not in best or r["images_per_s"] > best[r["backend"]]["images_per_s"]:
+            best[r["backend"]] = r
+    print("\nBest throughput per backend:")
+    for name, r in sorted(best.items()):
+        print(f"  {name:<24} {r['images_per_s']:8.1f} img/s  (batch {r['batch_size']}, "
+              f"intra {r['intra_op'] or 'default'}, inter {r['inter_op'] or 'default'})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "model": args.model,
+                "machine": machine_info(),
+                "settings": {"warmup": args.warmup, "trials": args.trials, "iters": args.iters},
+                "results": results,
+            }, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Model startup time: cold load from the .keras file vs the persisted graph cache.
+
+Each run is a fresh Python process that imports TensorFlow, loads the keras
+backend and warms up the served batch sizes, i.e. what a restarted
+app_flask.py / gradio_app.py / streamlit_app.py worker pays before its first
+fast request.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --model final_skin_disease_model.keras --runs 5 --output startup.json
+
+Without a model file, a randomly initialised MobileNetV2 with the same head is
+saved to a temporary .keras file and used instead.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def child(model_path, warmup_sizes):
+    """Runs inside the measured process; prints phase timings as JSON"""
+    timings = {}
+    start = time.perf_counter()
+    import tensorflow as tf
+    timings["import_tf_ms"] = (time.perf_counter() - start) * 1000.0
+
+    from utils.backends import load_backend
+
+    t = time.perf_counter()
+    backend = load_backend("keras", model_path)
+    timings["load_ms"] = (time.perf_counter() - t) * 1000.0
+
+    t = time.perf_counter()
+    backend.warmup(warmup_sizes)
+    timings["warmup_ms"] = (time.perf_counter() - t) * 1000.0
+
+    timings["total_ms"] = (time.perf_counter() - start) * 1000.0
+    timings["from_graph_cache"] = backend.describe().get("from_graph_cache", False)
+    timings["tensorflow"] = tf.__version__
+    print(json.dumps(timings))
+
+
+def run_child(model_path, warmup_sizes, graph_cache):
+    env = dict(os.environ, MODEL_GRAPH_CACHE="1" if graph_cache else "0",
+               MODEL_WEIGHT_STORE="0", TF_CPP_MIN_LOG_LEVEL="2")
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--model", model_path,
+         "--warmup-sizes", *map(str, warmup_sizes)],
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def summarize(runs):
+    keys = ("import_tf_ms", "load_ms", "warmup_ms", "total_ms")
+    return {k: sorted(r[k] for r in runs)[len(runs) // 2] for k in keys}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="final_skin_disease_model.keras")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warmup-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.model, args.warmup_sizes)
+        return
+
+    from utils import graph_cache
+
+    model_path = args.model
+    if not os.path.exists(model_path):
+        from bench_inference_overhead import build_synthetic_model
+        print(f"Model not found at {model_path}; using synthetic MobileNetV2")
+        model_path = os.path.join(tempfile.mkdtemp(), "synthetic.keras")
+        build_synthetic_model().save(model_path)
+
+    cold = [run_child(model_path, args.warmup_sizes, graph_cache=False) for _ in range(args.runs)]
+
+    # First cached start builds the cache; it is reported separately
+    cache_dir = graph_cache.default_cache_dir(model_path)
+    had_cache = os.path.isdir(cache_dir)
+    build = run_child(model_path, args.warmup_sizes, graph_cache=True)
+    cached = [run_child(model_path, args.warmup_sizes, graph_cache=True) for _ in range(args.runs)]
+    if not all(r["from_graph_cache"] for r in cached):
+        print("Warning: graph cache was not used (check write permissions next to the model)")
+
+    results = {
+        "cold": summarize(cold),
+        "cache_build": None if had_cache else summarize([build]),
+        "cached": summarize(cached),
+    }
+
+    print(f"\nModel: {model_path}  TF {cold[0]['tensorflow']}  (median of {args.runs} runs)")
+    print(f"{'start':>12} | {'import tf':>10} | {'load':>10} | {'warm-up':>10} | {'total':>10}")
+    print("-" * 64)
+    for name, r in results.items():
+        if r is None:
+            continue
+        print(f"{name:>12} | {r['import_tf_ms']:>7.0f} ms | {r['load_ms']:>7.0f} ms | "
+              f"{r['warmup_ms']:>7.0f} ms | {r['total_ms']:>7.0f} ms")
+    saved = results["cold"]["total_ms"] - results["cached"]["total_ms"]
+    print(f"\nGraph cache saves {saved:.0f} ms per start "
+          f"({results['cold']['total_ms'] / results['cached']['total_ms']:.2f}x)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "model": model_path,
+                "tensorflow": cold[0]["tensorflow"],
+                "warmup_sizes": args.warmup_sizes,
+                "runs": args.runs,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
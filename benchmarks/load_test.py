@@ -0,0 +1,409 @@
+"""
+HTTP load test for /api/predict.
+
+Starts app_flask locally, either in this process (Flask's threaded server)
+or under gunicorn, then drives /api/predict from N concurrent clients with
+synthetic photos drawn from a realistic size mix. Reports throughput,
+latency percentiles, error rate and server memory, and saves everything as
+JSON so runs can be compared across commits and configurations.
+
+    python benchmarks/load_test.py --mode inprocess --concurrency 8 --duration 30
+    python benchmarks/load_test.py --mode gunicorn --workers 2 --concurrency 16 --requests 500
+    python benchmarks/load_test.py --compare benchmarks/results/*.json
+
+Server settings are passed through the environment as usual, e.g.
+BATCH_MAX_SIZE=1 python benchmarks/load_test.py ... The prediction cache is
+disabled unless --cache is given, so repeated images still hit the model.
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from measure_worker_memory import children, smaps_rollup, wait_ready
+
+# name -> (width, height, format); what phones, webcams and the web UI send
+IMAGE_PROFILES = {
+    "phone": (4032, 3024, "JPEG"),
+    "phone_small": (1600, 1200, "JPEG"),
+    "webcam": (1280, 720, "JPEG"),
+    "thumbnail": (640, 480, "JPEG"),
+    "screenshot": (1080, 1080, "PNG"),
+}
+DEFAULT_MIX = "phone:0.3,phone_small:0.2,webcam:0.3,thumbnail:0.15,screenshot:0.05"
+
+# Server settings recorded with each run
+CONFIG_ENV = (
+    "MODEL_BACKEND", "MODEL_PATH", "BATCH_MAX_SIZE", "BATCH_MAX_WAIT_MS",
+    "CACHE_MAX_ENTRIES", "PHASH_CACHE", "GUNICORN_PRELOAD", "TFLITE_THREADS",
+    "ONNX_THREADS", "WARMUP_BATCH_SIZES",
+)
+
+
+# ============================================
+# SYNTHETIC IMAGES
+# ============================================
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition(":")
+        if name not in IMAGE_PROFILES:
+            raise SystemExit(f"Unknown image profile {name!r} (choose from {', '.join(IMAGE_PROFILES)})")
+        mix[name] = float(weight or 1)
+    total = sum(mix.values())
+    return {name: w / total for name, w in mix.items()}
+
+
+def synthetic_photo(rng, width, height, fmt):
+    """Smooth colour field plus sensor noise; compresses like a real photo"""
+    coarse = (rng.random((height // 64 + 2, width // 64 + 2, 3)) * 255).astype(np.uint8)
+    img = Image.fromarray(coarse).resize((width, height), Image.BICUBIC)
+    arr = np.asarray(img, dtype=np.int16)
+    arr = arr + rng.integers(-6, 7, size=arr.shape, dtype=np.int16)
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8)).save(
+        buf, fmt, **({"quality": 90} if fmt == "JPEG" else {})
+    )
+    return buf.getvalue()
+
+
+def build_image_pool(mix, count, seed):
+    rng = np.random.default_rng(seed)
+    names = list(mix)
+    picks = rng.choice(len(names), size=count, p=[mix[n] for n in names])
+    pool = []
+    for i in picks:
+        width, height, fmt = IMAGE_PROFILES[names[i]]
+        pool.append((names[i], synthetic_photo(rng, width, height, fmt)))
+    return pool
+
+
+# ============================================
+# SERVERS
+# ============================================
+class InProcessServer:
+    """app_flask on Werkzeug's threaded server, in a thread of this process"""
+
+    def __init__(self, port):
+        from werkzeug.serving import make_server
+        import app_flask
+
+        self.app_flask = app_flask
+        self.server = make_server("127.0.0.1", port, app_flask.app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.url = f"http://127.0.0.1:{port}"
+
+    def start(self, timeout):
+        self.thread.start()
+        if not self.app_flask.MODEL_LOADER.wait(timeout) or not self.app_flask.MODEL_LOADER.ready:
+            raise RuntimeError(f"Model not ready: {self.app_flask.MODEL_LOADER.status()}")
+
+    def memory(self):
+        mem = smaps_rollup(os.getpid())
+        return {"rss_mb": mem.get("Rss", 0.0), "pss_mb": mem.get("Pss", 0.0), "processes": 1}
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class GunicornServer:
+    """`gunicorn app_flask:app` in a subprocess (uses gunicorn.conf.py)"""
+
+    def __init__(self, port, workers, threads):
+        self.port = port
+        self.workers = workers
+        self.threads = threads
+        self.url = f"http://127.0.0.1:{port}"
+        self.proc = None
+
+    def start(self, timeout):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "app_flask:app",
+             "--bind", f"127.0.0.1:{self.port}", "--workers", str(self.workers),
+             "--threads", str(self.threads), "--timeout", "300"],
+            cwd=ROOT, env=dict(os.environ)
+        )
+        # Each worker loads its own model; give them all time to get ready
+        if not wait_ready(self.url, timeout):
+            raise RuntimeError(f"gunicorn did not become ready in {timeout}s")
+        time.sleep(min(5.0, timeout))
+
+    def memory(self):
+        pids = [self.proc.pid] + children(self.proc.pid)
+        mems = [smaps_rollup(pid) for pid in pids]
+        return {
+            "rss_mb": sum(m.get("Rss", 0.0) for m in mems),
+            "pss_mb": sum(m.get("Pss", 0.0) for m in mems),
+            "processes": len(pids),
+        }
+
+    def stop(self):
+        self.proc.send_signal(signal.SIGTERM)
+        self.proc.wait(timeout=30)
+
+
+class MemorySampler(threading.Thread):
+    """Polls server memory during the run to catch the peak"""
+
+    def __init__(self, server, interval=0.5):
+        super().__init__(daemon=True)
+        self.server = server
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            try:
+                self.samples.append(self.server.memory())
+            except OSError:
+                pass
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+# ============================================
+# LOAD GENERATION
+# ============================================
+def post_image(url, data, timeout):
+    """POST one image; returns (status, success flag)"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; "
+        f"filename=\"x.jpg\"\r\nContent-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    req = urllib.request.Request(
+        url + "/api/predict", data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            return r.status, bool(json.load(r).get("success"))
+    except urllib.error.HTTPError as e:
+        return e.code, False
+
+
+def run_load(url, pool, concurrency, total_requests, duration, timeout):
+    """Closed-loop clients; each sends its next request when the last returns"""
+    samples = []  # (profile, latency_s, status, success)
+    lock = threading.Lock()
+    counter = iter(range(total_requests)) if total_requests else None
+    deadline = time.perf_counter() + duration if duration else None
+
+    def client(offset):
+        i = offset
+        while True:
+            if counter is not None:
+                with lock:
+                    if next(counter, None) is None:
+                        return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            profile, data = pool[i % len(pool)]
+            i += concurrency
+            start = time.perf_counter()
+            try:
+                status, success = post_image(url, data, timeout)
+            except Exception:
+                status, success = 0, False
+            latency = time.perf_counter() - start
+            with lock:
+                samples.append((profile, latency, status, success))
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - start
+
+
+def latency_stats(latencies):
+    if not latencies:
+        return None
+    ms = np.array(latencies) * 1000.0
+    return {
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def summarize(samples, elapsed):
+    ok = [s for s in samples if s[2] == 200 and s[3]]
+    statuses = {}
+    for s in samples:
+        statuses[str(s[2])] = statuses.get(str(s[2]), 0) + 1
+    by_profile = {}
+    for profile in sorted({s[0] for s in samples}):
+        by_profile[profile] = latency_stats([s[1] for s in ok if s[0] == profile])
+    return {
+        "requests": len(samples),
+        "succeeded": len(ok),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "error_rate": 1.0 - len(ok) / len(samples) if samples else 0.0,
+        "status_counts": statuses,
+        "latency": latency_stats([s[1] for s in ok]),
+        "latency_by_profile": by_profile,
+    }
+
+
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ============================================
+# COMPARE
+# ============================================
+def compare(paths):
+    rows = []
+    for path in paths:
+        with open(path) as f:
+            r = json.load(f)
+        lat = r["results"]["latency"] or {}
+        rows.append((
+            os.path.basename(path), r.get("commit") or "-", r["config"]["mode"],
+            r["config"]["concurrency"], r["results"]["throughput_rps"],
+            lat.get("p50_ms", 0.0), lat.get("p95_ms", 0.0), lat.get("p99_ms", 0.0),
+            r["results"]["error_rate"] * 100.0, r["memory"]["peak_rss_mb"],
+        ))
+    print(f"{'run':<40} | {'commit':>8} | {'mode':>9} | {'conc':>4} | {'req/s':>7} | "
+          f"{'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7} | {'err %':>5} | {'RSS MB':>7}")
+    print("-" * 133)
+    for row in rows:
+        print(f"{row[0][:40]:<40} | {row[1]:>8} | {row[2]:>9} | {row[3]:>4} | {row[4]:>7.1f} | "
+              f"{row[5]:>7.1f} | {row[6]:>7.1f} | {row[7]:>7.1f} | {row[8]:>5.1f} | {row[9]:>7.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=["inprocess", "gunicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--port", type=int, default=5077)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=0, help="Total requests (0 = use --duration)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--warmup-requests", type=int, default=10)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="profile:weight,... from " + ", ".join(IMAGE_PROFILES))
+    parser.add_argument("--unique-images", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="Keep the prediction cache enabled")
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--output", help="JSON path (default: benchmarks/results/load-<commit>-<mode>-c<N>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="JSON", help="Print a table of saved runs and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(sorted(p for spec in args.compare for p in glob.glob(spec)))
+        return
+
+    if not args.cache:
+        os.environ["CACHE_MAX_ENTRIES"] = "0"
+    os.environ.setdefault("PHASH_CACHE", "0")
+
+    mix = parse_mix(args.mix)
+    print(f"Generating {args.unique_images} synthetic images ({args.mix})")
+    pool = build_image_pool(mix, args.unique_images, args.seed)
+
+    if args.mode == "inprocess":
+        server = InProcessServer(args.port)
+    else:
+        server = GunicornServer(args.port, args.workers, args.threads)
+    server.start(args.startup_timeout)
+
+    try:
+        if args.warmup_requests:
+            run_load(server.url, pool, min(args.concurrency, args.warmup_requests),
+                     args.warmup_requests, None, args.request_timeout)
+        memory_before = server.memory()
+        sampler = MemorySampler(server)
+        sampler.start()
+        samples, elapsed = run_load(
+            server.url, pool, args.concurrency,
+            args.requests, None if args.requests else args.duration, args.request_timeout
+        )
+        sampler.stop()
+        memory_after = server.memory()
+    finally:
+        server.stop()
+
+    results = summarize(samples, elapsed)
+    peak = max([memory_after] + sampler.samples, key=lambda m: m["rss_mb"])
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "mode": args.mode,
+            "workers": args.workers if args.mode == "gunicorn" else 1,
+            "threads": args.threads if args.mode == "gunicorn" else None,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "duration_s": None if args.requests else args.duration,
+            "mix": mix,
+            "unique_images": args.unique_images,
+            "mean_image_kb": float(np.mean([len(d) for _, d in pool]) / 1024.0),
+            "env": {k: os.environ[k] for k in CONFIG_ENV if k in os.environ},
+        },
+        "results": results,
+        "memory": {
+            "before_rss_mb": memory_before["rss_mb"],
+            "after_rss_mb": memory_after["rss_mb"],
+            "peak_rss_mb": peak["rss_mb"],
+            "after_pss_mb": memory_after["pss_mb"],
+            "processes": memory_after["processes"],
+        },
+    }
+
+    lat = results["latency"] or {}
+    print(f"\n{args.mode}, concurrency {args.concurrency}: {results['requests']} requests in {elapsed:.1f}s")
+    print(f"  throughput  {results['throughput_rps']:.1f} req/s")
+    print(f"  latency     p50 {lat.get('p50_ms', 0):.1f} ms | p95 {lat.get('p95_ms', 0):.1f} ms | "
+          f"p99 {lat.get('p99_ms', 0):.1f} ms")
+    print(f"  errors      {results['error_rate'] * 100:.2f}% {results['status_counts']}")
+    print(f"  server RSS  {memory_before['rss_mb']:.0f} MB -> peak {peak['rss_mb']:.0f} MB "
+          f"({memory_after['processes']} processes)")
+
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results",
+        f"load-{report['commit'] or 'nocommit'}-{args.mode}-c{args.concurrency}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Measure resident memory per gunicorn worker, with and without preloading.
+
+Starts `gunicorn app_flask:app` with N workers in each mode, sends a few
+predictions so every worker has run inference, then reads
+/proc/<pid>/smaps_rollup for the master and each worker (Linux only).
+
+    python benchmarks/measure_worker_memory.py --workers 4
+    python benchmarks/measure_worker_memory.py --workers 4 --modes preload --output mem.json
+
+Rss counts shared pages in every process; Pss splits shared pages between
+the processes mapping them, so sum(Pss) is the real total footprint.
+"""
+
+import argparse
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def smaps_rollup(pid):
+    """Memory fields for a process, in MB"""
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            key = parts[0].rstrip(":")
+            if key in FIELDS:
+                out[key] = int(parts[1]) / 1024.0
+    return out
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def wait_ready(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url + "/api/ready", timeout=2) as r:
+                if json.load(r).get("ready"):
+                    return True
+        except Exception:
+            pass
+        time.sleep(1)
+    return False
+
+
+def post_image(url, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; "
+        f"filename=\"x.jpg\"\r\nContent-Type: image/jpeg\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    req = urllib.request.Request(
+        url + "/api/predict", data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    with urllib.request.urlopen(req, timeout=60) as r:
+        r.read()
+
+
+def measure(mode, workers, port, requests, timeout):
+    env = dict(os.environ)
+    env["GUNICORN_PRELOAD"] = "1" if mode == "preload" else "0"
+    # Unique images so the prediction cache doesn't hide inference
+    env["CACHE_MAX_ENTRIES"] = "0"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app_flask:app",
+         "--bind", f"127.0.0.1:{port}", "--workers", str(workers)],
+        cwd=ROOT, env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        if not wait_ready(url, timeout):
+            raise RuntimeError(f"Server did not become ready in {timeout}s ({mode})")
+        rng = np.random.default_rng(0)
+        for _ in range(requests):
+            buf = io.BytesIO()
+            Image.fromarray((rng.random((480, 640, 3)) * 255).astype(np.uint8)).save(buf, "JPEG")
+            post_image(url, buf.getvalue())
+
+        worker_pids = children(proc.pid)
+        master = smaps_rollup(proc.pid)
+        per_worker = [smaps_rollup(pid) for pid in worker_pids]
+        total_pss = master.get("Pss", 0) + sum(w.get("Pss", 0) for w in per_worker)
+        return {
+            "mode": mode,
+            "workers": len(worker_pids),
+            "master": master,
+            "per_worker": per_worker,
+            "mean_worker_rss_mb": float(np.mean([w["Rss"] for w in per_worker])),
+            "mean_worker_pss_mb": float(np.mean([w["Pss"] for w in per_worker])),
+            "total_pss_mb": total_pss,
+        }
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per gunicorn worker")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", default=["default", "preload"],
+                        choices=["default", "preload"])
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = [
+        measure(mode, args.workers, args.port, args.requests, args.timeout)
+        for mode in args.modes
+    ]
+
+    print(f"\nBackend: {os.environ.get('MODEL_BACKEND', 'keras')}, workers: {args.workers}")
+    print(f"{'mode':<8} | {'worker RSS MB':>13} | {'worker PSS MB':>13} | {'total PSS MB':>12}")
+    print("-" * 56)
+    for r in results:
+        print(f"{r['mode']:<8} | {r['mean_worker_rss_mb']:>13.1f} | "
+              f"{r['mean_worker_pss_mb']:>13.1f} | {r['total_pss_mb']:>12.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
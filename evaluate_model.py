@@ -1,34 +1,36 @@
+import os
 import tensorflow as tf
 import numpy as np
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from sklearn.metrics import classification_report, confusion_matrix
 
+from utils.data_pipeline import flow_from_directory
+
 # -------- PATHS --------
 MODEL_PATH = "skin_disease_cnn_model.h5"
 DATASET_PATH = r"C:\Users\jaanv\.cache\kagglehub\datasets\pacificrm\skindiseasedataset\versions\6\SkinDisease\SkinDisease"
+COMPILED_DIR = os.path.join("data", "compiled")
 
 # -------- LOAD MODEL --------
 model = tf.keras.models.load_model(MODEL_PATH)
 print("Model loaded successfully")
 
-# -------- TEST DATA GENERATOR --------
-test_datagen = ImageDataGenerator(rescale=1./255)
-
-test_generator = test_datagen.flow_from_directory(
-    directory=DATASET_PATH + r"\test",
-    target_size=(224, 224),
+# -------- TEST DATA --------
+# Decoded once into data/compiled/test and memory-mapped afterwards
+test_generator = flow_from_directory(
+    os.path.join(DATASET_PATH, "test"),
+    image_size=(224, 224),
     batch_size=32,
-    class_mode="categorical",
-    shuffle=False
+    shuffle=False,
+    compiled_dir=COMPILED_DIR
 )
 
 # -------- EVALUATION --------
-loss, accuracy = model.evaluate(test_generator)
+loss, accuracy = model.evaluate(test_generator.dataset)
 print(f"\nTest Accuracy: {accuracy*100:.2f}%")
 print(f"Test Loss: {loss:.4f}")
 
 # -------- PREDICTIONS --------
-y_pred = model.predict(test_generator)
+y_pred = model.predict(test_generator.dataset)
 y_pred_classes = np.argmax(y_pred, axis=1)
 y_true = test_generator.classes
 
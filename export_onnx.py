@@ -0,0 +1,53 @@
+"""
+Convert the final Keras model to ONNX for the onnx serving backend.
+
+Requires: pip install tf2onnx onnxruntime
+
+Usage:
+    python export_onnx.py
+    MODEL_BACKEND=onnx python app_flask.py
+"""
+
+import argparse
+import os
+
+import numpy as np
+import tensorflow as tf
+import tf2onnx
+
+from utils.backends import DEFAULT_MODEL_PATHS, OnnxBackend
+
+MODEL_PATH = "final_skin_disease_model.keras"
+OUTPUT_PATH = DEFAULT_MODEL_PATHS["onnx"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Keras model to ONNX")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--opset", type=int, default=13)
+    args = parser.parse_args()
+
+    model = tf.keras.models.load_model(args.model)
+    print("Model loaded successfully.")
+
+    # Dynamic batch dimension so one file serves every batch size
+    spec = (tf.TensorSpec((None, 224, 224, 3), tf.float32, name="image"),)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    tf2onnx.convert.from_keras(
+        model, input_signature=spec, opset=args.opset, output_path=args.output
+    )
+    print(f"Saved {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+    # ---------- parity check against Keras ----------
+    backend = OnnxBackend(args.output).load()
+    batch = np.random.default_rng(0).random((4, 224, 224, 3), dtype=np.float32)
+    expected = model(batch, training=False).numpy()
+    actual = backend.predict_batch(batch)
+    max_diff = float(np.abs(expected - actual).max())
+    same_top1 = bool((expected.argmax(1) == actual.argmax(1)).all())
+    print(f"Parity check: max |Δp| = {max_diff:.2e}, top-1 match = {same_top1}")
+
+
+if __name__ == "__main__":
+    main()
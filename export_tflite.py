@@ -0,0 +1,205 @@
+"""
+Export the final Keras model to quantized TFLite models and compare them.
+
+Produces three models in OUTPUT_DIR:
+  - skin_disease_dynamic.tflite  (dynamic-range: int8 weights, float activations)
+  - skin_disease_float16.tflite  (float16 weights)
+  - skin_disease_int8.tflite     (full integer; calibrated on training images)
+
+Then evaluates the Keras model and every export on the test split and prints
+an accuracy / latency / size comparison table (also saved as JSON).
+
+Usage:
+    python export_tflite.py
+    python export_tflite.py --data-dir <SkinDisease dir> --calib-samples 300 --eval-limit 500
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+from utils.preprocess import preprocess_image
+from utils.tflite_backend import TFLitePool
+
+# =========================
+# PATHS (change if needed)
+# =========================
+MODEL_PATH = "final_skin_disease_model.keras"
+DATASET_DIR = r"C:\Users\jaanv\.cache\kagglehub\datasets\pacificrm\skindiseasedataset\versions\6\SkinDisease\SkinDisease"
+OUTPUT_DIR = os.path.join("models", "tflite")
+
+IMG_SIZE = (224, 224)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif")
+
+
+# =========================
+# DATA HELPERS
+# =========================
+def list_images(split_dir):
+    """(path, class_index) pairs, classes in sorted order like flow_from_directory"""
+    classes = sorted(
+        d for d in os.listdir(split_dir)
+        if os.path.isdir(os.path.join(split_dir, d))
+    )
+    items = []
+    for idx, name in enumerate(classes):
+        class_dir = os.path.join(split_dir, name)
+        for fname in sorted(os.listdir(class_dir)):
+            if fname.lower().endswith(IMAGE_EXTENSIONS):
+                items.append((os.path.join(class_dir, fname), idx))
+    return items, classes
+
+
+def load_image(path):
+    # Same preprocessing as the serving path
+    with Image.open(path) as img:
+        return preprocess_image(img, IMG_SIZE)
+
+
+def representative_sample(train_dir, n_samples, seed=0):
+    """Class-stratified sample of training images for int8 calibration"""
+    items, classes = list_images(train_dir)
+    by_class = {}
+    for path, idx in items:
+        by_class.setdefault(idx, []).append(path)
+
+    rng = random.Random(seed)
+    for paths in by_class.values():
+        rng.shuffle(paths)
+
+    # Round-robin across classes so rare classes are represented too
+    sample = []
+    depth = 0
+    while len(sample) < n_samples and any(len(p) > depth for p in by_class.values()):
+        for idx in sorted(by_class):
+            if depth < len(by_class[idx]) and len(sample) < n_samples:
+                sample.append(by_class[idx][depth])
+        depth += 1
+    return sample
+
+
+# =========================
+# CONVERSION
+# =========================
+def convert(model, mode, calib_paths=None):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if mode == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif mode == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == "int8":
+        def representative_dataset():
+            for path in calib_paths:
+                yield [load_image(path)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        # Keep float32 input/output so serving code and preprocessing don't change
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
+
+    return converter.convert()
+
+
+# =========================
+# EVALUATION
+# =========================
+def evaluate(predict_fn, test_items, latency_runs=50):
+    correct = 0
+    for path, label in test_items:
+        preds = predict_fn(load_image(path))
+        correct += int(np.argmax(preds[0]) == label)
+    accuracy = correct / len(test_items) if test_items else 0.0
+
+    sample = load_image(test_items[0][0]) if test_items else np.zeros((1, 224, 224, 3), np.float32)
+    for _ in range(5):
+        predict_fn(sample)
+    times = []
+    for _ in range(latency_runs):
+        start = time.perf_counter()
+        predict_fn(sample)
+        times.append((time.perf_counter() - start) * 1000.0)
+
+    return {
+        "accuracy": accuracy,
+        "latency_p50_ms": float(np.percentile(times, 50)),
+        "latency_p95_ms": float(np.percentile(times, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export quantized TFLite models")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data-dir", default=DATASET_DIR,
+                        help="Directory containing train/ and test/")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--calib-samples", type=int, default=200)
+    parser.add_argument("--eval-limit", type=int, default=0,
+                        help="Evaluate on at most this many test images (0 = all)")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="TFLite interpreter threads used for evaluation")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    train_dir = os.path.join(args.data_dir, "train")
+    test_dir = os.path.join(args.data_dir, "test")
+
+    model = tf.keras.models.load_model(args.model)
+    print("Model loaded successfully.")
+
+    calib_paths = representative_sample(train_dir, args.calib_samples)
+    print(f"Calibration images: {len(calib_paths)}")
+
+    exports = {}
+    for mode in ("dynamic", "float16", "int8"):
+        print(f"Converting: {mode}")
+        tflite_model = convert(model, mode, calib_paths)
+        out_path = os.path.join(args.output_dir, f"skin_disease_{mode}.tflite")
+        with open(out_path, "wb") as f:
+            f.write(tflite_model)
+        exports[mode] = out_path
+        print(f"  saved {out_path} ({len(tflite_model) / 1e6:.1f} MB)")
+
+    # ---------- comparison on the test split ----------
+    test_items, _ = list_images(test_dir)
+    if args.eval_limit:
+        random.Random(0).shuffle(test_items)
+        test_items = test_items[:args.eval_limit]
+    print(f"\nEvaluating on {len(test_items)} test images...")
+
+    rows = []
+    keras_stats = evaluate(lambda x: model(x, training=False).numpy(), test_items)
+    rows.append({"model": "keras float32", "path": args.model,
+                 "size_mb": os.path.getsize(args.model) / 1e6, **keras_stats})
+
+    for mode, path in exports.items():
+        pool = TFLitePool(path, pool_size=1, num_threads=args.threads)
+        stats = evaluate(pool.predict, test_items)
+        rows.append({"model": f"tflite {mode}", "path": path,
+                     "size_mb": os.path.getsize(path) / 1e6, **stats})
+
+    baseline = rows[0]["accuracy"]
+    print(f"\n{'model':<16} | {'size MB':>7} | {'accuracy':>8} | {'Δ acc':>6} | {'p50 ms':>7} | {'p95 ms':>7}")
+    print("-" * 68)
+    for r in rows:
+        print(f"{r['model']:<16} | {r['size_mb']:>7.1f} | {r['accuracy'] * 100:>7.2f}% | "
+              f"{(r['accuracy'] - baseline) * 100:>+5.2f} | {r['latency_p50_ms']:>7.2f} | "
+              f"{r['latency_p95_ms']:>7.2f}")
+
+    report_path = os.path.join(args.output_dir, "comparison.json")
+    with open(report_path, "w") as f:
+        json.dump({"test_images": len(test_items), "results": rows}, f, indent=2)
+    print(f"\nComparison saved to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 import os
 import tensorflow as tf
 import numpy as np
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from sklearn.metrics import classification_report, confusion_matrix
 
+from utils.data_pipeline import flow_from_directory
+
 # ===============================
 # LOAD FINAL MODEL
 # ===============================
@@ -24,29 +25,28 @@ if not os.path.exists(DATASET_PATH):
     exit()
 
 # ===============================
-# DATA GENERATOR
+# TEST DATA
 # ===============================
-datagen = ImageDataGenerator(rescale=1./255)
-
-test_gen = datagen.flow_from_directory(
+# Decoded once into data/compiled/test and memory-mapped afterwards
+test_gen = flow_from_directory(
     DATASET_PATH,
-    target_size=(224, 224),
+    image_size=(224, 224),
     batch_size=32,
-    class_mode="categorical",
-    shuffle=False
+    shuffle=False,
+    compiled_dir=os.path.join("data", "compiled")
 )
 
 # ===============================
 # EVALUATION
 # ===============================
-loss, acc = model.evaluate(test_gen)
+loss, acc = model.evaluate(test_gen.dataset)
 print("Final Test Accuracy:", round(acc * 100, 2), "%")
 print("Final Test Loss:", round(loss, 4))
 
 # ===============================
 # PREDICTIONS
 # ===============================
-y_pred = model.predict(test_gen)
+y_pred = model.predict(test_gen.dataset)
 y_pred_classes = np.argmax(y_pred, axis=1)
 y_true = test_gen.classes
 
@@ -1,11 +1,12 @@
 import gradio as gr
-import tensorflow as tf
 import numpy as np
-from PIL import Image
 import os
 
-# Load model once
-model = tf.keras.models.load_model('final_skin_disease_model.keras')
+from utils.backends import load_backend
+from utils.preprocess import preprocess_image
+
+# Load model once (MODEL_BACKEND / MODEL_PATH pick the runtime)
+backend = load_backend()
 
 # Disease classes
 DISEASE_CLASSES = [
@@ -42,13 +43,10 @@ def predict_disease(image):
     
     try:
         # Preprocess image
-        img = Image.fromarray(image).convert('RGB')
-        img = img.resize((224, 224))
-        img_array = np.array(img) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
+        img_array = preprocess_image(image)
         
         # Predict
-        predictions = model.predict(img_array, verbose=0)
+        predictions = backend.predict_batch(img_array)
         confidence = np.max(predictions[0])
         disease_idx = np.argmax(predictions[0])
         disease_name = DISEASE_CLASSES[disease_idx]
@@ -0,0 +1,87 @@
+"""
+Gunicorn settings for app_flask.py (picked up automatically from the project root)
+
+GUNICORN_PRELOAD=1 enables fork-safe preloading:
+  - the master imports the app (Flask, NumPy, Pillow, app code) once and
+    forks workers that share those pages copy-on-write;
+  - TensorFlow is never initialised in the master: the app is imported with
+    DEFER_MODEL_LOAD=1 and every worker calls app_flask.init_model() after
+    fork, so each worker starts its own TF thread pools and batcher thread
+    instead of inheriting broken ones;
+  - the keras backend rebuilds the model from the memory-mapped .npy weight
+    store next to the model (built by the master on startup if missing or
+    stale), which loads faster than parsing the .keras zip, but each worker
+    still copies the weights into its own TF variables;
+  - the tflite backend's interpreters mmap the .tflite file directly, so its
+    weights are held once in the page cache and shared by every worker.
+
+Without GUNICORN_PRELOAD every worker starts loading the model on import, as before.
+See DEPLOYMENT.md for measuring memory per worker.
+"""
+
+import os
+import subprocess
+import sys
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "0") == "1"
+
+_BACKEND = os.environ.get("MODEL_BACKEND", "keras").lower()
+
+if preload_app:
+    # Must be set before the master imports app_flask
+    os.environ["DEFER_MODEL_LOAD"] = "1"
+    if _BACKEND == "keras":
+        os.environ.setdefault("MODEL_WEIGHT_STORE", "1")
+
+
+def _model_path():
+    from utils.backends import DEFAULT_MODEL_PATHS
+    return os.environ.get("MODEL_PATH") or DEFAULT_MODEL_PATHS.get(_BACKEND, "")
+
+
+def _prefault(paths):
+    """Read files once so workers map pages already in the page cache"""
+    for path in paths:
+        with open(path, "rb") as f:
+            while f.read(1 << 20):
+                pass
+
+
+def on_starting(server):
+    if not preload_app:
+        return
+    model_path = _model_path()
+    if not os.path.exists(model_path):
+        return
+
+    if _BACKEND == "keras" and os.environ.get("MODEL_WEIGHT_STORE") == "1":
+        from utils import weight_store
+        store_dir = weight_store.default_store_dir(model_path)
+        if not weight_store.is_fresh(model_path, store_dir):
+            # Exported in a subprocess so TensorFlow never loads in the master
+            server.log.info("Building weight store for %s", model_path)
+            subprocess.run(
+                [sys.executable, "-m", "utils.weight_store", model_path],
+                check=False
+            )
+        if weight_store.is_fresh(model_path, store_dir):
+            _prefault(
+                os.path.join(store_dir, name) for name in os.listdir(store_dir)
+            )
+    else:
+        _prefault([model_path])
+
+
+def post_fork(server, worker):
+    # Lets app_flask split the CPUs between workers (utils/cpu_tuning.py)
+    os.environ["SERVING_WORKERS"] = str(server.cfg.workers)
+    os.environ["SERVING_WORKER_INDEX"] = str((worker.age - 1) % server.cfg.workers)
+    if not preload_app:
+        return
+    if "tensorflow" in sys.modules:
+        server.log.warning(
+            "TensorFlow was imported in the gunicorn master; its thread pools "
+            "are not fork-safe. Keep DEFER_MODEL_LOAD=1 with GUNICORN_PRELOAD."
+        )
+    import app_flask
+    app_flask.init_model()
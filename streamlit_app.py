@@ -4,11 +4,13 @@ Streamlit Version - Easy Cloud Deployment
 """
 
 import streamlit as st
-import tensorflow as tf
 import numpy as np
 from PIL import Image
 import os
 
+from utils.backends import load_backend
+from utils.preprocess import preprocess_image
+
 # ============================================
 # PAGE CONFIG
 # ============================================
@@ -50,8 +52,7 @@ st.markdown("""
 @st.cache_resource
 def load_model():
     try:
-        model = tf.keras.models.load_model("final_skin_disease_model.keras")
-        return model
+        return load_backend()
     except Exception as e:
         st.error(f"Error loading model: {str(e)}")
         return None
@@ -70,21 +71,13 @@ CLASSES = [
 # ============================================
 # HELPER FUNCTIONS
 # ============================================
-def preprocess_image(image):
-    """Resize and normalize image"""
-    img = image.resize((224, 224))
-    img_array = np.array(img) / 255.0
-    if len(img_array.shape) == 2:
-        img_array = np.stack([img_array] * 3, axis=-1)
-    return np.expand_dims(img_array, axis=0)
-
 def predict_disease(image):
     """Get prediction from model"""
     if MODEL is None:
         return None, None, None
     
     processed = preprocess_image(image)
-    predictions = MODEL.predict(processed, verbose=0)
+    predictions = MODEL.predict_batch(processed)
     confidence = float(np.max(predictions))
     label = CLASSES[np.argmax(predictions)]
     
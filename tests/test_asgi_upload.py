@@ -0,0 +1,71 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+os.environ.setdefault("DEFER_MODEL_LOAD", "1")
+pytest.importorskip("starlette")
+
+import app_flask  # noqa: E402
+import asgi_app  # noqa: E402
+
+BOUNDARY = "testboundary"
+
+
+def multipart_chunks(total_bytes):
+    yield (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="image"; filename="big.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode()
+    chunk = b"\xff" * 65536
+    for _ in range(total_bytes // len(chunk)):
+        yield chunk
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def post_chunked(path, chunks):
+    """Drive the ASGI app directly with a chunked body (no Content-Length).
+    Returns (status, JSON body, bytes the app pulled from the client)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+        "headers": [
+            (b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode()),
+            (b"transfer-encoding", b"chunked"),
+        ],
+    }
+    chunks = iter(chunks)
+    pulled = 0
+    sent = []
+
+    async def receive():
+        nonlocal pulled
+        chunk = next(chunks, None)
+        if chunk is None:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        pulled += len(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": True}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app.app(scope, receive, send))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return status, json.loads(body), pulled
+
+
+def test_oversized_chunked_upload_is_rejected_while_streaming(monkeypatch):
+    monkeypatch.setattr(app_flask, "model_loading", lambda: False)
+    monkeypatch.setitem(app_flask.app.config, "MAX_CONTENT_LENGTH", 256 * 1024)
+
+    status, body, pulled = post_chunked("/api/predict", multipart_chunks(4 * 1024 * 1024))
+
+    assert status == 413
+    assert body["success"] is False
+    # Rejected part way through, not after spooling the whole body
+    assert pulled < 1024 * 1024
@@ -0,0 +1,27 @@
+import threading
+
+from utils.metrics import Metrics
+
+
+def test_observation_above_last_bucket_lands_in_inf_only():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.observe("latency_seconds", 0.05)
+    metrics.observe("latency_seconds", 20.0)
+
+    lines = metrics.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert "latency_seconds_sum 20.050000" in lines
+    assert "latency_seconds_count 2" in lines
+
+
+def test_dead_thread_states_are_retired_without_scrape():
+    metrics = Metrics()
+    for _ in range(200):
+        t = threading.Thread(target=metrics.inc, args=("requests_total",))
+        t.start()
+        t.join()
+
+    assert len(metrics._states) <= 1
+    assert metrics.snapshot().counters[("requests_total", ())] == 200
@@ -1,53 +1,110 @@
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.applications import MobileNetV2
-from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
+from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout, Input
 from tensorflow.keras.models import Model
 from tensorflow.keras.optimizers import Adam
 from sklearn.utils.class_weight import compute_class_weight
 import numpy as np
+import argparse
+import math
 import os
+import sys
+import tempfile
+
+from utils.bottleneck import cached_features, feature_dataset
+from utils.checkpointing import ResumableTraining
+from utils.data_pipeline import flow_from_directory, with_class_weights
+from utils.distributed import distribute, launch_local, scale_for_workers, setup_strategy, without_option
+
+# =========================
+# COMMAND LINE
+# =========================
+parser = argparse.ArgumentParser(description="Fine-tune MobileNetV2 on the skin disease dataset")
+parser.add_argument("--resume", action="store_true",
+                    help="Continue from the latest checkpoint instead of starting over")
+parser.add_argument("--checkpoint-dir", default=os.path.join("checkpoints", "mobilenet_finetune"))
+parser.add_argument("--checkpoint-every", type=int, default=100,
+                    help="Also checkpoint every N batches within an epoch (0 = epoch ends only)")
+parser.add_argument("--sync-checkpoints", action="store_true",
+                    help="Write checkpoints synchronously instead of in the background")
+parser.add_argument("--workers",
+                    help="Multi-worker training: host:port of every worker, chief first, comma-separated")
+parser.add_argument("--worker-index", type=int, default=0, help="This process's position in --workers")
+parser.add_argument("--local-workers", type=int, default=0,
+                    help="Start this many workers as local processes (see utils/distributed.py)")
+args = parser.parse_args()
+
+if args.local_workers:
+    code, _ = launch_local(
+        [os.path.abspath(__file__)] + without_option(sys.argv[1:], "--local-workers"),
+        args.local_workers
+    )
+    sys.exit(code)
+
+# =========================
+# DISTRIBUTION
+# =========================
+# Must be set up before any other TensorFlow work; a single process gets
+# the default strategy and unchanged batch size / learning rates
+strategy, NUM_WORKERS, WORKER_INDEX = setup_strategy(args.workers, args.worker_index)
 
 # =========================
 # PATHS (change if needed)
 # =========================
 DATASET_DIR = r"C:\Users\jaanv\.cache\kagglehub\datasets\pacificrm\skindiseasedataset\versions\6\SkinDisease\SkinDisease"
+TRAIN_DIR = os.path.join(DATASET_DIR, "train")
 MODEL_SAVE_PATH = "models/mobilenet_finetuned.keras"
+# Decoded images, compiled on first run (utils/dataset_cache.py)
+COMPILED_DIR = os.path.join("data", "compiled")
 
 IMG_SIZE = (224, 224)
 BATCH_SIZE = 32
 EPOCHS = 20
+# Augmented views per image cached for stage 1, one per stage-1 epoch, so
+# every epoch sees a fresh augmented copy as it did when training on images
+# (0 = un-augmented features: faster to cache, but no augmentation)
+FEATURE_VIEWS = 5
+# Fixed shuffle seed, so a resumed run sees the same batch order
+SEED = 0
+
+# BATCH_SIZE is per worker; batch and learning rates scale with the workers
+GLOBAL_BATCH_SIZE, STAGE1_LR = scale_for_workers(BATCH_SIZE, 1e-3, NUM_WORKERS)
+_, STAGE2_LR = scale_for_workers(BATCH_SIZE, 1e-5, NUM_WORKERS)
 
 # =========================
 # DATA AUGMENTATION
 # =========================
-train_datagen = ImageDataGenerator(
-    rescale=1./255,
+# Same settings the ImageDataGenerator used, applied per batch on the
+# tf.data pipeline (see utils/data_pipeline.py)
+AUGMENTATION = dict(
     rotation_range=30,
     zoom_range=0.2,
     width_shift_range=0.2,
     height_shift_range=0.2,
-    horizontal_flip=True,
-    fill_mode="nearest",
-    validation_split=0.2
+    horizontal_flip=True
 )
 
-train_generator = train_datagen.flow_from_directory(
-    DATASET_DIR,
-    target_size=IMG_SIZE,
+train_generator = flow_from_directory(
+    TRAIN_DIR,
+    image_size=IMG_SIZE,
     batch_size=BATCH_SIZE,
-    class_mode="categorical",
+    augment=AUGMENTATION,
     subset="training",
-    shuffle=True
+    validation_split=0.2,
+    shuffle=True,
+    seed=SEED,
+    compiled_dir=COMPILED_DIR
 )
 
-val_generator = train_datagen.flow_from_directory(
-    DATASET_DIR,
-    target_size=IMG_SIZE,
+# Validation images are not augmented
+val_generator = flow_from_directory(
+    TRAIN_DIR,
+    image_size=IMG_SIZE,
     batch_size=BATCH_SIZE,
-    class_mode="categorical",
     subset="validation",
-    shuffle=False
+    validation_split=0.2,
+    shuffle=False,
+    compiled_dir=COMPILED_DIR
 )
 
 NUM_CLASSES = train_generator.num_classes
@@ -66,41 +123,115 @@ class_weights = dict(enumerate(class_weights))
 # =========================
 # BASE MODEL (MOBILENET)
 # =========================
-base_model = MobileNetV2(
-    weights="imagenet",
-    include_top=False,
-    input_shape=(224, 224, 3)
-)
+# Variables are created under the strategy so they are mirrored across workers
+with strategy.scope():
+    base_model = MobileNetV2(
+        weights="imagenet",
+        include_top=False,
+        input_shape=(224, 224, 3)
+    )
+
+    # Freeze initially
+    base_model.trainable = False
+
+    # =========================
+    # CUSTOM HEAD
+    # =========================
+    # The head layers are shared between the full model and a features-only
+    # model, so training the head on cached features trains the full model too
+    pooled = GlobalAveragePooling2D()(base_model.output)
+    dense = Dense(256, activation="relu")
+    dropout = Dropout(0.5)
+    classifier = Dense(NUM_CLASSES, activation="softmax")
+
+    output = classifier(dropout(dense(pooled)))
+    model = Model(inputs=base_model.input, outputs=output)
+
+    feature_model = Model(inputs=base_model.input, outputs=pooled)
+    features_in = Input(shape=(pooled.shape[-1],))
+    head_model = Model(inputs=features_in, outputs=classifier(dropout(dense(features_in))))
 
-# Freeze initially
-base_model.trainable = False
+# =========================
+# BOTTLENECK FEATURES (FROZEN BACKBONE, COMPUTED ONCE)
+# =========================
+train_features, train_labels = cached_features(
+    feature_model,
+    TRAIN_DIR,
+    subset="training",
+    validation_split=0.2,
+    views=FEATURE_VIEWS,
+    augment=AUGMENTATION,
+    batch_size=BATCH_SIZE,
+    compiled_dir=COMPILED_DIR,
+    is_chief=WORKER_INDEX == 0
+)
+val_features, val_labels = cached_features(
+    feature_model,
+    TRAIN_DIR,
+    subset="validation",
+    validation_split=0.2,
+    batch_size=BATCH_SIZE,
+    compiled_dir=COMPILED_DIR,
+    is_chief=WORKER_INDEX == 0
+)
 
 # =========================
-# CUSTOM HEAD
+# INPUT (SHARDED PER WORKER)
 # =========================
-x = base_model.output
-x = GlobalAveragePooling2D()(x)
-x = Dense(256, activation="relu")(x)
-x = Dropout(0.5)(x)
-output = Dense(NUM_CLASSES, activation="softmax")(x)
+# Every worker reads only its shard, in batches of BATCH_SIZE; class weights
+# travel with the data as per-example weights
+def train_input(make):
+    """make(batch_size, shard, skip_batches) -> endless dataset; returns the
+    dataset_fn(skip_batches) ResumableTraining.fit expects"""
+    return lambda skip: distribute(
+        strategy,
+        lambda batch_size, shard: with_class_weights(make(batch_size, shard, skip), class_weights),
+        GLOBAL_BATCH_SIZE
+    )
+
+
+def val_input(make):
+    return distribute(strategy, make, GLOBAL_BATCH_SIZE)
+
 
-model = Model(inputs=base_model.input, outputs=output)
+train_steps = math.ceil(len(train_labels) / GLOBAL_BATCH_SIZE)
+val_steps = math.ceil(len(val_labels) / GLOBAL_BATCH_SIZE)
 
 # =========================
 # COMPILE (TRANSFER LEARNING)
 # =========================
-model.compile(
-    optimizer=Adam(learning_rate=1e-3),
-    loss="categorical_crossentropy",
-    metrics=["accuracy"]
+with strategy.scope():
+    head_model.compile(
+        optimizer=Adam(learning_rate=STAGE1_LR),
+        loss="categorical_crossentropy",
+        metrics=["accuracy"]
+    )
+
+# Checkpoints every epoch (and every --checkpoint-every batches) of both
+# stages; --resume continues where the last run stopped
+run = ResumableTraining(
+    args.checkpoint_dir,
+    resume=args.resume,
+    every_steps=args.checkpoint_every,
+    # Multi-worker saves are collective; keep them synchronous
+    async_write=not args.sync_checkpoints and NUM_WORKERS == 1,
+    worker_index=WORKER_INDEX
 )
 
-print("Stage 1: Transfer Learning Training")
-model.fit(
-    train_generator,
-    validation_data=val_generator,
+print("Stage 1: Transfer Learning Training (head on cached features)")
+run.fit(
+    1,
+    head_model,
+    train_input(lambda batch_size, shard, skip: feature_dataset(
+        train_features, train_labels, NUM_CLASSES, batch_size=batch_size,
+        shuffle=True, seed=SEED, skip_batches=skip, shard=shard
+    )[0]),
+    steps_per_epoch=train_steps,
     epochs=5,
-    class_weight=class_weights
+    validation_data=val_input(lambda batch_size, shard: feature_dataset(
+        val_features, val_labels, NUM_CLASSES, batch_size=batch_size, shard=shard
+    )[0]),
+    validation_steps=val_steps
 )
 
 # =========================
@@ -112,11 +243,12 @@ print("Stage 2: Fine Tuning")
 for layer in base_model.layers[-30:]:
     layer.trainable = True
 
-model.compile(
-    optimizer=Adam(learning_rate=1e-5),
-    loss="categorical_crossentropy",
-    metrics=["accuracy"]
-)
+with strategy.scope():
+    model.compile(
+        optimizer=Adam(learning_rate=STAGE2_LR),
+        loss="categorical_crossentropy",
+        metrics=["accuracy"]
+    )
 
 callbacks = [
     tf.keras.callbacks.EarlyStopping(
@@ -129,17 +261,28 @@ callbacks = [
     )
 ]
 
-model.fit(
-    train_generator,
-    validation_data=val_generator,
+run.fit(
+    2,
+    model,
+    train_input(lambda batch_size, shard, skip: train_generator.repeated(skip, batch_size, shard)),
+    steps_per_epoch=math.ceil(train_generator.samples / GLOBAL_BATCH_SIZE),
     epochs=EPOCHS,
-    class_weight=class_weights,
-    callbacks=callbacks
+    callbacks=callbacks,
+    validation_data=val_input(lambda batch_size, shard: val_generator.repeated(
+        batch_size=batch_size, shard=shard
+    )),
+    validation_steps=math.ceil(val_generator.samples / GLOBAL_BATCH_SIZE)
 )
 
 # =========================
 # SAVE MODEL
 # =========================
-os.makedirs("models", exist_ok=True)
-model.save(MODEL_SAVE_PATH)
-print("Fine-tuned MobileNet model saved successfully!")
+# Every worker has to take part in the save; only the chief's copy is kept
+if WORKER_INDEX == 0:
+    os.makedirs("models", exist_ok=True)
+    model.save(MODEL_SAVE_PATH)
+    print("Fine-tuned MobileNet model saved successfully!")
+else:
+    worker_path = os.path.join(tempfile.mkdtemp(), "model.keras")
+    model.save(worker_path)
+    os.remove(worker_path)
@@ -1,10 +1,11 @@
 import os
 import kagglehub
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Dropout
 
+from utils.data_pipeline import flow_from_directory
+
 # ===============================
 # 1. Dataset Path Setup
 # ===============================
@@ -14,6 +15,8 @@ path = kagglehub.dataset_download("pacificrm/skindiseasedataset")
 data_dir = os.path.join(path, "SkinDisease", "SkinDisease")
 train_dir = os.path.join(data_dir, "train")
 test_dir = os.path.join(data_dir, "test")
+# Decoded images, compiled on first run (utils/dataset_cache.py)
+COMPILED_DIR = os.path.join("data", "compiled")
 
 print("Train directory:", train_dir)
 print("Test directory:", test_dir)
@@ -25,29 +28,25 @@ print("Test directory:", test_dir)
 img_size = (224, 224)
 batch_size = 32
 
-train_datagen = ImageDataGenerator(
-    rescale=1./255,
-    rotation_range=20,
-    zoom_range=0.2,
-    horizontal_flip=True
-)
-
-test_datagen = ImageDataGenerator(
-    rescale=1./255
-)
-
-train_data = train_datagen.flow_from_directory(
+# Augmentation runs per batch on the tf.data pipeline (utils/data_pipeline.py)
+train_data = flow_from_directory(
     train_dir,
-    target_size=img_size,
+    image_size=img_size,
     batch_size=batch_size,
-    class_mode="categorical"
+    augment=dict(
+        rotation_range=20,
+        zoom_range=0.2,
+        horizontal_flip=True
+    ),
+    compiled_dir=COMPILED_DIR
 )
 
-test_data = test_datagen.flow_from_directory(
+test_data = flow_from_directory(
     test_dir,
-    target_size=img_size,
+    image_size=img_size,
     batch_size=batch_size,
-    class_mode="categorical"
+    shuffle=False,
+    compiled_dir=COMPILED_DIR
 )
 
 # ===============================
@@ -87,8 +86,8 @@ model.summary()
 # ===============================
 
 history = model.fit(
-    train_data,
-    validation_data=test_data,
+    train_data.dataset,
+    validation_data=test_data.dataset,
     epochs=5
 )
 
@@ -1,12 +1,14 @@
 import os
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.applications import MobileNetV2
-from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
+from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout, Input
 from tensorflow.keras.models import Model
 from tensorflow.keras.optimizers import Adam
 import kagglehub
 
+from utils.bottleneck import cached_features, feature_dataset
+from utils.data_pipeline import flow_from_directory
+
 # ----------------------------
 # DATASET PATH
 # ----------------------------
@@ -14,6 +16,8 @@ path = kagglehub.dataset_download("pacificrm/skindiseasedataset")
 data_dir = os.path.join(path, "SkinDisease", "SkinDisease")
 train_dir = os.path.join(data_dir, "train")
 test_dir = os.path.join(data_dir, "test")
+# Decoded images, compiled on first run (utils/dataset_cache.py)
+COMPILED_DIR = os.path.join("data", "compiled")
 
 # ----------------------------
 # IMAGE SETTINGS
@@ -24,28 +28,31 @@ BATCH_SIZE = 32
 # ----------------------------
 # DATA GENERATORS
 # ----------------------------
-train_gen = ImageDataGenerator(
-    rescale=1./255,
+# Augmentation runs per batch on the tf.data pipeline (utils/data_pipeline.py)
+AUGMENTATION = dict(
     rotation_range=25,
     zoom_range=0.2,
     horizontal_flip=True
 )
+# Augmented views per image cached for head training, one per epoch, so
+# every epoch sees a fresh augmented copy as it did when training on images
+# (0 = un-augmented features: faster to cache, but no augmentation)
+FEATURE_VIEWS = 10
 
-test_gen = ImageDataGenerator(rescale=1./255)
-
-train_data = train_gen.flow_from_directory(
+train_data = flow_from_directory(
     train_dir,
-    target_size=IMG_SIZE,
+    image_size=IMG_SIZE,
     batch_size=BATCH_SIZE,
-    class_mode="categorical"
+    augment=AUGMENTATION,
+    compiled_dir=COMPILED_DIR
 )
 
-test_data = test_gen.flow_from_directory(
+test_data = flow_from_directory(
     test_dir,
-    target_size=IMG_SIZE,
+    image_size=IMG_SIZE,
     batch_size=BATCH_SIZE,
-    class_mode="categorical",
-    shuffle=False
+    shuffle=False,
+    compiled_dir=COMPILED_DIR
 )
 
 # ----------------------------
@@ -63,19 +70,48 @@ base_model.trainable = False
 # ----------------------------
 # CUSTOM CLASSIFIER
 # ----------------------------
-x = base_model.output
-x = GlobalAveragePooling2D()(x)
-x = Dense(256, activation="relu")(x)
-x = Dropout(0.5)(x)
-
-output = Dense(train_data.num_classes, activation="softmax")(x)
+# The head layers are shared between the full model and a features-only
+# model, so training the head on cached features trains the full model too
+pooled = GlobalAveragePooling2D()(base_model.output)
+dense = Dense(256, activation="relu")
+dropout = Dropout(0.5)
+classifier = Dense(train_data.num_classes, activation="softmax")
 
+output = classifier(dropout(dense(pooled)))
 model = Model(inputs=base_model.input, outputs=output)
 
+feature_model = Model(inputs=base_model.input, outputs=pooled)
+features_in = Input(shape=(pooled.shape[-1],))
+head_model = Model(inputs=features_in, outputs=classifier(dropout(dense(features_in))))
+
+# ----------------------------
+# BOTTLENECK FEATURES (FROZEN BACKBONE, COMPUTED ONCE)
+# ----------------------------
+train_features, train_labels = cached_features(
+    feature_model,
+    train_dir,
+    views=FEATURE_VIEWS,
+    augment=AUGMENTATION,
+    batch_size=BATCH_SIZE,
+    compiled_dir=COMPILED_DIR
+)
+test_features, test_labels = cached_features(
+    feature_model,
+    test_dir,
+    batch_size=BATCH_SIZE,
+    compiled_dir=COMPILED_DIR
+)
+train_features_ds, train_steps = feature_dataset(
+    train_features, train_labels, train_data.num_classes, batch_size=BATCH_SIZE, shuffle=True
+)
+test_features_ds, test_steps = feature_dataset(
+    test_features, test_labels, test_data.num_classes, batch_size=BATCH_SIZE
+)
+
 # ----------------------------
 # COMPILE MODEL
 # ----------------------------
-model.compile(
+head_model.compile(
     optimizer=Adam(learning_rate=0.0001),
     loss="categorical_crossentropy",
     metrics=["accuracy"]
@@ -86,9 +122,11 @@ model.summary()
 # ----------------------------
 # TRAIN MODEL
 # ----------------------------
-history = model.fit(
-    train_data,
-    validation_data=test_data,
+history = head_model.fit(
+    train_features_ds,
+    steps_per_epoch=train_steps,
+    validation_data=test_features_ds,
+    validation_steps=test_steps,
     epochs=10
 )
 
@@ -0,0 +1,69 @@
+"""
+Per-client token-bucket rate limiting.
+
+Each client (by IP) gets a bucket of ``burst`` tokens refilled at ``rate``
+tokens per second; a request spends one token per image. A request costing
+more than ``burst`` is charged ``burst``, so a large batch needs (and
+empties) a full bucket instead of never being allowed. Buckets are kept
+in a bounded LRU so a flood of distinct addresses can't grow memory without
+limit. Queue-depth and deadline shedding live in the micro-batcher
+(utils/batching.py); this module only decides whether a client may send
+another request at all.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimiter:
+    """Token buckets keyed by client id; ``rate`` <= 0 disables limiting"""
+
+    def __init__(self, rate=5.0, burst=10, max_clients=10000):
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self.max_clients = max(int(max_clients), 1)
+        self._buckets = OrderedDict()  # client -> [tokens, last refill time]
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def acquire(self, client, cost=1):
+        """Spend ``cost`` tokens; returns (allowed, seconds until it would be)"""
+        if not self.enabled:
+            return True, 0
+        cost = min(float(cost), self.burst)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = [self.burst, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                self.allowed += 1
+                return True, 0
+            self.limited += 1
+            return False, max(1, math.ceil((cost - bucket[0]) / self.rate))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "rate_per_s": self.rate,
+                "burst": self.burst,
+                "clients": len(self._buckets),
+                "allowed": self.allowed,
+                "limited": self.limited,
+            }
@@ -0,0 +1,240 @@
+"""
+Pluggable inference backends.
+
+Every serving front-end talks to the model through the same small interface:
+
+    backend = load_backend()          # picks MODEL_BACKEND / MODEL_PATH from env
+    backend.warmup()
+    probs = backend.predict_batch(batch)   # (N, 224, 224, 3) float32 -> (N, 22)
+    backend.describe()
+
+Available backends:
+    keras   - .keras model via the traced InferenceEngine (imports TensorFlow)
+    tflite  - TFLite export via an interpreter pool (see export_tflite.py)
+    onnx    - ONNX Runtime CPU session (see export_onnx.py); no TensorFlow needed
+
+Runtime imports happen inside ``load()``, so a worker serving ONNX or
+tflite_runtime never imports TensorFlow.
+"""
+
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATHS = {
+    "keras": "final_skin_disease_model.keras",
+    "tflite": os.path.join("models", "tflite", "skin_disease_int8.tflite"),
+    "onnx": os.path.join("models", "onnx", "skin_disease.onnx"),
+}
+
+
+class InferenceBackend:
+    """Base class: load, warm up, predict a batch, describe"""
+
+    name = "base"
+
+    def __init__(self, model_path=None, **options):
+        self.model_path = model_path or DEFAULT_MODEL_PATHS[self.name]
+        self.options = options
+        self.input_shape = (224, 224, 3)
+
+    def load(self):
+        raise NotImplementedError
+
+    def predict_batch(self, batch):
+        raise NotImplementedError
+
+    def warmup(self, batch_sizes=(1,)):
+        """Run dummy batches so the first real request doesn't pay setup costs"""
+        for b in batch_sizes:
+            self.predict_batch(np.zeros((b,) + self.input_shape, dtype=np.float32))
+
+    def describe(self):
+        return {"backend": self.name, "model_path": self.model_path}
+
+    # Backends are callable so they can be passed straight to MicroBatcher
+    def __call__(self, batch):
+        return self.predict_batch(batch)
+
+    def _check_path(self):
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"Model not found at {self.model_path}")
+
+
+class KerasBackend(InferenceBackend):
+    name = "keras"
+
+    def load(self):
+        self._check_path()
+        import tensorflow as tf
+        from utils import weight_store
+        from utils.inference import InferenceEngine
+
+        # With a fresh weight store, rebuild from memory-mapped arrays
+        # instead of parsing the .keras zip (see utils/weight_store.py).
+        # This only loads faster: the weights are still copied into this
+        # worker's own variables.
+        store_dir = weight_store.default_store_dir(self.model_path)
+        self.from_weight_store = (
+            self.options.get("weight_store", False)
+            and weight_store.is_fresh(self.model_path, store_dir)
+        )
+        if self.from_weight_store:
+            self.model = weight_store.build_model(store_dir)
+            self.engine = InferenceEngine(self.model)
+        elif self.options.get("graph_cache", False):
+            self.engine = self._load_graph_cache()
+        else:
+            self.model = tf.keras.models.load_model(self.model_path)
+            self.engine = InferenceEngine(self.model)
+        self.input_shape = self.engine.input_shape
+        # Weights this process holds privately (not shared with other workers)
+        self.weight_bytes = (
+            sum(int(np.prod(v.shape)) * v.dtype.size for v in self.model.weights)
+            if self.model is not None else None
+        )
+        if self.weight_bytes is not None:
+            logger.info(f"Keras weights: {self.weight_bytes / 2**20:.1f} MB private to this worker")
+        return self
+
+    def _load_graph_cache(self):
+        """Restore traced graphs (see utils/graph_cache.py), building them on a miss"""
+        import tensorflow as tf
+        from utils import graph_cache
+        from utils.inference import DEFAULT_BUCKETS as buckets, InferenceEngine
+
+        cached = graph_cache.load_graph_cache(self.model_path, buckets=buckets)
+        if cached is not None:
+            self.model = None
+            return InferenceEngine.from_graph_cache(*cached)
+
+        self.model = tf.keras.models.load_model(self.model_path)
+        engine = InferenceEngine(self.model, buckets)
+        try:
+            graph_cache.export_graph_cache(
+                self.model, self.model_path, buckets, engine.input_shape
+            )
+        except Exception as e:
+            # Read-only deploys still serve, just without the cache
+            logger.warning(f"Could not write graph cache: {str(e)}")
+        return engine
+
+    def predict_batch(self, batch):
+        return self.engine.predict(batch)
+
+    def warmup(self, batch_sizes=(1,)):
+        self.engine.warmup(batch_sizes)
+
+    def describe(self):
+        return {
+            **super().describe(),
+            **self.engine.describe(),
+            "from_weight_store": self.from_weight_store,
+            "private_weight_bytes": self.weight_bytes,
+        }
+
+
+class TFLiteBackend(InferenceBackend):
+    name = "tflite"
+
+    def load(self):
+        self._check_path()
+        from utils.tflite_backend import TFLitePool
+
+        self.pool = TFLitePool(
+            self.model_path,
+            pool_size=self.options.get("pool_size", 2),
+            num_threads=self.options.get("num_threads", 2)
+        )
+        self.input_shape = self.pool.input_shape
+        return self
+
+    def predict_batch(self, batch):
+        return self.pool.predict(batch)
+
+    def warmup(self, batch_sizes=(1,)):
+        # Allocates the bucket interpreters in every pool slot up front
+        self.pool.warmup(batch_sizes)
+
+    def describe(self):
+        return {**super().describe(), **self.pool.describe()}
+
+
+class OnnxBackend(InferenceBackend):
+    name = "onnx"
+
+    def load(self):
+        self._check_path()
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = self.options.get("num_threads", 0)
+        if threads:
+            opts.intra_op_num_threads = int(threads)
+            opts.inter_op_num_threads = 1
+
+        self.session = ort.InferenceSession(
+            self.model_path, sess_options=opts, providers=["CPUExecutionProvider"]
+        )
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.input_shape = tuple(
+            int(d) if isinstance(d, int) else default
+            for d, default in zip(inp.shape[1:], self.input_shape)
+        )
+        self.output_name = self.session.get_outputs()[0].name
+        self._ort_version = ort.__version__
+        return self
+
+    def predict_batch(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        return self.session.run([self.output_name], {self.input_name: batch})[0]
+
+    def describe(self):
+        return {
+            **super().describe(),
+            "engine": "onnxruntime",
+            "onnxruntime": self._ort_version,
+            "providers": self.session.get_providers(),
+            "num_threads": self.options.get("num_threads", 0),
+        }
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend,
+}
+
+
+def backend_options_from_env(name):
+    """Backend-specific options from environment variables"""
+    if name == "tflite":
+        return {
+            "pool_size": int(os.environ.get("TFLITE_POOL_SIZE", "2")),
+            "num_threads": int(os.environ.get("TFLITE_THREADS", "2")),
+        }
+    if name == "onnx":
+        return {"num_threads": int(os.environ.get("ONNX_THREADS", "0"))}
+    if name == "keras":
+        return {
+            "weight_store": os.environ.get("MODEL_WEIGHT_STORE", "0") == "1",
+            "graph_cache": os.environ.get("MODEL_GRAPH_CACHE", "1") == "1",
+        }
+    return {}
+
+
+def load_backend(name=None, model_path=None, **options):
+    """Create and load a backend; defaults come from MODEL_BACKEND / MODEL_PATH"""
+    name = (name or os.environ.get("MODEL_BACKEND", "keras")).lower()
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown MODEL_BACKEND: {name} (choose from {', '.join(BACKENDS)})"
+        )
+    model_path = model_path or os.environ.get("MODEL_PATH") or None
+    merged = {**backend_options_from_env(name), **options}
+    return BACKENDS[name](model_path, **merged).load()
@@ -0,0 +1,244 @@
+"""
+Dynamic micro-batching for model inference.
+
+Concurrent requests each submit one preprocessed image; a single background
+thread gathers whatever is waiting (up to ``max_batch_size`` images, or until
+``max_wait_ms`` has passed since the first one arrived), runs one forward pass
+over the stacked batch and hands each caller back its own row.
+
+Admission control: with ``max_queue`` the number of queued images is
+bounded (a multi-image submit counts each image), and a request
+submitted with a ``deadline`` is refused up front when the expected wait
+(queue depth x recent batch latency) would overrun it, or dropped if it is
+still queued when the deadline passes. Refusals raise ``Overloaded`` with a
+suggested retry delay instead of letting requests pile up and time out
+together.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class Overloaded(Exception):
+    """Request shed by admission control; ``reason`` is queue_full or deadline"""
+
+    def __init__(self, reason, retry_after=1):
+        super().__init__("Server busy, try again shortly")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _PendingItem:
+    """One submitted image waiting for its prediction"""
+
+    __slots__ = ("array", "event", "result", "error", "deadline")
+
+    def __init__(self, array, deadline=None):
+        self.array = array
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.deadline = deadline
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-image predictions into batched calls"""
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0, max_queue=0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000.0
+        self.max_queue = max(int(max_queue), 0)  # 0 = unbounded images queued
+
+        self._queue = deque()
+        self._queued_images = 0  # rows of the arrays in self._queue
+        self._cond = threading.Condition()
+        self._stopped = False
+
+        # Stats (guarded by self._cond)
+        self._batch_size_counts = {}
+        self._total_batches = 0
+        self._total_items = 0
+        self._total_errors = 0
+        self._batch_seconds = 0.0  # moving average of one forward pass
+        self._shed = {"queue_full": 0, "deadline": 0, "expired": 0}
+        self._admitted = 0
+
+        self._worker = threading.Thread(
+            target=self._run, name="micro-batcher", daemon=True
+        )
+        self._worker.start()
+
+    # ----------------------------------------
+    # PUBLIC API
+    # ----------------------------------------
+    def submit(self, array, timeout=None, deadline=None):
+        """Queue one (or a few) images and block until predictions are ready.
+
+        ``array`` has a leading batch axis, e.g. shape (1, 224, 224, 3).
+        Returns the matching rows of the model output. ``deadline`` is a
+        ``time.monotonic()`` value; raises ``Overloaded`` if the request is
+        shed.
+        """
+        item = _PendingItem(array, deadline)
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Batcher is stopped")
+            # An oversized submit is still admitted into an empty queue
+            if (self.max_queue and self._queued_images
+                    and self._queued_images + len(array) > self.max_queue):
+                self._shed["queue_full"] += 1
+                raise Overloaded("queue_full", self._retry_after())
+            if deadline is not None and time.monotonic() + self._expected_wait() > deadline:
+                self._shed["deadline"] += 1
+                raise Overloaded("deadline", self._retry_after())
+            self._queue.append(item)
+            self._queued_images += len(array)
+            self._admitted += 1
+            self._cond.notify()
+
+        if not item.event.wait(timeout):
+            raise TimeoutError("Timed out waiting for batched prediction")
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _expected_wait(self):
+        """Seconds until a newly queued item would be done (lock held)"""
+        batches_ahead = self._queued_images // self.max_batch_size + 1
+        return batches_ahead * self._batch_seconds
+
+    def _retry_after(self):
+        """Whole seconds for a Retry-After header (lock held)"""
+        return max(1, math.ceil(self._expected_wait()))
+
+    def stats(self):
+        """Queue depth and realized batch sizes, for tuning under load"""
+        with self._cond:
+            mean = (
+                self._total_items / self._total_batches
+                if self._total_batches else 0.0
+            )
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._queued_images,
+                "max_queue": self.max_queue,
+                "mean_batch_ms": round(self._batch_seconds * 1000.0, 3),
+                "admitted": self._admitted,
+                "shed": dict(self._shed),
+                "total_batches": self._total_batches,
+                "total_items": self._total_items,
+                "total_errors": self._total_errors,
+                "mean_batch_size": round(mean, 3),
+                "batch_size_counts": {
+                    str(k): v for k, v in sorted(self._batch_size_counts.items())
+                },
+            }
+
+    def stop(self):
+        """Stop the worker thread; queued requests fail with RuntimeError"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._worker.join(timeout=5)
+
+    # ----------------------------------------
+    # WORKER
+    # ----------------------------------------
+    def _collect(self):
+        """Wait for the first item, then gather more until full or timed out"""
+        with self._cond:
+            while not self._queue and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                pending = list(self._queue)
+                self._queue.clear()
+                self._queued_images = 0
+                for item in pending:
+                    item.error = RuntimeError("Batcher is stopped")
+                    item.event.set()
+                return None
+
+            batch = []
+            size = 0
+            deadline = None
+
+            while size < self.max_batch_size:
+                if self._queue:
+                    nxt = self._queue[0]
+                    if batch and size + len(nxt.array) > self.max_batch_size:
+                        break
+                    self._queue.popleft()
+                    self._queued_images -= len(nxt.array)
+                    if nxt.deadline is not None and time.monotonic() > nxt.deadline:
+                        # Caller has given up waiting; don't spend a slot on it
+                        self._shed["expired"] += 1
+                        nxt.error = Overloaded("deadline", self._retry_after())
+                        nxt.event.set()
+                        continue
+                    batch.append(nxt)
+                    size += len(nxt.array)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.max_wait
+                    continue
+                if deadline is None:
+                    if self._stopped:
+                        return None
+                    # Everything queued had expired; wait for new work
+                    self._cond.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stopped:
+                    break
+                self._cond.wait(remaining)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            sizes = [len(item.array) for item in batch]
+            total = sum(sizes)
+            try:
+                stacked = (
+                    batch[0].array if len(batch) == 1
+                    else np.concatenate([item.array for item in batch], axis=0)
+                )
+                start = time.monotonic()
+                preds = np.asarray(self.predict_fn(stacked))
+                elapsed = time.monotonic() - start
+                offset = 0
+                for item, n in zip(batch, sizes):
+                    item.result = preds[offset:offset + n]
+                    offset += n
+                failed = 0
+            except Exception as e:
+                for item in batch:
+                    item.error = e
+                failed = len(batch)
+                elapsed = None
+
+            with self._cond:
+                if elapsed is not None:
+                    self._batch_seconds = (
+                        elapsed if self._batch_seconds == 0.0
+                        else 0.8 * self._batch_seconds + 0.2 * elapsed
+                    )
+                self._total_batches += 1
+                self._total_items += total
+                self._total_errors += failed
+                self._batch_size_counts[total] = (
+                    self._batch_size_counts.get(total, 0) + 1
+                )
+
+            for item in batch:
+                item.event.set()
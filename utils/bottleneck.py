@@ -0,0 +1,178 @@
+"""
+Cached bottleneck features for frozen-backbone training.
+
+While MobileNetV2 is frozen, only the Dense head learns, but fitting the
+full model still runs the backbone over every image every epoch. Here the
+frozen backbone (plus global pooling) runs once per image and the 1280-d
+pooled features are stored on disk:
+
+    data/features/train-1a2b3c4d-training-v0/   # split dir as in dataset_cache
+        features.npy    # (views, N, 1280) float32
+        labels.npy      # (N,) int64
+        manifest.json   # what the features were computed from
+
+The head is then trained on the features alone. Because the backbone is
+frozen (BatchNorm in inference mode) the features are exactly what the head
+sees inside the full model, so the trained head layers give the same
+outputs when used in the full model.
+
+``views=0`` stores un-augmented features. ``views=K`` stores K augmented
+passes over the data instead, and training cycles through them one view
+per epoch, so each epoch sees a different augmented copy like the image
+pipeline would. Features are recomputed when the images, the subset, the
+augmentation, the view count or the backbone weights change.
+
+``features.npy`` is memory-mapped, not loaded: K views of a large split
+stay on disk and in the page cache, and each batch reads only its rows. In
+a multi-worker run the chief writes the cache and the other workers wait
+for it instead of all rebuilding the same directory.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from utils.data_pipeline import AUTOTUNE, IMG_SIZE, DirectoryDataset
+from utils.dataset_cache import default_split_dir, source_manifest
+
+MANIFEST = "manifest.json"
+DEFAULT_DIR = os.path.join("data", "features")
+
+
+def weights_fingerprint(model):
+    """sha256 over every weight tensor of ``model``"""
+    h = hashlib.sha256()
+    for w in model.get_weights():
+        h.update(np.ascontiguousarray(w).tobytes())
+    return h.hexdigest()
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def extract_features(feature_model, dataset):
+    """(features, labels) for one pass of a batched (images, one-hot) dataset"""
+    features = []
+    labels = []
+    for images, onehot in dataset:
+        features.append(feature_model(images, training=False).numpy())
+        labels.append(np.argmax(onehot.numpy(), axis=1))
+    return np.concatenate(features), np.concatenate(labels).astype(np.int64)
+
+
+def _load(cache_dir):
+    # Features stay on disk (page cache); only the batches in use are read
+    return (np.load(os.path.join(cache_dir, "features.npy"), mmap_mode="r"),
+            np.load(os.path.join(cache_dir, "labels.npy")))
+
+
+def cached_features(feature_model, directory, subset=None, validation_split=0.0,
+                    views=0, augment=None, batch_size=32, image_size=IMG_SIZE,
+                    compiled_dir=None, out_dir=DEFAULT_DIR, is_chief=True, poll_seconds=5.0):
+    """(features of shape (max(views, 1), N, D), labels) for ``directory``,
+    computed with ``feature_model`` on first use and loaded from disk after.
+    The features are memory-mapped. In a multi-worker run only the chief
+    computes them; the other workers (``is_chief=False``) wait for its
+    cache and read that."""
+    # Named like the compiled split, so same-named splits of different
+    # datasets don't overwrite each other
+    cache_dir = f"{default_split_dir(directory, out_dir)}-{subset or 'all'}-v{views}"
+    name = os.path.basename(cache_dir)
+    manifest = {
+        "source": source_manifest(directory, image_size)[0],
+        "subset": subset,
+        "validation_split": validation_split,
+        "views": views,
+        "augment": augment if views else None,
+        "backbone_sha256": weights_fingerprint(feature_model),
+    }
+    if _read_manifest(cache_dir) == manifest:
+        return _load(cache_dir)
+
+    if not is_chief:
+        print(f"Waiting for the chief to cache {name} features...")
+        while _read_manifest(cache_dir) != manifest:
+            time.sleep(poll_seconds)
+        return _load(cache_dir)
+
+    data = DirectoryDataset(
+        directory, batch_size=batch_size, image_size=image_size,
+        augment=augment if views else None, subset=subset,
+        validation_split=validation_split, shuffle=False, compiled_dir=compiled_dir,
+    )
+    tmp_dir = f"{cache_dir}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    # Each view is written straight into the on-disk array, so only one
+    # view is ever held in memory
+    start = time.perf_counter()
+    out = None
+    for v in range(max(views, 1)):
+        features, labels = extract_features(feature_model, data.dataset)
+        if out is None:
+            out = np.lib.format.open_memmap(
+                os.path.join(tmp_dir, "features.npy"), mode="w+", dtype=features.dtype,
+                shape=(max(views, 1),) + features.shape
+            )
+        out[v] = features
+        del features
+        print(f"  {name}: view {v + 1}/{max(views, 1)}, {len(labels)} images")
+    shape = out.shape
+    out.flush()
+    del out
+    np.save(os.path.join(tmp_dir, "labels.npy"), labels)
+    # Manifest last: waiting workers only read a complete cache
+    with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    print(f"Cached {shape[0]}x{shape[1]} features in {cache_dir} "
+          f"in {time.perf_counter() - start:.1f}s")
+    return _load(cache_dir)
+
+
+def feature_dataset(features, labels, num_classes, batch_size=32, shuffle=False, seed=None,
+                    skip_batches=0, shard=None):
+    """Endless (features, one-hot) dataset using view ``epoch % views`` in
+    each epoch; returns (dataset, steps per epoch) for
+    fit(steps_per_epoch=...). ``skip_batches`` resumes mid-run and
+    ``shard`` = (num_shards, index) keeps one worker's share."""
+    views, n, dim = features.shape
+    local = len(range(n)[shard[1]::shard[0]]) if shard else n
+    steps = int(np.ceil(local / batch_size))
+    onehot = tf.one_hot(labels, num_classes)
+
+    def read(view, idx):
+        # Rows of a (possibly memory-mapped) array; only this batch is read.
+        # Sorted reads are sequential in the file; order inside a batch
+        # doesn't matter for training
+        idx = np.sort(idx)
+        return np.asarray(features[view][idx], dtype=np.float32), idx
+
+    def gather(batch_number, idx):
+        view = (batch_number // steps) % views
+        batch, idx = tf.numpy_function(read, [view, idx], [tf.float32, tf.int64])
+        batch.set_shape((None, dim))
+        return batch, tf.gather(onehot, idx)
+
+    ds = tf.data.Dataset.range(n)
+    if shard:
+        ds = ds.shard(*shard)
+    if shuffle:
+        ds = ds.shuffle(local, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size).repeat()
+    if skip_batches:
+        ds = ds.skip(skip_batches)
+    ds = ds.enumerate(start=skip_batches).map(gather, num_parallel_calls=AUTOTUNE)
+    return ds.prefetch(AUTOTUNE), steps
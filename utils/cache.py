@@ -0,0 +1,175 @@
+"""
+Content-addressed prediction cache.
+
+Results are keyed on a hash of the raw uploaded bytes plus a fingerprint of
+the model file, so a re-upload of the same photo is answered without decoding
+or running inference, and swapping the model invalidates everything.
+Concurrent requests for the same key are coalesced (single-flight): only the
+first one computes, the others wait for its result.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def model_fingerprint(path):
+    """Short stable fingerprint of a model file (sha256 of its contents)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def content_key(data, fingerprint=""):
+    """Cache key for raw upload bytes under a given model fingerprint"""
+    return digest_key(hashlib.sha256(data).hexdigest(), fingerprint)
+
+
+def digest_key(hexdigest, fingerprint=""):
+    """Cache key from an already computed sha256 hex digest of the upload"""
+    return f"{fingerprint}:{hexdigest}"
+
+
+class _Flight:
+    """An in-progress computation that other callers can wait on"""
+
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PredictionCache:
+    """Bounded LRU cache with TTL expiry and single-flight coalescing"""
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600.0):
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl_seconds)
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        """Return the cached value or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = self._lookup(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_compute(self, key, compute, should_cache=None, counted=False):
+        """Return the cached value for ``key`` or compute it exactly once.
+
+        Concurrent callers with the same key wait for the first caller's
+        result. ``should_cache(value)`` can veto storing a result (e.g. an
+        error response); vetoed results are still shared with waiters.
+        ``counted=True`` when the caller already looked the key up with
+        get(), so the lookup isn't counted twice in the hit/miss stats.
+        """
+        if not self.enabled:
+            return compute()
+
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                if not counted:
+                    self.hits += 1
+                return value
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                if not counted:
+                    self.misses += 1
+                flight = _Flight()
+                self._inflight[key] = flight
+                leader = True
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            value = compute()
+            flight.result = value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if flight.error is None and (
+                    should_cache is None or should_cache(flight.result)
+                ):
+                    self._store(key, flight.result)
+            flight.event.set()
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "in_flight": len(self._inflight),
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    # Callers hold self._lock for the helpers below
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if self.ttl > 0 and expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,224 @@
+"""
+Resumable multi-stage training.
+
+``ResumableTraining.fit`` wraps ``model.fit`` for one stage of a training
+script and writes a checkpoint at the end of every epoch and every
+``every_steps`` batches:
+
+    checkpoints/mobilenet_finetune/
+        stage-1/ckpt-<step>.*    # tf.train.Checkpoint per stage
+        stage-2/ckpt-<step>.*
+
+Each checkpoint holds the model weights, the optimizer (slots, iteration
+count, learning rate as changed by ReduceLROnPlateau), the position in the
+run (epoch, batch within the epoch, whether the stage finished) and the
+state of EarlyStopping / ReduceLROnPlateau, including EarlyStopping's best
+weights. Writes use TensorFlow's async checkpointing where available, so
+training continues while the files are written; the checkpoint only becomes
+``latest`` once it is complete.
+
+With ``resume=True`` finished stages are skipped (their weights restored),
+and the interrupted stage continues from the batch after the checkpoint:
+the training data has to come from a ``dataset_fn(skip_batches)`` returning
+an endless, seeded dataset (DirectoryDataset.repeated, feature_dataset) so
+the skipped batches are the ones already trained on. Augmentation draws are
+not replayed.
+"""
+
+import json
+import os
+import shutil
+
+import tensorflow as tf
+
+# Keras callback attributes that carry state across epochs
+CALLBACK_STATE = {
+    "EarlyStopping": ("wait", "stopped_epoch", "best", "best_epoch"),
+    "ReduceLROnPlateau": ("wait", "cooldown_counter", "best"),
+}
+
+
+def checkpoint_options(async_write=True):
+    """Async CheckpointOptions if this TensorFlow supports them"""
+    if not async_write:
+        return None
+    try:
+        return tf.train.CheckpointOptions(experimental_enable_async_checkpoint=True)
+    except TypeError:
+        print("Async checkpointing not supported by this TensorFlow; writing synchronously")
+        return None
+
+
+def callback_state(callbacks):
+    """JSON-able state of the stateful callbacks, keyed by class name.
+    Attributes that are still None (e.g. ``best`` before the first epoch
+    end) are left out, so a restore keeps the callback's own reset value."""
+    state = {}
+    for cb in callbacks:
+        fields = CALLBACK_STATE.get(type(cb).__name__)
+        if fields:
+            state[type(cb).__name__] = {
+                f: float(getattr(cb, f)) for f in fields
+                if getattr(cb, f, None) is not None
+            }
+    return state
+
+
+def apply_callback_state(callbacks, state):
+    for cb in callbacks:
+        for field, value in state.get(type(cb).__name__, {}).items():
+            current = getattr(cb, field, None)
+            setattr(cb, field, int(value) if isinstance(current, int) else value)
+
+
+class _StageCheckpoint(tf.keras.callbacks.Callback):
+    """Saves the stage checkpoint; must come after the callbacks it records,
+    so their on_train_begin reset happens before the restore"""
+
+    def __init__(self, run, ckpt, manager, callbacks, steps_per_epoch, epochs, start_step):
+        super().__init__()
+        self.run = run
+        self.ckpt = ckpt
+        self.manager = manager
+        self.tracked = callbacks
+        self.steps_per_epoch = steps_per_epoch
+        self.epochs = epochs
+        self.start_step = start_step
+        self.pending_state = json.loads(ckpt.callbacks.numpy().decode() or "{}")
+        self.pending_best = bool(ckpt.has_best.numpy())
+        self._epoch = 0
+
+    def on_train_begin(self, logs=None):
+        apply_callback_state(self.tracked, self.pending_state)
+        if self.pending_best:
+            for cb in self.tracked:
+                if hasattr(cb, "best_weights"):
+                    cb.best_weights = [v.numpy() for v in self.ckpt.best_weights]
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch = epoch
+
+    def on_train_batch_end(self, batch, logs=None):
+        step = self.start_step + batch + 1
+        if self.run.every_steps and step % self.run.every_steps == 0 and step < self.steps_per_epoch:
+            self.save(self._epoch, step)
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.start_step = 0
+        self.pending_state = callback_state(self.tracked)
+        self.save(epoch + 1, 0)
+
+    def on_train_end(self, logs=None):
+        if self.model.stop_training or self._epoch + 1 >= self.epochs:
+            # Stage over; EarlyStopping has restored its best weights by now
+            self.save(int(self.ckpt.epoch.numpy()), 0, done=True)
+
+    def save(self, epoch, step, done=False):
+        self.ckpt.epoch.assign(epoch)
+        self.ckpt.step.assign(step)
+        self.ckpt.done.assign(done)
+        self.ckpt.callbacks.assign(json.dumps(callback_state(self.tracked)))
+        best = next((cb.best_weights for cb in self.tracked
+                     if getattr(cb, "best_weights", None) is not None), None)
+        self.ckpt.has_best.assign(best is not None)
+        if best is not None:
+            for var, value in zip(self.ckpt.best_weights, best):
+                var.assign(value)
+        # The final save of a stage is synchronous so "done" is durable
+        # before the next stage starts
+        options = None if done else self.run.options
+        if done and hasattr(self.ckpt, "sync"):
+            self.ckpt.sync()
+        path = self.manager.save(
+            checkpoint_number=epoch * self.steps_per_epoch + step, options=options
+        )
+        if self.run.is_chief:
+            print(f"\nCheckpoint: stage {self.run.stage} epoch {epoch} step {step} -> {path}")
+
+
+class ResumableTraining:
+    """Checkpointing and resume for the stages of one training run"""
+
+    def __init__(self, directory, resume=False, every_steps=0, max_to_keep=2, async_write=True,
+                 worker_index=0):
+        self.directory = directory
+        self.resume = resume
+        # In a multi-worker run every worker saves (the save is collective),
+        # but only the chief's copy is kept and restored from
+        self.is_chief = worker_index == 0
+        self.save_root = directory if self.is_chief else os.path.join(directory, f".worker-{worker_index}")
+        self.every_steps = int(every_steps)
+        self.max_to_keep = max_to_keep
+        self.options = checkpoint_options(async_write)
+        self.stage = None
+
+        if not resume and os.path.isdir(self.save_root):
+            # A fresh run must not pick up a later stage of an older run
+            shutil.rmtree(self.save_root)
+        self.resume_stage = self._latest_stage() if resume else None
+        if resume:
+            if self.resume_stage is None:
+                print(f"No checkpoint in {directory}; starting from scratch")
+            else:
+                print(f"Resuming from stage {self.resume_stage} in {directory}")
+
+    def _latest_stage(self):
+        stages = []
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.startswith("stage-") and tf.train.latest_checkpoint(
+                        os.path.join(self.directory, name)):
+                    stages.append(int(name.split("-", 1)[1]))
+        return max(stages) if stages else None
+
+    def fit(self, stage, model, dataset_fn, steps_per_epoch, epochs, callbacks=(), **fit_kwargs):
+        """model.fit for ``stage`` with checkpointing; ``dataset_fn(skip_batches)``
+        returns the endless training dataset. Returns the last History, or
+        None if the stage was already finished."""
+        self.stage = stage
+        callbacks = list(callbacks)
+        if self.resume_stage is not None and stage < self.resume_stage:
+            print(f"Stage {stage} already finished; skipping")
+            return None
+
+        ckpt = tf.train.Checkpoint(
+            model=model,
+            optimizer=model.optimizer,
+            epoch=tf.Variable(0, dtype=tf.int64),
+            step=tf.Variable(0, dtype=tf.int64),
+            done=tf.Variable(False),
+            callbacks=tf.Variable("", dtype=tf.string),
+            has_best=tf.Variable(False),
+            best_weights=[tf.Variable(tf.zeros_like(w), trainable=False) for w in model.weights],
+        )
+        manager = tf.train.CheckpointManager(
+            ckpt, os.path.join(self.save_root, f"stage-{stage}"),
+            max_to_keep=self.max_to_keep if self.is_chief else 1
+        )
+        latest = tf.train.latest_checkpoint(os.path.join(self.directory, f"stage-{stage}"))
+        if self.resume_stage == stage and latest:
+            ckpt.restore(latest).expect_partial()
+            print(f"Restored {latest}")
+        epoch, step = int(ckpt.epoch.numpy()), int(ckpt.step.numpy())
+        if bool(ckpt.done.numpy()) or epoch >= epochs:
+            print(f"Stage {stage} already finished; restored its final weights")
+            return None
+
+        saver = _StageCheckpoint(self, ckpt, manager, callbacks, steps_per_epoch, epochs, step)
+        history = None
+        if step:
+            # Finish the interrupted epoch, then continue with whole epochs
+            history = model.fit(
+                dataset_fn(epoch * steps_per_epoch + step),
+                steps_per_epoch=steps_per_epoch - step, epochs=epoch + 1, initial_epoch=epoch,
+                callbacks=callbacks + [saver], **fit_kwargs
+            )
+            epoch += 1
+            if model.stop_training or epoch >= epochs:
+                return history
+        history = model.fit(
+            dataset_fn(epoch * steps_per_epoch),
+            steps_per_epoch=steps_per_epoch, epochs=epochs, initial_epoch=epoch,
+            callbacks=callbacks + [saver], **fit_kwargs
+        )
+        return history
@@ -0,0 +1,132 @@
+"""
+Per-worker CPU thread planning.
+
+TensorFlow (and ONNX Runtime / TFLite) size their thread pools to every core
+on the machine. With several gunicorn workers per host that means
+``workers x cores`` busy threads fighting over ``cores`` CPUs. The plan
+divides the CPUs this process may use (affinity mask and cgroup quota)
+between the workers:
+
+    intra-op threads = usable CPUs // workers
+    inter-op threads = 1, or 2 with more than 4 threads per worker
+
+and optionally pins each worker to its own slice of CPUs. Every value can be
+overridden from the environment (see ``plan_from_env``). The plan must be
+applied after the runtime is imported and before the model is loaded, which
+``utils/startup.py`` does between those two phases.
+"""
+
+import logging
+import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def usable_cpus():
+    """CPU ids this process may run on, trimmed to the cgroup CPU quota"""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count() or 1))
+
+    # Containers (Render, HF Spaces) often get a quota smaller than the
+    # visible core count
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            limit = max(1, int(int(quota) / int(period)))
+            cpus = cpus[:limit]
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def plan_threads(cpus, workers=1, worker_index=0, pin=False, intra=0, inter=0):
+    """Thread counts (and CPU set, when pinning) for one worker; 0 = automatic"""
+    workers = max(int(workers), 1)
+    per_worker = max(len(cpus) // workers, 1)
+    intra = int(intra) or per_worker
+    inter = int(inter) or (2 if intra > 4 else 1)
+
+    affinity = None
+    if pin and len(cpus) >= workers:
+        start = (int(worker_index) % workers) * per_worker
+        affinity = cpus[start:start + per_worker]
+
+    return {
+        "usable_cpus": len(cpus),
+        "workers": workers,
+        "worker_index": int(worker_index),
+        "intra_op_threads": intra,
+        "inter_op_threads": inter,
+        "affinity": affinity,
+    }
+
+
+def plan_from_env():
+    """Plan for this process; SERVING_WORKERS / SERVING_WORKER_INDEX are set
+    per worker by gunicorn.conf.py"""
+    workers = os.environ.get("SERVING_WORKERS") or os.environ.get("WEB_CONCURRENCY") or "1"
+    return plan_threads(
+        usable_cpus(),
+        workers=int(workers),
+        worker_index=int(os.environ.get("SERVING_WORKER_INDEX", "0")),
+        pin=os.environ.get("CPU_AFFINITY", "0") == "1",
+        intra=int(os.environ.get("TF_INTRA_OP_THREADS", "0")),
+        inter=int(os.environ.get("TF_INTER_OP_THREADS", "0")),
+    )
+
+
+def backend_thread_options(plan, backend_name):
+    """num_threads options for non-TensorFlow runtimes, unless set explicitly"""
+    if backend_name == "tflite" and "TFLITE_THREADS" not in os.environ:
+        pool_size = int(os.environ.get("TFLITE_POOL_SIZE", "2"))
+        return {"num_threads": max(plan["intra_op_threads"] // max(pool_size, 1), 1)}
+    if backend_name == "onnx" and "ONNX_THREADS" not in os.environ:
+        return {"num_threads": plan["intra_op_threads"]}
+    return {}
+
+
+def apply_plan(plan, backend_name):
+    """Pin CPUs and size TensorFlow's pools; call before the model is loaded"""
+    if plan["affinity"] and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, plan["affinity"])
+    # OpenMP-based kernels (oneDNN, ONNX Runtime) read this on first use
+    os.environ.setdefault("OMP_NUM_THREADS", str(plan["intra_op_threads"]))
+
+    if backend_name == "keras":
+        import tensorflow as tf
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(plan["intra_op_threads"])
+            tf.config.threading.set_inter_op_parallelism_threads(plan["inter_op_threads"])
+        except RuntimeError as e:
+            # Runtime already initialised (e.g. TF used before the loader ran)
+            logger.warning(f"Could not set TensorFlow thread pools: {str(e)}")
+
+    logger.info(
+        f"CPU plan: worker {plan['worker_index'] + 1}/{plan['workers']} on "
+        f"{plan['usable_cpus']} usable CPUs -> intra-op {plan['intra_op_threads']}, "
+        f"inter-op {plan['inter_op_threads']}, "
+        f"affinity {plan['affinity'] if plan['affinity'] else 'not pinned'}"
+    )
+
+
+def self_benchmark(backend, batch_sizes=(1,), iters=5):
+    """Mean latency per batch size of the loaded backend, logged at startup"""
+    results = {}
+    for b in batch_sizes:
+        batch = np.zeros((b,) + tuple(backend.input_shape), dtype=np.float32)
+        backend.predict_batch(batch)
+        start = time.perf_counter()
+        for _ in range(iters):
+            backend.predict_batch(batch)
+        ms = (time.perf_counter() - start) * 1000.0 / iters
+        results[b] = {"ms": round(ms, 2), "images_per_s": round(b / (ms / 1000.0), 1)}
+    logger.info("Self-benchmark: " + ", ".join(
+        f"batch {b} {r['ms']:.1f} ms ({r['images_per_s']:.0f} img/s)" for b, r in results.items()
+    ))
+    return results
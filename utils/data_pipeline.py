@@ -0,0 +1,310 @@
+"""
+tf.data input pipeline for the training scripts.
+
+Replaces ``ImageDataGenerator.flow_from_directory``, which reads, decodes and
+augments one image at a time in Python. Here files are read and decoded in
+parallel (``num_parallel_calls=AUTOTUNE``), augmentation runs on whole
+batches as a single projective-transform op, and batches are prefetched so
+the model never waits on input:
+
+    paths -> shuffle -> read + decode + resize (parallel) -> batch
+          -> augment + rescale (vectorized) -> prefetch
+
+``flow_from_directory`` keeps the generator's conventions so the scripts
+change little: classes are the sorted sub-directories, labels are one-hot
+(``class_mode="categorical"``), the augmentation keywords are the
+ImageDataGenerator ones (``rotation_range``, ``zoom_range``,
+``width_shift_range``, ``height_shift_range``, ``horizontal_flip``; fill
+mode nearest), pixels are rescaled to [0, 1], and ``subset`` /
+``validation_split`` select the same files Keras does: the first
+``validation_split`` of every class's sorted file list is validation, the
+rest training.
+
+With ``compiled_dir`` the images come from a decode-once uint8 array
+(utils/dataset_cache.py) instead of the JPEG files, compiled on first use
+and memory-mapped afterwards.
+"""
+
+import functools
+import math
+import os
+
+import numpy as np
+import tensorflow as tf
+
+IMG_SIZE = (224, 224)
+AUTOTUNE = tf.data.AUTOTUNE
+
+# Formats tf.io.decode_image understands
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif")
+
+
+# ============================================
+# FILE LISTING
+# ============================================
+def list_images(directory, subset=None, validation_split=0.0):
+    """(paths, labels, class_names) in flow_from_directory order.
+
+    ``subset`` is None, "training" or "validation"; the split is taken per
+    class over the sorted file list, validation first, exactly like Keras.
+    """
+    class_names = sorted(
+        d for d in os.listdir(directory)
+        if os.path.isdir(os.path.join(directory, d))
+    )
+    paths = []
+    labels = []
+    for idx, name in enumerate(class_names):
+        for root, _, fnames in sorted(os.walk(os.path.join(directory, name)), key=lambda w: w[0]):
+            for f in sorted(fnames):
+                if f.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(root, f))
+                    labels.append(idx)
+    labels = np.array(labels, dtype=np.int64)
+    if subset is not None:
+        keep = split_indices(labels, subset, validation_split)
+        paths = [paths[i] for i in keep]
+        labels = labels[keep]
+    return paths, labels, class_names
+
+
+def split_indices(labels, subset, validation_split):
+    """Indices of ``subset`` in a class-ordered label array: per class, the
+    first ``validation_split`` of its files are validation, the rest training"""
+    if subset not in (None, "training", "validation"):
+        raise ValueError(f"subset must be 'training' or 'validation', got {subset!r}")
+    if subset is None or not validation_split:
+        return np.arange(len(labels))
+    keep = []
+    for c in np.unique(labels):
+        idx = np.flatnonzero(labels == c)
+        cut = int(validation_split * len(idx))
+        keep.append(idx[:cut] if subset == "validation" else idx[cut:])
+    return np.concatenate(keep) if keep else np.arange(0)
+
+
+def decode_image(path, image_size=IMG_SIZE, interpolation="nearest"):
+    """Read, decode and resize one file to a (H, W, 3) uint8 tensor"""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.cast(tf.image.resize(image, image_size, method=interpolation), tf.uint8)
+    image.set_shape(tuple(image_size) + (3,))
+    return image
+
+
+# ============================================
+# AUGMENTATION
+# ============================================
+def augment_batch(images, rotation_range=0, zoom_range=0.0, width_shift_range=0.0,
+                  height_shift_range=0.0, horizontal_flip=False):
+    """Random rotation/zoom/shift/flip for a (N, H, W, C) float32 batch.
+
+    Same sampling as ImageDataGenerator.random_transform (rotation in
+    degrees, independent x/y zoom in [1 - z, 1 + z], shifts as fractions of
+    the image size) composed into one transform per image about the image
+    centre, with bilinear sampling and nearest fill.
+    """
+    shape = tf.shape(images)
+    n = shape[0]
+    h = tf.cast(shape[1], tf.float32)
+    w = tf.cast(shape[2], tf.float32)
+
+    theta = tf.random.uniform([n], -rotation_range, rotation_range) * (math.pi / 180.0)
+    zx = tf.random.uniform([n], 1.0 - zoom_range, 1.0 + zoom_range)
+    zy = tf.random.uniform([n], 1.0 - zoom_range, 1.0 + zoom_range)
+    tx = tf.random.uniform([n], -width_shift_range, width_shift_range) * w
+    ty = tf.random.uniform([n], -height_shift_range, height_shift_range) * h
+
+    # Output pixel -> input pixel: R @ Z @ (p - c) + R @ t + c
+    cos, sin = tf.cos(theta), tf.sin(theta)
+    a0, a1 = cos * zx, -sin * zy
+    b0, b1 = sin * zx, cos * zy
+    cx, cy = (w - 1.0) / 2.0, (h - 1.0) / 2.0
+    a2 = cos * tx - sin * ty + cx - (a0 * cx + a1 * cy)
+    b2 = sin * tx + cos * ty + cy - (b0 * cx + b1 * cy)
+    zeros = tf.zeros_like(a0)
+    transforms = tf.stack([a0, a1, a2, b0, b1, b2, zeros, zeros], axis=1)
+
+    images = tf.raw_ops.ImageProjectiveTransformV3(
+        images=images,
+        transforms=transforms,
+        output_shape=shape[1:3],
+        fill_value=0.0,
+        interpolation="BILINEAR",
+        fill_mode="NEAREST",
+    )
+    if horizontal_flip:
+        flip = tf.random.uniform([n]) < 0.5
+        images = tf.where(flip[:, None, None, None], tf.reverse(images, axis=[2]), images)
+    return images
+
+
+# ============================================
+# DATASETS
+# ============================================
+def augment_and_rescale(images, labels, augment=None):
+    images = tf.cast(images, tf.float32)
+    if augment:
+        images = augment_batch(images, **augment)
+    return images * (1.0 / 255.0), labels
+
+
+def make_dataset(paths, labels, num_classes, batch_size=32, image_size=IMG_SIZE,
+                 augment=None, shuffle=False, seed=None, cache=False,
+                 interpolation="nearest", repeat=False, skip_batches=0, shard=None):
+    """Batched (images, one-hot labels) dataset of float32 images in [0, 1].
+
+    ``augment`` is a dict of augment_batch keywords (None for none).
+    ``cache`` keeps the decoded, resized uint8 images in memory (True) or in
+    a file at that path, so later epochs skip reading and decoding.
+    ``interpolation`` defaults to nearest, which is what load_img uses.
+    ``repeat`` makes the dataset endless (one reshuffle per epoch) and
+    ``skip_batches`` starts it that many batches in; with a fixed ``seed``
+    that resumes an interrupted run at the same position. ``shard`` is
+    (num_shards, index): only every num_shards-th file, for one worker of a
+    multi-worker run (utils/distributed.py).
+    """
+    def load(path, label):
+        return decode_image(path, image_size, interpolation), tf.one_hot(label, num_classes)
+
+    def finish(images, labels):
+        return augment_and_rescale(images, labels, augment)
+
+    def load_batch(batch_paths, batch_labels):
+        # One decoded batch from one batch of paths
+        ds = tf.data.Dataset.from_tensor_slices((batch_paths, batch_labels))
+        return ds.map(load, num_parallel_calls=AUTOTUNE).batch(batch_size)
+
+    ds = tf.data.Dataset.from_tensor_slices((list(paths), np.asarray(labels)))
+    if shard:
+        ds = ds.shard(*shard)
+    if cache:
+        # Decode once, then shuffle decoded images each epoch
+        ds = ds.map(load, num_parallel_calls=AUTOTUNE)
+        ds = ds.cache(cache if isinstance(cache, str) else "")
+        if shuffle:
+            ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    elif shuffle:
+        # Shuffle the (cheap) paths, not decoded images
+        ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+
+    if skip_batches and not cache:
+        # Resuming: skip whole batches of paths, so nothing before the
+        # resume point is read or decoded, then decode the remaining
+        # batches a few at a time, in order
+        ds = ds.batch(batch_size)
+        if repeat:
+            ds = ds.repeat()
+        ds = ds.skip(skip_batches)
+        ds = ds.interleave(load_batch, cycle_length=4, num_parallel_calls=AUTOTUNE, deterministic=True)
+    else:
+        if not cache:
+            ds = ds.map(load, num_parallel_calls=AUTOTUNE, deterministic=not shuffle)
+        ds = ds.batch(batch_size)
+        if repeat:
+            ds = ds.repeat()
+        if skip_batches:
+            # The first pass decodes the skipped images to fill the cache
+            ds = ds.skip(skip_batches)
+    ds = ds.map(finish, num_parallel_calls=AUTOTUNE, deterministic=not shuffle)
+    return ds.prefetch(AUTOTUNE)
+
+
+def make_array_dataset(images, labels, num_classes, indices=None, batch_size=32,
+                       augment=None, shuffle=False, seed=None, repeat=False, skip_batches=0,
+                       shard=None):
+    """Like make_dataset, over a (N, H, W, 3) uint8 array (typically a
+    memory-mapped compiled dataset); ``indices`` selects a subset"""
+    indices = np.arange(len(labels)) if indices is None else np.asarray(indices)
+    image_shape = tuple(images.shape[1:])
+
+    def gather(idx):
+        # Sorted reads are sequential within the memory map; order inside
+        # a batch doesn't matter for training
+        idx = np.sort(idx) if shuffle else idx
+        return images[idx], labels[idx]
+
+    def load(idx):
+        batch, batch_labels = tf.numpy_function(gather, [idx], [tf.uint8, tf.int64])
+        batch.set_shape((None,) + image_shape)
+        return batch, tf.one_hot(batch_labels, num_classes)
+
+    def finish(images, labels):
+        return augment_and_rescale(images, labels, augment)
+
+    ds = tf.data.Dataset.from_tensor_slices(indices.astype(np.int64))
+    if shard:
+        ds = ds.shard(*shard)
+    if shuffle:
+        ds = ds.shuffle(len(indices), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+    if repeat:
+        ds = ds.repeat()
+    if skip_batches:
+        # Only index batches are skipped, no images are read
+        ds = ds.skip(skip_batches)
+    ds = ds.map(load, num_parallel_calls=AUTOTUNE, deterministic=not shuffle)
+    ds = ds.map(finish, num_parallel_calls=AUTOTUNE, deterministic=not shuffle)
+    return ds.prefetch(AUTOTUNE)
+
+
+def with_class_weights(dataset, class_weights):
+    """Add per-example weights from a {class index: weight} dict, the same
+    weighting fit(class_weight=...) applies; that argument isn't accepted
+    for distributed datasets"""
+    table = tf.constant([class_weights[i] for i in range(len(class_weights))], tf.float32)
+    return dataset.map(lambda x, y: (x, y, tf.gather(table, tf.argmax(y, axis=-1))))
+
+
+class DirectoryDataset:
+    """A tf.data pipeline over a class-per-directory tree, with the
+    DirectoryIterator attributes the scripts use (classes, class_indices,
+    num_classes, samples)"""
+
+    def __init__(self, directory, batch_size=32, image_size=IMG_SIZE, augment=None,
+                 subset=None, validation_split=0.0, shuffle=True, seed=None,
+                 cache=False, interpolation="nearest", compiled_dir=None):
+        self.directory = directory
+        self.batch_size = batch_size
+
+        if compiled_dir:
+            from utils.dataset_cache import load_compiled
+            images, labels, filenames, class_names = load_compiled(
+                directory, compiled_dir, image_size=image_size, interpolation=interpolation
+            )
+            keep = split_indices(labels, subset, validation_split)
+            self.filenames = [filenames[i] for i in keep]
+            self.classes = labels[keep]
+            self.num_classes = len(class_names)
+            self._make = functools.partial(
+                make_array_dataset, images, labels, self.num_classes, indices=keep,
+                batch_size=batch_size, augment=augment, shuffle=shuffle, seed=seed,
+            )
+        else:
+            self.filenames, self.classes, class_names = list_images(directory, subset, validation_split)
+            self.num_classes = len(class_names)
+            self._make = functools.partial(
+                make_dataset, self.filenames, self.classes, self.num_classes,
+                batch_size=batch_size, image_size=image_size, augment=augment,
+                shuffle=shuffle, seed=seed, cache=cache, interpolation=interpolation,
+            )
+        self.dataset = self._make()
+        self.class_indices = {name: i for i, name in enumerate(class_names)}
+        self.samples = len(self.filenames)
+
+    def __len__(self):
+        return math.ceil(self.samples / self.batch_size)
+
+    def repeated(self, skip_batches=0, batch_size=None, shard=None):
+        """Endless version of ``dataset`` starting ``skip_batches`` in, for
+        fit(steps_per_epoch=len(data)) and resuming (see utils/checkpointing.py);
+        ``batch_size`` / ``shard`` override them for one worker of a
+        multi-worker run"""
+        return self._make(repeat=True, skip_batches=skip_batches,
+                          batch_size=batch_size or self.batch_size, shard=shard)
+
+
+def flow_from_directory(directory, **kwargs):
+    """DirectoryDataset for ``directory``; prints the same summary line Keras does"""
+    data = DirectoryDataset(directory, **kwargs)
+    print(f"Found {data.samples} images belonging to {data.num_classes} classes.")
+    return data
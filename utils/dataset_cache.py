@@ -0,0 +1,153 @@
+"""
+Decode-once compiled dataset for training and evaluation.
+
+Decoding and resizing the JPEG tree costs more than a MobileNetV2 training
+step on CPU, and every epoch of every script used to pay it again. The
+compiler decodes each split once into a memory-mapped uint8 array:
+
+    data/compiled/train-1a2b3c4d/     # split name + hash of its absolute path
+        images.npy      # (N, 224, 224, 3) uint8, np.load(..., mmap_mode="r")
+        labels.npy      # (N,) int64 class index
+        manifest.json   # class names + every source file's size and mtime
+
+Files are stored in flow_from_directory order, so class indices and the
+validation split are the same as reading the directory. The manifest is
+compared against a fresh listing (a stat per file, no decoding) on every
+use, and the split is recompiled when any file was added, removed or
+changed, or the image size / interpolation differ. After that, epochs only
+read pages of the array that the OS page cache already holds.
+
+    python -m utils.dataset_cache <SkinDisease dir>              # train/ and test/
+    python -m utils.dataset_cache <SkinDisease dir> --splits test --force
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from utils.data_pipeline import AUTOTUNE, IMG_SIZE, decode_image, list_images
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+DEFAULT_DIR = os.path.join("data", "compiled")
+
+
+def default_split_dir(source_dir, out_dir=DEFAULT_DIR):
+    """data/compiled/<split name>-<path hash>, e.g. data/compiled/train-1a2b3c4d.
+    The hash keeps two source trees with the same split name apart."""
+    source = os.path.abspath(source_dir)
+    digest = hashlib.sha256(source.encode()).hexdigest()[:8]
+    return os.path.join(out_dir, f"{os.path.basename(source)}-{digest}")
+
+
+def source_manifest(source_dir, image_size=IMG_SIZE, interpolation="nearest"):
+    """Manifest describing the split as it is on disk now, plus its file list"""
+    paths, labels, class_names = list_images(source_dir)
+    files = []
+    for path in paths:
+        st = os.stat(path)
+        rel = os.path.relpath(path, source_dir).replace(os.sep, "/")
+        files.append([rel, st.st_size, st.st_mtime_ns])
+    manifest = {
+        "version": FORMAT_VERSION,
+        "image_size": [int(d) for d in image_size],
+        "interpolation": interpolation,
+        "class_names": class_names,
+        "files": files,
+    }
+    return manifest, paths, labels
+
+
+def _read_manifest(split_dir):
+    try:
+        with open(os.path.join(split_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def compile_split(source_dir, split_dir, image_size=IMG_SIZE, interpolation="nearest"):
+    """Decode every image of ``source_dir`` into ``split_dir``"""
+    import tensorflow as tf
+
+    manifest, paths, labels = source_manifest(source_dir, image_size, interpolation)
+
+    # Same temp-dir-then-swap as the graph cache, so a crashed or concurrent
+    # compile never leaves a half-written split behind
+    tmp_dir = f"{split_dir}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    start = time.perf_counter()
+    images = np.lib.format.open_memmap(
+        os.path.join(tmp_dir, "images.npy"), mode="w+", dtype=np.uint8,
+        shape=(len(paths),) + tuple(image_size) + (3,)
+    )
+    ds = tf.data.Dataset.from_tensor_slices(list(paths))
+    ds = ds.map(lambda p: decode_image(p, image_size, interpolation), num_parallel_calls=AUTOTUNE)
+    ds = ds.batch(256).prefetch(AUTOTUNE)
+    offset = 0
+    for batch in ds.as_numpy_iterator():
+        images[offset:offset + len(batch)] = batch
+        offset += len(batch)
+        print(f"  {split_dir}: {offset}/{len(paths)} images", end="\r", flush=True)
+    images.flush()
+    del images
+    np.save(os.path.join(tmp_dir, "labels.npy"), labels)
+    # Manifest last: a split without one is never considered fresh
+    with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f)
+
+    os.makedirs(os.path.dirname(os.path.abspath(split_dir)), exist_ok=True)
+    # If another process (e.g. a sibling training worker) got there first,
+    # keep its copy
+    if os.path.isdir(split_dir):
+        if _read_manifest(split_dir) == manifest:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return split_dir
+        old_dir = f"{split_dir}.old{os.getpid()}"
+        os.replace(split_dir, old_dir)
+        os.replace(tmp_dir, split_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        try:
+            os.replace(tmp_dir, split_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(f"Compiled {len(paths)} images from {source_dir} into {split_dir} "
+          f"in {time.perf_counter() - start:.1f}s")
+    return split_dir
+
+
+def load_compiled(source_dir, out_dir=DEFAULT_DIR, image_size=IMG_SIZE,
+                  interpolation="nearest", force=False):
+    """(images memmap, labels, filenames, class_names) for ``source_dir``,
+    compiling it first if the compiled copy is missing or stale"""
+    split_dir = default_split_dir(source_dir, out_dir)
+    manifest, paths, _ = source_manifest(source_dir, image_size, interpolation)
+    if force or _read_manifest(split_dir) != manifest:
+        compile_split(source_dir, split_dir, image_size, interpolation)
+    images = np.load(os.path.join(split_dir, "images.npy"), mmap_mode="r")
+    labels = np.load(os.path.join(split_dir, "labels.npy"))
+    return images, labels, paths, manifest["class_names"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile image splits into memory-mapped arrays")
+    parser.add_argument("data_dir", help="Directory containing the split directories")
+    parser.add_argument("--splits", nargs="+", default=["train", "test"])
+    parser.add_argument("--out", default=DEFAULT_DIR)
+    parser.add_argument("--force", action="store_true", help="Recompile even if up to date")
+    args = parser.parse_args()
+
+    for split in args.splits:
+        images, labels, _, class_names = load_compiled(
+            os.path.join(args.data_dir, split), args.out, force=args.force
+        )
+        print(f"{split}: {len(labels)} images, {len(class_names)} classes, "
+              f"{images.nbytes / 1e9:.2f} GB at {default_split_dir(os.path.join(args.data_dir, split), args.out)}")
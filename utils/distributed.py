@@ -0,0 +1,166 @@
+"""
+Multi-worker data-parallel training on CPU hosts.
+
+Each worker is one process running the same training script with
+``tf.distribute.MultiWorkerMirroredStrategy``. Workers are listed as
+``host:port`` (the first one is the chief, which writes checkpoints and the
+final model) and each process is told its own index:
+
+    # on host A                                  # on host B
+    python train_mobilenet_finetune.py \\         python train_mobilenet_finetune.py \\
+        --workers a:12345,b:12345 --worker-index 0   --workers a:12345,b:12345 --worker-index 1
+
+``--local-workers N`` starts N workers as local processes on free ports
+instead, with the machine's CPUs split between them (utils/cpu_tuning.py),
+which is how the setup is tested on one box.
+
+The per-worker batch stays at the script's BATCH_SIZE, so the global batch
+and the learning rate are scaled linearly with the number of workers
+(``scale_for_workers``). Every worker reads only its own shard of the
+training indices (``distribute``), so no image is decoded twice per epoch.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# Set by launch_local so a worker knows how many siblings share its CPUs
+LOCAL_WORKERS_ENV = "TRAINING_LOCAL_WORKERS"
+
+
+def parse_workers(spec):
+    """'host:port,host:port' -> ['host:port', ...]"""
+    workers = [w.strip() for w in (spec or "").split(",") if w.strip()]
+    for w in workers:
+        host, _, port = w.rpartition(":")
+        if not host or not port.isdigit():
+            raise ValueError(f"Worker address must be host:port, got {w!r}")
+    return workers
+
+
+def tf_config(workers, index):
+    return json.dumps({"cluster": {"worker": list(workers)}, "task": {"type": "worker", "index": int(index)}})
+
+
+def free_ports(n):
+    sockets = []
+    try:
+        for _ in range(n):
+            s = socket.socket()
+            s.bind(("localhost", 0))
+            sockets.append(s)
+        return [s.getsockname()[1] for s in sockets]
+    finally:
+        for s in sockets:
+            s.close()
+
+
+# ============================================
+# WORKER SIDE
+# ============================================
+def setup_strategy(workers=None, worker_index=0):
+    """Strategy for this process: MultiWorkerMirroredStrategy when there is
+    more than one worker, else the default strategy. Must run before any
+    other TensorFlow op. Returns (strategy, number of workers, worker index)."""
+    import tensorflow as tf
+
+    workers = parse_workers(workers) if isinstance(workers, str) else list(workers or [])
+    if workers:
+        os.environ["TF_CONFIG"] = tf_config(workers, worker_index)
+    cluster = json.loads(os.environ.get("TF_CONFIG", "{}")).get("cluster", {})
+    num_workers = len(cluster.get("worker", []))
+    if num_workers <= 1:
+        return tf.distribute.get_strategy(), 1, 0
+
+    worker_index = json.loads(os.environ["TF_CONFIG"])["task"]["index"]
+    local = int(os.environ.get(LOCAL_WORKERS_ENV, "0"))
+    if local > 1:
+        # Siblings on the same machine: give each its own slice of CPUs
+        from utils.cpu_tuning import apply_plan, plan_threads, usable_cpus
+        apply_plan(plan_threads(usable_cpus(), workers=local, worker_index=worker_index, pin=True), "keras")
+
+    strategy = tf.distribute.MultiWorkerMirroredStrategy(
+        communication_options=tf.distribute.experimental.CommunicationOptions(
+            implementation=tf.distribute.experimental.CommunicationImplementation.RING
+        )
+    )
+    print(f"Worker {worker_index + 1}/{num_workers}: {strategy.num_replicas_in_sync} replicas in sync")
+    return strategy, num_workers, worker_index
+
+
+def scale_for_workers(per_worker_batch, learning_rate, num_workers):
+    """(global batch, learning rate) under the linear scaling rule"""
+    return per_worker_batch * num_workers, learning_rate * num_workers
+
+
+def distribute(strategy, make_dataset, global_batch):
+    """Per-worker input: ``make_dataset(batch_size=..., shard=(n, i))`` is
+    called once per worker with its per-replica batch and shard"""
+    def dataset_fn(context):
+        return make_dataset(
+            batch_size=context.get_per_replica_batch_size(global_batch),
+            shard=(context.num_input_pipelines, context.input_pipeline_id),
+        )
+    return strategy.distribute_datasets_from_function(dataset_fn)
+
+
+# ============================================
+# LOCAL LAUNCHER
+# ============================================
+def without_option(argv, name):
+    """argv minus ``name VALUE`` / ``name=VALUE``, to re-run a script as a worker"""
+    out = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg == name:
+            skip = True
+        elif not arg.startswith(name + "="):
+            out.append(arg)
+    return out
+
+
+def launch_local(argv, num_workers, capture_chief=False, env=None):
+    """Run ``python argv...`` as ``num_workers`` local workers on free ports.
+    Each gets ``--workers`` / ``--worker-index`` appended. Returns (exit code,
+    chief's stdout if captured)."""
+    workers = [f"localhost:{p}" for p in free_ports(num_workers)]
+    base_env = dict(os.environ, **(env or {}))
+    base_env[LOCAL_WORKERS_ENV] = str(num_workers)
+    base_env.pop("TF_CONFIG", None)
+
+    # The chief's output goes to a file rather than a pipe, so waiting on
+    # it can't block noticing that another worker died
+    chief_file = tempfile.TemporaryFile(mode="w+") if capture_chief else None
+    procs = []
+    for i in range(num_workers):
+        cmd = [sys.executable] + list(argv) + ["--workers", ",".join(workers), "--worker-index", str(i)]
+        stdout = chief_file if i == 0 else None
+        procs.append(subprocess.Popen(cmd, env=base_env, stdout=stdout, text=True))
+    print(f"Started {num_workers} local workers on {', '.join(workers)}")
+
+    try:
+        # One failed worker leaves the others blocked in collectives
+        while any(p.poll() is None for p in procs):
+            if any(p.returncode not in (None, 0) for p in procs):
+                break
+            time.sleep(0.5)
+    finally:
+        for p in procs:
+            if p.poll() is None:
+                p.terminate()
+        for p in procs:
+            p.wait()
+    code = next((p.returncode for p in procs if p.returncode), 0)
+
+    chief_out = None
+    if chief_file is not None:
+        chief_file.seek(0)
+        chief_out = chief_file.read()
+        chief_file.close()
+    return code, chief_out
@@ -0,0 +1,120 @@
+"""
+Persisted compiled-graph cache for the Keras backend.
+
+Starting from the ``.keras`` file means unpacking the zip, rebuilding every
+layer in Python and tracing the serving function once per batch bucket. The
+graph cache saves the already traced serving functions (one per bucket,
+fixed input signature) together with the weights as a SavedModel next to
+the model:
+
+    final_skin_disease_model.keras.graph/
+
+Later starts restore the ready-to-run graphs with ``tf.saved_model.load``
+and skip both Keras deserialization and tracing. The cache is keyed on the
+model file's hash and the TensorFlow version (and the bucket set), and is
+rebuilt automatically when any of them changes.
+
+    python -m utils.graph_cache final_skin_disease_model.keras
+"""
+
+import json
+import os
+import shutil
+import sys
+
+from utils.cache import model_fingerprint
+
+MANIFEST = "graph_manifest.json"
+
+
+def default_cache_dir(model_path):
+    """Cache lives next to the model: final_skin_disease_model.keras.graph/"""
+    return model_path + ".graph"
+
+
+def cache_key(model_path):
+    import tensorflow as tf
+    return {"model_sha256": model_fingerprint(model_path), "tensorflow": tf.__version__}
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(model_path, cache_dir=None, buckets=None):
+    """True if the cache was built from this model file under this TF version"""
+    manifest = _read_manifest(cache_dir or default_cache_dir(model_path))
+    if manifest is None or manifest.get("key") != cache_key(model_path):
+        return False
+    return buckets is None or manifest.get("buckets") == sorted(int(b) for b in buckets)
+
+
+def export_graph_cache(model, model_path, buckets, input_shape, cache_dir=None):
+    """Trace one serving function per bucket and save them as a SavedModel"""
+    import tensorflow as tf
+
+    cache_dir = cache_dir or default_cache_dir(model_path)
+    buckets = sorted(int(b) for b in buckets)
+    input_shape = [int(d) for d in input_shape]
+
+    module = tf.Module()
+    module.model = model
+    for b in buckets:
+        fn = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec([b] + input_shape, tf.float32)],
+            autograph=False
+        )
+        fn.get_concrete_function()
+        setattr(module, f"serve_{b}", fn)
+
+    # Each process writes its own temp dir, so workers starting together
+    # never interleave their files
+    tmp_dir = f"{cache_dir}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tf.saved_model.save(module, tmp_dir)
+    with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+        json.dump({
+            "key": cache_key(model_path),
+            "buckets": buckets,
+            "input_shape": input_shape,
+        }, f, indent=2)
+
+    # Swap in atomically; if another process already did, keep theirs
+    if os.path.isdir(cache_dir):
+        if is_fresh(model_path, cache_dir, buckets):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return cache_dir
+        old_dir = f"{cache_dir}.old{os.getpid()}"
+        os.replace(cache_dir, old_dir)
+        os.replace(tmp_dir, cache_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, cache_dir)
+    return cache_dir
+
+
+def load_graph_cache(model_path, cache_dir=None, buckets=None):
+    """Restored SavedModel with its buckets and input shape, or None if stale"""
+    import tensorflow as tf
+
+    cache_dir = cache_dir or default_cache_dir(model_path)
+    if not is_fresh(model_path, cache_dir, buckets):
+        return None
+    manifest = _read_manifest(cache_dir)
+    loaded = tf.saved_model.load(cache_dir)
+    return loaded, manifest["buckets"], tuple(manifest["input_shape"])
+
+
+if __name__ == "__main__":
+    import tensorflow as tf
+    from utils.inference import DEFAULT_BUCKETS
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "final_skin_disease_model.keras"
+    model = tf.keras.models.load_model(path)
+    out = export_graph_cache(model, path, DEFAULT_BUCKETS, model.input_shape[1:])
+    print(f"Graph cache written to {out}")
@@ -0,0 +1,157 @@
+"""
+Bounded, streaming upload ingest.
+
+Uploads are copied from the request stream in chunks into a spooled buffer
+(memory up to ``spool_memory_bytes``, then a temp file) while being hashed,
+and reading stops as soon as ``max_bytes`` is exceeded. The image header is
+then parsed without decoding pixels, so oversized pixel counts
+(decompression bombs) and uploads whose decode would exceed the per-request
+memory budget are rejected before any pixel data is allocated.
+"""
+
+import hashlib
+import tempfile
+import threading
+import warnings
+
+from PIL import Image
+
+from utils.preprocess import DRAFT_OVERSAMPLE, IMG_SIZE
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """Upload refused before decoding; carries a metrics reason and HTTP status"""
+
+    def __init__(self, reason, message, status=413):
+        super().__init__(message)
+        self.reason = reason
+        self.status = status
+
+
+class Upload:
+    """A spooled upload: file-like ``stream``, its sha256 ``digest`` and size"""
+
+    def __init__(self, stream, digest, size):
+        self.stream = stream
+        self.digest = digest
+        self.size = size
+
+    def read(self):
+        self.stream.seek(0)
+        return self.stream.read()
+
+    def close(self):
+        self.stream.close()
+
+
+def decode_footprint(image, target=IMG_SIZE):
+    """Estimated bytes allocated to decode ``image`` (header only, not loaded).
+
+    JPEGs are decoded with DCT scaling (1/2, 1/4 or 1/8) down to about
+    DRAFT_OVERSAMPLE x the target, so their footprint is much smaller than
+    the full pixel count suggests.
+    """
+    width, height = image.size
+    bands = max(len(image.getbands()), 3)
+    if image.format == "JPEG":
+        want_w, want_h = target[0] * DRAFT_OVERSAMPLE, target[1] * DRAFT_OVERSAMPLE
+        scale = 1
+        while scale < 8 and width // (scale * 2) >= want_w and height // (scale * 2) >= want_h:
+            scale *= 2
+        width, height = -(-width // scale), -(-height // scale)
+    return width * height * bands
+
+
+class UploadGuard:
+    """Limits plus counters for rejected requests and bytes read"""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, max_pixels=60_000_000,
+                 memory_budget_bytes=256 * 1024 * 1024,
+                 spool_memory_bytes=1024 * 1024):
+        self.max_bytes = int(max_bytes)
+        self.max_pixels = int(max_pixels)
+        self.memory_budget_bytes = int(memory_budget_bytes)
+        self.spool_memory_bytes = int(spool_memory_bytes)
+
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.bytes_read = 0
+        self.rejected = {}
+
+    def spool(self, source):
+        """Copy a readable stream into a bounded spool, hashing as it goes"""
+        digest = hashlib.sha256()
+        buf = tempfile.SpooledTemporaryFile(max_size=self.spool_memory_bytes)
+        size = 0
+        try:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > self.max_bytes:
+                    self._count_bytes(size)
+                    raise self._reject(
+                        "too_many_bytes",
+                        f"File too large. Max size: {self.max_bytes // (1024 * 1024)}MB"
+                    )
+                digest.update(chunk)
+                buf.write(chunk)
+        except Exception:
+            buf.close()
+            raise
+        self._count_bytes(size)
+        buf.seek(0)
+        return Upload(buf, digest.hexdigest(), size)
+
+    def open_image(self, stream):
+        """Parse the image header and enforce pixel/memory limits.
+
+        Returns a lazy PIL image; no pixel data has been decoded yet.
+        """
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+                image = Image.open(stream)
+        except Image.DecompressionBombError:
+            raise self._reject("too_many_pixels", "Image dimensions too large")
+        except Exception:
+            raise self._reject(
+                "not_an_image", "Could not read image: unsupported or corrupt file", 400
+            )
+
+        width, height = image.size
+        if width * height > self.max_pixels:
+            raise self._reject(
+                "too_many_pixels",
+                f"Image dimensions too large ({width}x{height}). "
+                f"Max: {self.max_pixels / 1e6:.0f} megapixels"
+            )
+        if decode_footprint(image) > self.memory_budget_bytes:
+            raise self._reject("over_memory_budget", "Image would exceed the memory budget")
+
+        with self._lock:
+            self.accepted += 1
+        return image
+
+    def stats(self):
+        with self._lock:
+            return {
+                "accepted": self.accepted,
+                "bytes_read": self.bytes_read,
+                "rejected": dict(self.rejected),
+                "max_bytes": self.max_bytes,
+                "max_pixels": self.max_pixels,
+                "memory_budget_bytes": self.memory_budget_bytes,
+            }
+
+    def _count_bytes(self, n):
+        with self._lock:
+            self.bytes_read += n
+
+    def _reject(self, reason, message, status=413):
+        with self._lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return UploadRejected(reason, message, status)
@@ -0,0 +1,222 @@
+"""
+Low-overhead Prometheus metrics.
+
+Every thread records into its own counters and histogram arrays, so the hot
+path takes no locks: an observation is a bucket search plus a few integer
+increments on data only that thread writes. A scrape sums the per-thread
+states. States of threads that have exited are folded into a retired total
+whenever a new thread registers (and on every scrape), so the registry only
+holds live threads even under a thread-per-request server that is never
+scraped.
+
+    METRICS = Metrics(prefix="dermai")
+    with METRICS.time("decode"):
+        ...
+    METRICS.inc("errors_total", {"endpoint": "/api/predict", "type": "too_large"})
+    text = METRICS.render(gauges={...})    # Prometheus text exposition format
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Seconds; spans sub-millisecond preprocessing up to slow CPU inference
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class _ThreadState:
+    """Metrics written by a single thread"""
+
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters = {}    # (name, labels) -> number
+        self.histograms = {}  # (name, labels) -> [bucket counts..., overflow, sum, count]
+
+
+class Metrics:
+    """Counters, up/down gauges and latency histograms aggregated per thread"""
+
+    def __init__(self, prefix="", buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix + "_" if prefix else ""
+        self.buckets = tuple(sorted(buckets))
+        self._help = {}
+        self._local = threading.local()
+        self._states = []  # (thread, state)
+        self._retired = _ThreadState()
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        """Set the HELP line for a metric"""
+        self._help[name] = help_text
+
+    def _state(self):
+        state = getattr(self._local, "state", None)
+        if state is None:
+            state = self._local.state = _ThreadState()
+            with self._lock:
+                self._retire_dead()
+                self._states.append((threading.current_thread(), state))
+        return state
+
+    def _retire_dead(self):
+        """Fold the states of exited threads into the retired total; caller holds the lock"""
+        live = []
+        for thread, state in self._states:
+            if thread.is_alive():
+                live.append((thread, state))
+            else:
+                self._merge(self._retired, state)
+        self._states = live
+
+    # ----------------------------------------
+    # RECORDING (hot path, lock-free)
+    # ----------------------------------------
+    def inc(self, name, labels=(), value=1):
+        """Add to a counter (or an up/down gauge when value is negative)"""
+        key = (name, tuple(sorted(dict(labels).items())))
+        counters = self._state().counters
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, seconds, labels=()):
+        """Record one latency sample into a histogram"""
+        key = (name, tuple(sorted(dict(labels).items())))
+        histograms = self._state().histograms
+        h = histograms.get(key)
+        if h is None:
+            # One slot per bucket, one for samples above the last bucket, then sum and count
+            h = histograms[key] = [0] * (len(self.buckets) + 3)
+        h[bisect.bisect_left(self.buckets, seconds)] += 1
+        h[-2] += seconds
+        h[-1] += 1
+
+    def observe_stage(self, stage, seconds):
+        self.observe("stage_latency_seconds", seconds, {"stage": stage})
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace[stage] = trace.get(stage, 0.0) + seconds
+
+    def start_trace(self):
+        """Also collect this thread's stage timings, for a per-request breakdown"""
+        self._local.trace = {}
+
+    def end_trace(self):
+        """Stage -> seconds recorded on this thread since start_trace()"""
+        trace = getattr(self._local, "trace", None)
+        self._local.trace = None
+        return trace or {}
+
+    @contextmanager
+    def time(self, stage):
+        """Time a block into stage_latency_seconds{stage=...}"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - start)
+
+    # ----------------------------------------
+    # SCRAPING
+    # ----------------------------------------
+    @staticmethod
+    def _merge(into, state):
+        for key, value in dict(state.counters).items():
+            into.counters[key] = into.counters.get(key, 0) + value
+        for key, h in dict(state.histograms).items():
+            total = into.histograms.get(key)
+            if total is None:
+                into.histograms[key] = list(h)
+            else:
+                for i, v in enumerate(h):
+                    total[i] += v
+
+    def snapshot(self):
+        """Sum of all per-thread states"""
+        total = _ThreadState()
+        with self._lock:
+            self._retire_dead()
+            self._merge(total, self._retired)
+            for _, state in self._states:
+                self._merge(total, state)
+        return total
+
+    def _format_labels(self, labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def _header(self, lines, name, kind):
+        full = self.prefix + name
+        if name in self._help:
+            lines.append(f"# HELP {full} {self._help[name]}")
+        lines.append(f"# TYPE {full} {kind}")
+        return full
+
+    def render(self, gauges=None):
+        """Prometheus text exposition of everything recorded plus point-in-time gauges"""
+        snap = self.snapshot()
+        lines = []
+
+        by_name = {}
+        for (name, labels), value in sorted(snap.counters.items()):
+            by_name.setdefault(name, []).append((labels, value))
+        for name, series in by_name.items():
+            kind = "counter" if name.endswith("_total") else "gauge"
+            full = self._header(lines, name, kind)
+            for labels, value in series:
+                lines.append(f"{full}{self._format_labels(labels)} {value}")
+
+        by_name = {}
+        for (name, labels), h in sorted(snap.histograms.items()):
+            by_name.setdefault(name, []).append((labels, h))
+        for name, series in by_name.items():
+            full = self._header(lines, name, "histogram")
+            for labels, h in series:
+                cumulative = 0
+                for bound, count in zip(self.buckets, h):
+                    cumulative += count
+                    lines.append(
+                        f"{full}_bucket{self._format_labels(labels, [('le', bound)])} {cumulative}"
+                    )
+                lines.append(f"{full}_bucket{self._format_labels(labels, [('le', '+Inf')])} {h[-1]}")
+                lines.append(f"{full}_sum{self._format_labels(labels)} {h[-2]:.6f}")
+                lines.append(f"{full}_count{self._format_labels(labels)} {h[-1]}")
+
+        for name, value in (gauges or {}).items():
+            if value is None:
+                continue
+            full = self._header(lines, name, "gauge")
+            lines.append(f"{full} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def process_memory():
+    """Current and peak resident set size of this process, in bytes"""
+    rss = peak = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        peak = peak if sys.platform == "darwin" else peak * 1024
+    return {"rss": rss, "peak_rss": peak}
@@ -0,0 +1,191 @@
+"""
+Perceptual-hash near-duplicate cache.
+
+Camera captures of the same frame are byte-different JPEGs, so the exact
+content cache misses them. Here a 64-bit DCT perceptual hash is computed from
+the 224x224 array produced by preprocessing, and results are reused for any
+cached image within ``max_distance`` bits (Hamming distance).
+
+Lookup uses multi-index hashing: the 64-bit hash is split into
+``max_distance + 1`` disjoint chunks, each with its own exact-match table.
+By the pigeonhole principle, any hash within ``max_distance`` bits agrees with
+the query on at least one chunk, so only those bucket members are compared
+instead of scanning every entry. Expired entries are dropped from the map
+and the chunk tables on every get/put, so a long-running server holds only
+live entries (and at most ``max_entries`` of them).
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+HASH_BITS = 64
+_DCT_SIZE = 32
+_LOW_FREQ = 8
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis as an (n, n) matrix"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    mat = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    mat[0] /= np.sqrt(2.0)
+    return mat.astype(np.float32)
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+_BIT_WEIGHTS = (1 << np.arange(HASH_BITS, dtype=np.uint64)).astype(np.uint64)
+
+
+def phash(img_array):
+    """64-bit perceptual hash of an RGB image array.
+
+    Accepts (H, W, 3) or (1, H, W, 3), any scale. Works best on the 224x224
+    preprocessed array, which block-averages exactly down to 32x32.
+    """
+    arr = np.asarray(img_array, dtype=np.float32)
+    if arr.ndim == 4:
+        arr = arr[0]
+    gray = arr @ _LUMA if arr.ndim == 3 else arr
+
+    h, w = gray.shape
+    bh, bw = h // _DCT_SIZE, w // _DCT_SIZE
+    gray = gray[:bh * _DCT_SIZE, :bw * _DCT_SIZE]
+    small = gray.reshape(_DCT_SIZE, bh, _DCT_SIZE, bw).mean(axis=(1, 3))
+
+    coeffs = (_DCT @ small @ _DCT.T)[:_LOW_FREQ, :_LOW_FREQ].ravel()
+    # The DC term only tracks overall brightness; exclude it from the median
+    bits = coeffs > np.median(coeffs[1:])
+    return int(_BIT_WEIGHTS[bits].sum())
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateCache:
+    """LRU/TTL cache keyed on perceptual hashes with Hamming-radius lookup"""
+
+    def __init__(self, max_entries=100000, ttl_seconds=3600.0, max_distance=4):
+        if not 0 <= max_distance < HASH_BITS:
+            raise ValueError("max_distance must be between 0 and 63")
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl_seconds)
+        self.max_distance = int(max_distance)
+
+        # Split the hash into max_distance + 1 chunks of near-equal width
+        n_chunks = self.max_distance + 1
+        bounds = np.linspace(0, HASH_BITS, n_chunks + 1).astype(int)
+        self._chunks = [
+            (int(lo), (1 << int(hi - lo)) - 1)
+            for lo, hi in zip(bounds[:-1], bounds[1:])
+        ]
+        self._tables = [dict() for _ in self._chunks]
+        self._entries = OrderedDict()  # hash -> (expires_at, value)
+        # (expires_at, hash) in put order, which with a fixed TTL is expiry
+        # order; records superseded by a later put are skipped when popped
+        self._expiry = deque()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.candidates_checked = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, h):
+        """Value of the closest cached hash within max_distance, or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            self._purge(now)
+            best, best_dist = None, self.max_distance + 1
+            seen = set()
+            for table, key in zip(self._tables, self._chunk_keys(h)):
+                for cand in table.get(key, ()):
+                    if cand in seen:
+                        continue
+                    seen.add(cand)
+                    dist = hamming(h, cand)
+                    if dist < best_dist:
+                        best, best_dist = cand, dist
+                        if dist == 0:
+                            break
+                if best_dist == 0:
+                    # Exact match; no other band can do better
+                    break
+            self.candidates_checked += len(seen)
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best)
+            return self._entries[best][1]
+
+    def put(self, h, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._purge(now)
+            expires_at = now + self.ttl
+            self._expiry.append((expires_at, h))
+            if h in self._entries:
+                self._entries[h] = (expires_at, value)
+                self._entries.move_to_end(h)
+                return
+            self._entries[h] = (expires_at, value)
+            for table, key in zip(self._tables, self._chunk_keys(h)):
+                table.setdefault(key, set()).add(h)
+            while len(self._entries) > self.max_entries:
+                old, _ = self._entries.popitem(last=False)
+                self._unindex(old)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "max_distance": self.max_distance,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "mean_candidates_per_lookup": (
+                    round(self.candidates_checked / lookups, 2) if lookups else 0.0
+                ),
+            }
+
+    # Callers hold self._lock for the helpers below
+    def _chunk_keys(self, h):
+        return [(h >> shift) & mask for shift, mask in self._chunks]
+
+    def _purge(self, now):
+        """Drop entries whose TTL has passed, from the map and the chunk tables"""
+        while self._expiry and self._expiry[0][0] < now:
+            expires_at, h = self._expiry.popleft()
+            entry = self._entries.get(h)
+            if entry is not None and entry[0] == expires_at:
+                del self._entries[h]
+                self._unindex(h)
+                self.expirations += 1
+
+    def _unindex(self, h):
+        for table, key in zip(self._tables, self._chunk_keys(h)):
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(h)
+                if not bucket:
+                    del table[key]
@@ -0,0 +1,155 @@
+"""
+Shared image preprocessing for every front-end.
+
+Images are decoded and resized straight to uint8 RGB, then normalized to
+[0, 1] in float32 directly into a (N, 224, 224, 3) batch buffer, with no
+per-image float64 intermediates. ``BatchBuffers`` keeps one reusable buffer
+per thread so steady-state batch preprocessing allocates nothing.
+
+Large camera uploads are reduced while decoding: JPEGs are decoded with DCT
+scaling (``draft``) to the smallest size still at least
+``DRAFT_OVERSAMPLE`` times the target, other formats are shrunk with integer
+``reduce`` before the final resample, and EXIF orientation is applied to the
+small result rather than the full-size image.
+"""
+
+import base64
+import threading
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+IMG_SIZE = (224, 224)
+_SCALE = np.float32(255.0)
+
+# Decode to at least this multiple of the target size before the final
+# resample, so the reduction doesn't cost resize quality
+DRAFT_OVERSAMPLE = 2
+
+_EXIF_ORIENTATION = 0x0112
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def _open(image):
+    if isinstance(image, str):
+        image = base64.b64decode(image)
+    if isinstance(image, (bytes, bytearray)):
+        image = BytesIO(image)
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(image)
+    if isinstance(image, Image.Image):
+        return image
+    return Image.open(image)
+
+
+def decode_image(image, size=IMG_SIZE):
+    """Decode any supported input to a (H, W, 3) uint8 RGB array.
+
+    Accepts a PIL image (ideally still lazy, straight from ``Image.open``),
+    a NumPy array (e.g. from Gradio), raw bytes, a base64 string, or a
+    file-like object (e.g. a Streamlit upload).
+
+    Returns ``(pixels, info)`` where ``info`` has ``decode_ms`` (open +
+    decode + reduce), ``resize_ms``, the source size and the reduced size
+    actually decoded.
+    """
+    try:
+        start = time.perf_counter()
+        img = _open(image)
+        source_size = img.size
+        try:
+            orientation = img.getexif().get(_EXIF_ORIENTATION, 1)
+        except Exception:
+            orientation = 1
+
+        # Swapped orientations are squashed to the same square either way,
+        # so the draft target only depends on the requested size
+        want = (size[0] * DRAFT_OVERSAMPLE, size[1] * DRAFT_OVERSAMPLE)
+        if img.format == "JPEG" and (img.width > want[0] or img.height > want[1]):
+            img.draft("RGB", want)
+        img.load()
+
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+
+        factor = min(img.width // want[0], img.height // want[1])
+        if factor > 1:
+            img = img.reduce(factor)
+        decoded_size = img.size
+        decoded = time.perf_counter()
+
+        if img.size != size:
+            img = img.resize(size)
+        if orientation in _ORIENTATION_TRANSPOSE:
+            img = img.transpose(_ORIENTATION_TRANSPOSE[orientation])
+        pixels = np.asarray(img, dtype=np.uint8)
+        done = time.perf_counter()
+
+        return pixels, {
+            "decode_ms": (decoded - start) * 1000.0,
+            "resize_ms": (done - decoded) * 1000.0,
+            "source_size": source_size,
+            "decoded_size": decoded_size,
+        }
+    except Exception as e:
+        raise ValueError(f"Preprocessing error: {str(e)}")
+
+
+def load_rgb(image, size=IMG_SIZE):
+    """Decode any supported input to a (H, W, 3) uint8 RGB array"""
+    return decode_image(image, size)[0]
+
+
+def normalize_batch(pixels, out=None):
+    """Scale a sequence of uint8 (H, W, 3) arrays into a float32 batch in place.
+
+    Writes into ``out`` when given (it must have at least len(pixels) rows)
+    and returns the filled (N, H, W, 3) view.
+    """
+    n = len(pixels)
+    if out is None:
+        out = np.empty((n,) + pixels[0].shape, dtype=np.float32)
+    batch = out[:n]
+    for i, px in enumerate(pixels):
+        np.divide(px, _SCALE, out=batch[i])
+    return batch
+
+
+def preprocess_image(image, size=IMG_SIZE):
+    """Single image -> (1, H, W, 3) float32 batch ready for the model"""
+    return normalize_batch([load_rgb(image, size)])
+
+
+def preprocess_batch(images, out=None, size=IMG_SIZE):
+    """Many images -> (N, H, W, 3) float32 batch"""
+    return normalize_batch([load_rgb(img, size) for img in images], out=out)
+
+
+class BatchBuffers:
+    """Per-thread reusable float32 batch buffers.
+
+    ``get(n)`` returns an (n, H, W, 3) view into this thread's buffer,
+    growing it when a larger batch is requested. The view is overwritten by
+    the next ``get`` on the same thread, so consume it before asking again.
+    """
+
+    def __init__(self, size=IMG_SIZE, channels=3):
+        self.shape = (size[1], size[0], channels)
+        self._local = threading.local()
+
+    def get(self, n):
+        buf = getattr(self._local, "buf", None)
+        if buf is None or len(buf) < n:
+            buf = np.empty((n,) + self.shape, dtype=np.float32)
+            self._local.buf = buf
+        return buf[:n]
@@ -0,0 +1,160 @@
+"""
+On-demand request profiling.
+
+For a sampled fraction of requests (or any request carrying the admin
+token), the whole request runs under cProfile and the inference call is
+additionally captured with the TensorFlow profiler. Each capture is written
+to its own directory under ``out_dir``:
+
+    profiles/20260101-120000-123-4567-1/
+        python.prof     # cProfile stats: python -m pstats python.prof / snakeviz
+        summary.txt     # top functions by cumulative time
+        tf/             # TensorBoard profile: tensorboard --logdir profiles/.../tf
+
+Only the newest ``max_captures`` directories are kept. Profiling is
+process-wide, so one capture runs at a time; requests sampled while another
+capture is running are served without profiling.
+"""
+
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import random
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfiler:
+    """Sampled cProfile + TensorFlow profiler captures with rotation"""
+
+    def __init__(self, out_dir="profiles", sample_rate=0.0, admin_token="",
+                 max_captures=20, tf_trace=True):
+        self.out_dir = out_dir
+        self.sample_rate = max(0.0, min(float(sample_rate), 1.0))
+        self.admin_token = admin_token or ""
+        self.max_captures = max(int(max_captures), 1)
+        self.tf_trace_enabled = tf_trace
+
+        self._busy = threading.Lock()
+        self._local = threading.local()
+        self._seq = 0
+        self._stats_lock = threading.Lock()
+        self.captures = 0
+        self.skipped_busy = 0
+        self.last_capture = None
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or bool(self.admin_token)
+
+    def authorized(self, token):
+        """True if the request presented the admin token"""
+        return bool(self.admin_token) and bool(token) and hmac.compare_digest(
+            str(token), self.admin_token
+        )
+
+    def should_profile(self, token=None):
+        if self.authorized(token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    # ----------------------------------------
+    # CAPTURE LIFECYCLE
+    # ----------------------------------------
+    def start(self, name):
+        """Begin a capture for the current request; None if one is already running"""
+        if not self._busy.acquire(blocking=False):
+            with self._stats_lock:
+                self.skipped_busy += 1
+            return None
+        with self._stats_lock:
+            self._seq += 1
+            seq = self._seq
+        capture_dir = os.path.join(
+            self.out_dir,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{seq}-{name}"
+        )
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) owns the hook
+            self._busy.release()
+            return None
+        self._local.capture_dir = capture_dir
+        return {"dir": capture_dir, "profile": profile, "start": time.perf_counter()}
+
+    def finish(self, capture):
+        """Stop profiling and write the capture; returns its directory"""
+        try:
+            capture["profile"].disable()
+            os.makedirs(capture["dir"], exist_ok=True)
+            capture["profile"].dump_stats(os.path.join(capture["dir"], "python.prof"))
+
+            out = io.StringIO()
+            stats = pstats.Stats(capture["profile"], stream=out)
+            stats.sort_stats("cumulative").print_stats(40)
+            with open(os.path.join(capture["dir"], "summary.txt"), "w") as f:
+                f.write(f"wall time: {(time.perf_counter() - capture['start']) * 1000.0:.1f} ms\n")
+                f.write(out.getvalue())
+
+            with self._stats_lock:
+                self.captures += 1
+                self.last_capture = capture["dir"]
+            self._rotate()
+            logger.info(f"Profile written to {capture['dir']}")
+        except Exception as e:
+            logger.warning(f"Could not write profile: {str(e)}")
+        finally:
+            self._local.capture_dir = None
+            self._busy.release()
+        return capture["dir"]
+
+    @contextmanager
+    def tf_trace(self):
+        """Capture a TensorFlow profiler trace of the wrapped block, if this
+        request is being profiled and TensorFlow is the serving runtime"""
+        capture_dir = getattr(self._local, "capture_dir", None)
+        tf = sys.modules.get("tensorflow")
+        if capture_dir is None or tf is None or not self.tf_trace_enabled:
+            yield
+            return
+        try:
+            tf.profiler.experimental.start(os.path.join(capture_dir, "tf"))
+        except Exception as e:
+            logger.warning(f"Could not start TensorFlow profiler: {str(e)}")
+            yield
+            return
+        try:
+            yield
+        finally:
+            tf.profiler.experimental.stop()
+
+    def _rotate(self):
+        entries = sorted(
+            (e for e in os.scandir(self.out_dir) if e.is_dir()),
+            key=lambda e: e.stat().st_mtime
+        )
+        for entry in entries[:max(len(entries) - self.max_captures, 0)]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "admin_token_set": bool(self.admin_token),
+                "out_dir": self.out_dir,
+                "max_captures": self.max_captures,
+                "captures": self.captures,
+                "skipped_busy": self.skipped_busy,
+                "last_capture": self.last_capture,
+            }
@@ -0,0 +1,147 @@
+"""
+Background model loading with warm-up and readiness tracking.
+
+The heavy runtime import (TensorFlow takes seconds) and model load run on a
+background thread so the web server can bind and answer liveness checks
+immediately. After loading, dummy batches of the served sizes are pushed
+through the backend so graph tracing / allocation happens before real
+traffic. The loader only reports ready once warm-up has finished, and every
+phase is timed.
+
+With a thread plan (utils/cpu_tuning.py) the runtime's thread pools and CPU
+affinity are configured between the import and the model load, and a short
+self-benchmark is logged after warm-up.
+"""
+
+import importlib
+import logging
+import threading
+import time
+
+from utils.backends import load_backend
+from utils.cpu_tuning import apply_plan, backend_thread_options, self_benchmark
+
+logger = logging.getLogger(__name__)
+
+# Runtime module(s) each backend imports; the first importable one is timed
+RUNTIME_MODULES = {
+    "keras": ("tensorflow",),
+    "tflite": ("tflite_runtime.interpreter", "tensorflow"),
+    "onnx": ("onnxruntime",),
+}
+
+PENDING = "pending"
+LOADING = "loading"
+WARMING_UP = "warming_up"
+READY = "loaded"
+NOT_FOUND = "not_found"
+FAILED = "failed"
+
+
+class ModelLoader:
+    """Loads a backend (optionally in the background) and tracks readiness"""
+
+    def __init__(self, backend_name, warmup_batch_sizes=(1,), on_loaded=None,
+                 thread_plan=None, benchmark_batch_sizes=(), benchmark_iters=5):
+        self.backend_name = backend_name
+        self.warmup_batch_sizes = tuple(warmup_batch_sizes)
+        self.on_loaded = on_loaded
+        self.thread_plan = thread_plan
+        self.benchmark_batch_sizes = tuple(benchmark_batch_sizes)
+        self.benchmark_iters = int(benchmark_iters)
+        self.benchmark = None
+
+        self.state = PENDING
+        self.error = None
+        self.backend = None
+        self.phases_ms = {}
+        self._started_at = None
+        self._finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    @property
+    def in_progress(self):
+        return self.state in (PENDING, LOADING, WARMING_UP)
+
+    def start(self, background=True):
+        self._started_at = time.perf_counter()
+        if background:
+            threading.Thread(target=self._run, name="model-loader", daemon=True).start()
+        else:
+            self._run()
+        return self
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def status(self):
+        end = self._finished_at or time.perf_counter()
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "error": self.error,
+            "elapsed_ms": round((end - self._started_at) * 1000.0, 1) if self._started_at else 0.0,
+            "phases_ms": dict(self.phases_ms),
+            "threads": self.thread_plan,
+            "self_benchmark": self.benchmark,
+        }
+
+    def _phase(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        ms = (time.perf_counter() - start) * 1000.0
+        self.phases_ms[name] = round(ms, 1)
+        logger.info(f"Startup phase {name}: {ms:.0f} ms")
+        return result
+
+    def _import_runtime(self):
+        for module in RUNTIME_MODULES.get(self.backend_name, ()):
+            try:
+                importlib.import_module(module)
+                return module
+            except ImportError:
+                continue
+        return None
+
+    def _run(self):
+        try:
+            self.state = LOADING
+            self._phase("import_runtime", self._import_runtime)
+            options = {}
+            if self.thread_plan is not None:
+                self._phase("configure_threads", apply_plan, self.thread_plan, self.backend_name)
+                options = backend_thread_options(self.thread_plan, self.backend_name)
+            backend = self._phase("load_model", load_backend, self.backend_name, **options)
+
+            self.state = WARMING_UP
+            for b in self.warmup_batch_sizes:
+                self._phase(f"warmup_batch_{b}", backend.warmup, (b,))
+            if self.benchmark_batch_sizes and self.benchmark_iters > 0:
+                self.benchmark = self._phase(
+                    "self_benchmark", self_benchmark,
+                    backend, self.benchmark_batch_sizes, self.benchmark_iters
+                )
+
+            self.backend = backend
+            if self.on_loaded is not None:
+                self.on_loaded(backend)
+            self.state = READY
+            logger.info(
+                f"✓ Model ready ({self.backend_name}) in "
+                f"{(time.perf_counter() - self._started_at) * 1000.0:.0f} ms"
+            )
+        except FileNotFoundError as e:
+            self.error = str(e)
+            self.state = NOT_FOUND
+            logger.warning(str(e))
+        except Exception as e:
+            self.error = str(e)
+            self.state = FAILED
+            logger.error(f"✗ Failed to load model: {str(e)}")
+        finally:
+            self._finished_at = time.perf_counter()
+            self._done.set()
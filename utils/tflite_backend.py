@@ -0,0 +1,161 @@
+"""
+TFLite serving backend.
+
+Holds a small pool of TFLite interpreters over one model file. Interpreters
+built from a path memory-map the flatbuffer, so the weights live once in the
+OS page cache and are shared by every interpreter and every worker process
+(see gunicorn.conf.py). An interpreter is not thread-safe, so each call
+borrows a slot from the pool; with ``pool_size`` slots up to that many
+batches run in parallel. Batches are padded to fixed bucket sizes and a slot
+keeps one interpreter per bucket, allocated once (at warm-up or on first use
+of that bucket), so tensors are never resized on the request path.
+Quantized (int8/uint8) inputs and outputs are converted using the tensor's
+scale and zero point, so callers always pass and receive float32.
+"""
+
+import os
+import queue
+
+import numpy as np
+
+from utils.inference import DEFAULT_BUCKETS
+
+
+def _interpreter_class():
+    """Prefer the slim tflite_runtime package, fall back to full TensorFlow"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class _PooledInterpreter:
+    """One interpreter with its tensors allocated for a fixed batch size"""
+
+    def __init__(self, interpreter, batch_size):
+        self.interpreter = interpreter
+        self.input = interpreter.get_input_details()[0]
+        if int(self.input["shape"][0]) != batch_size:
+            shape = [batch_size] + [int(d) for d in self.input["shape"][1:]]
+            interpreter.resize_tensor_input(self.input["index"], shape)
+        interpreter.allocate_tensors()
+        self.input = interpreter.get_input_details()[0]
+        self.output = interpreter.get_output_details()[0]
+        self.batch_size = batch_size
+
+    def run(self, batch):
+        dtype = self.input["dtype"]
+        if dtype in (np.int8, np.uint8):
+            scale, zero_point = self.input["quantization"]
+            info = np.iinfo(dtype)
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+        self.interpreter.set_tensor(self.input["index"], batch.astype(dtype))
+        self.interpreter.invoke()
+
+        out = self.interpreter.get_tensor(self.output["index"])
+        if self.output["dtype"] in (np.int8, np.uint8):
+            scale, zero_point = self.output["quantization"]
+            out = (out.astype(np.float32) - zero_point) * scale
+        return np.array(out, dtype=np.float32)
+
+
+class TFLitePool:
+    """Thread-safe pool of TFLite interpreters for one model file.
+
+    Batches are padded up to a fixed bucket size (as InferenceEngine does),
+    and each pool slot keeps one interpreter allocated per bucket, so a
+    change in batch size never resizes tensors on the request path.
+    """
+
+    def __init__(self, model_path, pool_size=2, num_threads=1, buckets=DEFAULT_BUCKETS):
+        if int(pool_size) < 1:
+            raise ValueError(f"pool_size must be >= 1, got {pool_size}")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"TFLite model not found at {model_path}")
+        self._Interpreter = _interpreter_class()
+
+        self.model_path = model_path
+        self.pool_size = int(pool_size)
+        self.num_threads = int(num_threads)
+        self.buckets = tuple(sorted(set(int(b) for b in buckets)))
+        self.model_size = os.path.getsize(model_path)
+
+        # Each slot is {bucket: _PooledInterpreter}, filled on first use or
+        # by warmup()
+        sample = self._new_interpreter(1)
+        self._pool = queue.Queue()
+        self._pool.put({1: sample})
+        for _ in range(self.pool_size - 1):
+            self._pool.put({})
+
+        self.input_shape = tuple(int(d) for d in sample.input["shape"][1:])
+        self.input_dtype = np.dtype(sample.input["dtype"]).name
+
+    def _new_interpreter(self, batch_size):
+        interpreter = self._Interpreter(
+            model_path=self.model_path,
+            num_threads=self.num_threads
+        )
+        return _PooledInterpreter(interpreter, batch_size)
+
+    def _bucket_for(self, n):
+        for b in self.buckets:
+            if b >= n:
+                return b
+        return self.buckets[-1]
+
+    def _run(self, slot, batch):
+        bucket = len(batch)
+        item = slot.get(bucket)
+        if item is None:
+            item = slot[bucket] = self._new_interpreter(bucket)
+        return item.run(batch)
+
+    def predict(self, batch):
+        """Run a (N, H, W, C) float batch and return float32 probabilities"""
+        batch = np.asarray(batch, dtype=np.float32)
+        n = len(batch)
+        largest = self.buckets[-1]
+        outputs = []
+
+        slot = self._pool.get()
+        try:
+            for start in range(0, n, largest):
+                chunk = batch[start:start + largest]
+                size = len(chunk)
+                bucket = self._bucket_for(size)
+                if size < bucket:
+                    pad = np.zeros((bucket - size,) + chunk.shape[1:], dtype=np.float32)
+                    chunk = np.concatenate([chunk, pad], axis=0)
+                outputs.append(self._run(slot, chunk)[:size])
+        finally:
+            self._pool.put(slot)
+
+        return outputs[0] if len(outputs) == 1 else np.concatenate(outputs, axis=0)
+
+    __call__ = predict
+
+    def warmup(self, batch_sizes=(1,)):
+        """Allocate and run the buckets for ``batch_sizes`` in every slot"""
+        slots = [self._pool.get() for _ in range(self.pool_size)]
+        try:
+            for slot in slots:
+                for b in sorted({self._bucket_for(n) for n in batch_sizes}):
+                    self._run(slot, np.zeros((b,) + self.input_shape, dtype=np.float32))
+        finally:
+            for slot in slots:
+                self._pool.put(slot)
+
+    def describe(self):
+        return {
+            "engine": "tflite",
+            "model_path": self.model_path,
+            "model_size_mb": round(self.model_size / 1e6, 2),
+            "input_dtype": self.input_dtype,
+            "pool_size": self.pool_size,
+            "buckets": list(self.buckets),
+            "num_threads": self.num_threads,
+            "idle_slots": self._pool.qsize(),
+        }
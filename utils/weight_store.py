@@ -0,0 +1,112 @@
+"""
+Memory-mapped weight store for faster model loading in worker processes.
+
+The ``.keras`` file is a zip that every worker has to unpack and parse. The
+weight store unpacks it once into a directory of raw ``.npy`` arrays plus
+the architecture JSON. Workers open the arrays with ``mmap_mode='r'``, which
+reads them straight from the OS page cache (warm after the first worker)
+with no unzipping or parsing.
+
+This only makes loading faster. ``model.set_weights`` copies the arrays into
+the worker's own TF variables, so every worker still holds a private copy of
+the weights; sharing them across processes needs the tflite backend, whose
+interpreters keep the mapped ``.tflite`` file.
+
+    python -m utils.weight_store final_skin_disease_model.keras
+
+The store records the source file's size and mtime and is rebuilt when the
+model file changes.
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+MANIFEST = "manifest.json"
+ARCHITECTURE = "architecture.json"
+
+
+def default_store_dir(model_path):
+    """Store lives next to the model: final_skin_disease_model.keras.weights/"""
+    return model_path + ".weights"
+
+
+def _source_stamp(model_path):
+    st = os.stat(model_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def is_fresh(model_path, store_dir=None):
+    """True if the store exists and was built from the current model file"""
+    store_dir = store_dir or default_store_dir(model_path)
+    try:
+        with open(os.path.join(store_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return manifest.get("source") == _source_stamp(model_path)
+
+
+def export_weight_store(model_path, store_dir=None):
+    """Unpack a Keras model into architecture JSON + one .npy per weight"""
+    import tensorflow as tf
+
+    store_dir = store_dir or default_store_dir(model_path)
+    model = tf.keras.models.load_model(model_path)
+
+    tmp_dir = store_dir + ".tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    with open(os.path.join(tmp_dir, ARCHITECTURE), "w") as f:
+        f.write(model.to_json())
+
+    weights = model.get_weights()
+    for i, w in enumerate(weights):
+        np.save(os.path.join(tmp_dir, f"w{i:04d}.npy"), np.ascontiguousarray(w))
+
+    with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+        json.dump({
+            "source": _source_stamp(model_path),
+            "num_weights": len(weights),
+            "tensorflow": tf.__version__,
+        }, f, indent=2)
+
+    # Swap in atomically so concurrently starting workers never see a half store
+    if os.path.isdir(store_dir):
+        old_dir = store_dir + ".old"
+        os.replace(store_dir, old_dir)
+        os.replace(tmp_dir, store_dir)
+        for name in os.listdir(old_dir):
+            os.remove(os.path.join(old_dir, name))
+        os.rmdir(old_dir)
+    else:
+        os.replace(tmp_dir, store_dir)
+    return store_dir
+
+
+def load_weights(store_dir):
+    """Memory-mapped weight arrays, in model.get_weights() order"""
+    with open(os.path.join(store_dir, MANIFEST)) as f:
+        n = json.load(f)["num_weights"]
+    return [
+        np.load(os.path.join(store_dir, f"w{i:04d}.npy"), mmap_mode="r")
+        for i in range(n)
+    ]
+
+
+def build_model(store_dir):
+    """Rebuild the Keras model from the store without parsing the .keras zip.
+    The weights are copied into the model's variables; the mapping is
+    released once this returns."""
+    import tensorflow as tf
+
+    with open(os.path.join(store_dir, ARCHITECTURE)) as f:
+        model = tf.keras.models.model_from_json(f.read())
+    model.set_weights(load_weights(store_dir))
+    return model
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "final_skin_disease_model.keras"
+    print(f"Weight store written to {export_weight_store(path)}")